@@ -0,0 +1,90 @@
+"""
+Actuator state cache for Pepper
+Write-through record of the last state commanded on the robot (autonomous-life state,
+tablet content, TTS voice, ...) so a command whose target state is already in place
+can be skipped. Entries are keyed by (service, item) and dropped when that service's
+proxy is re-created or the robot reports a different state.
+Python 2.7 compatible version.
+"""
+
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ActuatorStateCache:
+    """
+    Last known state per (service, item), with counts of commands sent and skipped.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = {}
+        self.sent = {}
+        self.saved = {}
+
+    def is_current(self, key, value):
+        """True (and counted as a saved RPC) if key is already known to be value."""
+        with self.lock:
+            if key in self.state and self.state[key] == value:
+                self.saved[key] = self.saved.get(key, 0) + 1
+                return True
+            return False
+
+    def update(self, key, value):
+        """Record that value was just sent to the robot."""
+        with self.lock:
+            self.state[key] = value
+            self.sent[key] = self.sent.get(key, 0) + 1
+
+    def observe(self, key, value):
+        """Record a state reported by the robot itself (e.g. an ALMemory event)."""
+        with self.lock:
+            if self.state.get(key) != value:
+                logger.info("Actuator state {} changed on robot to {}".format(key, value))
+            self.state[key] = value
+
+    def invalidate(self, key=None):
+        """Forget one entry, or everything."""
+        with self.lock:
+            if key is None:
+                self.state.clear()
+            else:
+                self.state.pop(key, None)
+
+    def invalidate_service(self, service):
+        """Forget every entry for a service, e.g. after its proxy was re-created."""
+        with self.lock:
+            for key in list(self.state.keys()):
+                if key[0] == service:
+                    del self.state[key]
+
+    def get_stats(self):
+        """Commands sent and skipped per key, plus the total RPCs saved."""
+        with self.lock:
+            keys = set(self.sent.keys()) | set(self.saved.keys())
+            stats = dict(("{}.{}".format(*key), {"sent": self.sent.get(key, 0), "saved": self.saved.get(key, 0)})
+                         for key in keys)
+            stats["total_saved"] = sum(self.saved.values())
+            return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_actuator_cache(registry=None):
+    """
+    Return the process-wide cache, creating it on the first call.
+    Every myPepper drives the same robot, so they must share one view of its state.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ActuatorStateCache()
+            if registry is not None:
+                registry.add_recreate_listener(_cache.invalidate_service)
+        return _cache
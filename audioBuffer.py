@@ -0,0 +1,117 @@
+"""
+Bounded recording buffer for Pepper
+Preallocates the capture memory once, caps the utterance length, and spills to a
+memory-mapped temp file when the override button keeps the microphone open.
+Python 2.7 compatible version.
+"""
+
+import os
+import mmap
+import tempfile
+from lazyImport import lazy_import
+
+np = lazy_import("numpy")  # imported on first recording
+
+MAX_UTTERANCE_SECONDS = float(os.getenv("MAX_UTTERANCE_SECONDS", "30"))
+OVERRIDE_MAX_SECONDS = float(os.getenv("OVERRIDE_MAX_SECONDS", "300"))
+
+
+class RecordingBuffer:
+    """
+    Fixed-size store for 16-bit mono PCM.
+
+    The in-memory bytearray holds max_seconds of audio and is reused for every
+    recording. With allow_spill, a full buffer moves to a memory-mapped file of
+    spill_seconds instead of stopping. Readers get zero-copy numpy views.
+    """
+
+    def __init__(self, rate, max_seconds=MAX_UTTERANCE_SECONDS, spill_seconds=OVERRIDE_MAX_SECONDS,
+                 sample_width=2, channels=1):
+        self.sample_width = sample_width
+        self.bytes_per_second = rate * sample_width * channels
+        self.memory = bytearray(int(max_seconds * self.bytes_per_second))
+        self.spill_capacity = int(spill_seconds * self.bytes_per_second)
+        self.spill_file = None
+        self.spill_map = None
+        self.storage = self.memory
+        self.length = 0
+
+    def reset(self):
+        """Start a new recording; keeps the preallocated memory."""
+        self._close_spill()
+        self.storage = self.memory
+        self.length = 0
+
+    def append(self, data, allow_spill=False):
+        """
+        Copy a chunk into the buffer.
+        Returns False once the buffer (and spill file, if allowed) is full.
+        """
+        end = self.length + len(data)
+        if end > len(self.storage):
+            if allow_spill and self.spill_map is None and self.spill_capacity > len(self.storage):
+                self._spill()
+            if end > len(self.storage):
+                return False
+
+        self.storage[self.length:end] = data
+        self.length = end
+        return True
+
+    def _spill(self):
+        self.spill_file = tempfile.TemporaryFile()
+        self.spill_file.truncate(self.spill_capacity)
+        self.spill_map = mmap.mmap(self.spill_file.fileno(), self.spill_capacity)
+        self.spill_map[0:self.length] = bytes(self.memory[0:self.length])
+        self.storage = self.spill_map
+
+    def _close_spill(self):
+        if self.spill_map is not None:
+            self.spill_map.close()
+            self.spill_file.close()
+            self.spill_map = None
+            self.spill_file = None
+
+    def duration(self):
+        """Seconds of audio written so far."""
+        return float(self.length) / self.bytes_per_second
+
+    def samples(self):
+        """Zero-copy int16 view of the recorded audio."""
+        return np.frombuffer(self.storage, dtype=np.int16, count=self.length // self.sample_width)
+
+    def to_bytes(self, start=0, end=None):
+        """Copy out a byte range, e.g. the trimmed utterance for encoding."""
+        if end is None or end > self.length:
+            end = self.length
+        return bytes(self.storage[start:end])
+
+
+def find_speech_bounds(samples, rate, silence_db=-14, padding_ms=250, frame_ms=10):
+    """
+    Sample range of the speech, padded on both sides.
+
+    Frames quieter than silence_db relative to the whole recording count as silence,
+    like pydub's detect_nonsilent(silence_thresh=dBFS-14), but computed on the numpy
+    view so the audio is not copied. Returns (0, len(samples)) if nothing is found.
+    """
+    frame_len = int(rate * frame_ms / 1000)
+    total = len(samples) // frame_len
+    if total == 0:
+        return 0, len(samples)
+
+    frames = samples[:total * frame_len].reshape(total, frame_len).astype(np.float64)
+    frame_power = np.mean(np.square(frames), axis=1)
+    overall_power = np.mean(frame_power)
+    if overall_power <= 0:
+        return 0, len(samples)
+
+    threshold = overall_power * (10 ** (silence_db / 10.0))
+    loud = np.nonzero(frame_power > threshold)[0]
+    if len(loud) == 0:
+        return 0, len(samples)
+
+    padding = int(rate * padding_ms / 1000)
+    start = max(loud[0] * frame_len - padding, 0)
+    end = min((loud[-1] + 1) * frame_len + padding, len(samples))
+    return int(start), int(end)
@@ -0,0 +1,108 @@
+"""
+Audio sources for manageAudio
+MicrophoneSource reads from the default input device through PyAudio.
+WavReplaySource plays a wav file back as fast as it is read, so the recording
+state machine can run offline against a corpus of clips.
+Python 2.7 compatible version.
+"""
+
+import wave
+from lazyImport import lazy_import, is_available
+
+# Imported when the first stream is opened rather than at start-up
+np = lazy_import("numpy")
+pyaudio = lazy_import("pyaudio")
+PYAUDIO_AVAILABLE = is_available("pyaudio")
+
+
+class MicrophoneSource:
+    """
+    Live microphone input. PyAudio is initialised once and reused for every stream.
+    """
+
+    def __init__(self, rate, channels=1):
+        self.rate = rate
+        self.channels = channels
+        self.audio = pyaudio.PyAudio()
+        self.stream = None
+
+    def open(self, chunk):
+        self.stream = self.audio.open(format=pyaudio.paInt16,
+                                      channels=self.channels,
+                                      rate=self.rate,
+                                      input=True,
+                                      frames_per_buffer=chunk)
+
+    def read(self, chunk):
+        return self.stream.read(chunk)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+    def terminate(self):
+        self.close()
+        self.audio.terminate()
+
+
+class WavReplaySource:
+    """
+    Replays a 16-bit wav file chunk by chunk without waiting for real time.
+
+    The file is converted to the capture rate and mono on load. After the file ends,
+    tail_seconds of digital silence are returned so the endpointer can finish, then
+    EOFError is raised. position() is the time in the file, in seconds, read up to.
+    """
+
+    def __init__(self, path, rate, start_seconds=0.0, end_seconds=None, tail_seconds=3.0):
+        self.path = path
+        self.rate = rate
+        self.samples = self._load(path, rate)
+        self.start = int(start_seconds * rate)
+        self.end = len(self.samples) if end_seconds is None else min(int(end_seconds * rate), len(self.samples))
+        self.tail = int(tail_seconds * rate)
+        self.cursor = self.start
+
+    def _load(self, path, rate):
+        wav = wave.open(path, 'rb')
+        try:
+            if wav.getsampwidth() != 2:
+                raise ValueError("{}: only 16-bit wav files are supported".format(path))
+            channels = wav.getnchannels()
+            file_rate = wav.getframerate()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        finally:
+            wav.close()
+
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        if file_rate != rate:
+            duration = float(len(samples)) / file_rate
+            target = np.linspace(0, len(samples) - 1, int(duration * rate))
+            samples = np.interp(target, np.arange(len(samples)), samples)
+        return samples.astype(np.int16)
+
+    def open(self, chunk):
+        self.cursor = self.start
+
+    def read(self, chunk):
+        if self.cursor >= self.end + self.tail:
+            raise EOFError("{} exhausted".format(self.path))
+
+        data = np.zeros(chunk, dtype=np.int16)
+        if self.cursor < self.end:
+            available = min(chunk, self.end - self.cursor)
+            data[:available] = self.samples[self.cursor:self.cursor + available]
+        self.cursor += chunk
+        return data.tobytes()
+
+    def position(self):
+        return float(self.cursor) / self.rate
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
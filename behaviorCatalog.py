@@ -0,0 +1,172 @@
+"""
+Behavior catalog for Pepper
+Loads the installed and running behaviors once and keeps them current from
+BehaviorManager events, so launching a behavior needs no lookup RPCs.
+Behaviors the chat model may request are checked against BEHAVIORS_ENUM and
+behaviorsList.txt up front.
+Python 2.7 compatible version.
+"""
+
+import os
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BEHAVIORS_LIST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "behaviorsList.txt")
+
+# ALMemory events that keep the catalog current
+BEHAVIOR_ADDED_EVENT = "ALBehaviorManager/BehaviorAdded"
+BEHAVIOR_REMOVED_EVENT = "ALBehaviorManager/BehaviorRemoved"
+BEHAVIORS_RUN_EVENT = "BehaviorsRun"
+
+
+def load_behaviors_list(path=BEHAVIORS_LIST_FILE):
+    """Behavior names from behaviorsList.txt ("name : description" lines)."""
+    names = []
+    try:
+        with open(path) as f:
+            for line in f:
+                if " : " not in line:
+                    continue
+                name = line.split(" : ", 1)[0].strip()
+                if "/" in name:
+                    names.append(name)
+    except IOError as e:
+        logger.warning("Could not read {}: {}".format(path, e))
+    return names
+
+
+class BehaviorCatalog:
+    """
+    Installed and running behaviors, plus the set the chat model is allowed to run.
+    """
+
+    def __init__(self, behavior_manager):
+        self.behavior_manager = behavior_manager
+        self.lock = threading.Lock()
+        self.installed = set()
+        self.running = set()
+        self.allowed = None
+        self.loaded = False
+        self.launches = 0
+        self.rejected = 0
+
+    def load(self):
+        """Fetch the installed and running behaviors from the robot."""
+        installed = set(self.behavior_manager.getInstalledBehaviors())
+        running = set(self.behavior_manager.getRunningBehaviors())
+        with self.lock:
+            self.installed = installed
+            self.running = running
+            self.loaded = True
+        logger.info("Behavior catalog loaded: {} installed, {} running".format(len(installed), len(running)))
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def set_allowed(self, names):
+        """
+        Restrict launch() to these behaviors.
+        Returns the names that are not installed on the robot.
+        """
+        self._ensure_loaded()
+        with self.lock:
+            self.allowed = set(names)
+            missing = sorted(self.allowed - self.installed)
+        if missing:
+            logger.warning("Allowed behaviors not installed on the robot: {}".format(missing))
+        return missing
+
+    def is_installed(self, behavior_name):
+        self._ensure_loaded()
+        return behavior_name in self.installed
+
+    def is_running(self, behavior_name):
+        self._ensure_loaded()
+        return behavior_name in self.running
+
+    def is_allowed(self, behavior_name):
+        return self.allowed is None or behavior_name in self.allowed
+
+    def get_running(self):
+        self._ensure_loaded()
+        with self.lock:
+            return sorted(self.running)
+
+    def launch(self, behavior_name):
+        """
+        Start a behavior without waiting for it to finish.
+        Returns False if it is unknown, not allowed or already running.
+        """
+        if not self.is_allowed(behavior_name) or not self.is_installed(behavior_name):
+            self.rejected += 1
+            logger.warning("Behavior '{}' rejected: not an available behavior".format(behavior_name))
+            return False
+        if self.is_running(behavior_name):
+            logger.info("Behavior '{}' is already running".format(behavior_name))
+            return False
+        task_id = self.behavior_manager.post.runBehavior(behavior_name)
+        with self.lock:
+            self.running.add(behavior_name)
+        self.launches += 1
+
+        # Don't rely on BehaviorsRun events alone (not every process subscribes to them)
+        watcher = threading.Thread(target=self._watch_launch, args=(behavior_name, task_id))
+        watcher.daemon = True
+        watcher.start()
+        return True
+
+    def _watch_launch(self, behavior_name, task_id):
+        # runBehavior returns when the behavior ends, so the task finishing means it stopped
+        try:
+            self.behavior_manager.wait(task_id, 0)
+        except Exception as e:
+            logger.debug("Lost track of behavior '{}': {}".format(behavior_name, e))
+        with self.lock:
+            self.running.discard(behavior_name)
+
+    def on_behavior_added(self, value):
+        with self.lock:
+            self.installed.add(value)
+
+    def on_behavior_removed(self, value):
+        with self.lock:
+            self.installed.discard(value)
+            self.running.discard(value)
+
+    def on_behaviors_run(self, value):
+        """BehaviorsRun carries the full list of running behaviors."""
+        with self.lock:
+            self.running = set(value or [])
+
+    def on_proxy_recreated(self, service):
+        # A new BehaviorManager connection may have missed events; reload on next use
+        if service == "ALBehaviorManager":
+            self.loaded = False
+
+    def get_stats(self):
+        return {"installed": len(self.installed), "running": len(self.running),
+                "launches": self.launches, "rejected": self.rejected}
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_behavior_catalog(behavior_manager, registry=None):
+    """Return the process-wide catalog, loading it on the first call."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = BehaviorCatalog(behavior_manager)
+            if registry is not None:
+                registry.add_recreate_listener(_catalog.on_proxy_recreated)
+            try:
+                _catalog.load()
+            except Exception as e:
+                logger.error("Could not load behavior catalog, will retry on first use: {}".format(e))
+        return _catalog
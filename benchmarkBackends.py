@@ -0,0 +1,120 @@
+"""
+Robot backend benchmark: ALProxy vs qi session
+Times the RPCs a conversation turn makes, through the ALProxy registry and through the
+qi session backend, both one after another and concurrently (a thread per call for
+ALProxy, as main.py and chatGPT.py do today; futures from one thread for qi).
+
+The calls only read state or fade the eyes to white, so the robot does not move or talk.
+
+Usage: python benchmarkBackends.py [iterations] [results.json]
+PIP and PPORT are read from the .env file, as in main.py.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from proxyRegistry import get_registry
+from qiPepper import get_qi_registry, QI_AVAILABLE
+
+load_dotenv()
+
+PIP = os.getenv("PIP")
+PPORT = int(os.getenv("PPORT"))
+
+DEFAULT_ITERATIONS = 20
+
+# (service, method, args) - roughly what one turn sends besides speech itself
+TURN_CALLS = [
+    ("ALLeds", "fadeRGB", ("FaceLeds", "white", 0.0)),
+    ("ALMotion", "getAngles", (["HeadYaw", "HeadPitch"], True)),
+    ("ALBehaviorManager", "getRunningBehaviors", ()),
+    ("ALAutonomousLife", "getState", ()),
+    ("ALTextToSpeech", "getLanguage", ()),
+]
+
+
+def run_sequential(registry):
+    for service, method, args in TURN_CALLS:
+        getattr(registry.get_raw(service), method)(*args)
+
+
+def run_threads(registry):
+    threads = [threading.Thread(target=getattr(registry.get_raw(service), method), args=args)
+               for service, method, args in TURN_CALLS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_futures(registry):
+    futures = [getattr(registry.get_raw(service), method)(*args, _async=True) for service, method, args in TURN_CALLS]
+    for future in futures:
+        future.value()
+
+
+def time_mode(run, registry, iterations):
+    """Wall time of each turn in seconds, after one warm-up turn."""
+    run(registry)
+    timings = []
+    for _ in range(iterations):
+        start = time.time()
+        run(registry)
+        timings.append(time.time() - start)
+    return timings
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        "turns": len(timings),
+        "median_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        "max_ms": timings[-1] * 1000,
+    }
+
+
+def run_benchmark(iterations):
+    modes = [
+        ("ALProxy sequential", run_sequential, get_registry(PIP, PPORT)),
+        ("ALProxy thread per call", run_threads, get_registry(PIP, PPORT)),
+    ]
+    if QI_AVAILABLE:
+        modes.append(("qi sequential", run_sequential, get_qi_registry(PIP, PPORT)))
+        modes.append(("qi futures", run_futures, get_qi_registry(PIP, PPORT)))
+    else:
+        print("qi is not installed; only the ALProxy modes will run")
+
+    results = OrderedDict()
+    for name, run, registry in modes:
+        results[name] = summarize(time_mode(run, registry, iterations))
+        results[name]["proxy_stats"] = registry.get_stats()
+    return results
+
+
+def print_report(results):
+    print("\n" + "=" * 78)
+    print("{} CALLS PER TURN".format(len(TURN_CALLS)))
+    print("=" * 78)
+    for name, r in results.items():
+        print("{:<26} turns={} median={:>7.1f}ms p95={:>7.1f}ms max={:>7.1f}ms".format(
+            name, r["turns"], r["median_ms"], r["p95_ms"], r["max_ms"]))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ITERATIONS
+    results = run_benchmark(iterations)
+    print_report(results)
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w") as f:
+            json.dump(results, f, indent=2)
+        print("\nResults written to {}".format(sys.argv[2]))
+
+
+if __name__ == "__main__":
+    main()
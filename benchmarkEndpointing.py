@@ -0,0 +1,179 @@
+"""
+Offline endpointing benchmark for recordAudio4
+Replays a labelled corpus of wav clips through manageAudio.record_audio for each
+parameter set and reports endpoint latency, clipped onsets and false triggers.
+
+Corpus layout: a directory with wav files and a labels.json like
+    [
+        {"file": "hello.wav", "speech_start": 1.20, "speech_end": 2.85},
+        {"file": "door_slam.wav", "speech_start": null, "speech_end": null},
+        {"file": "crowd.wav", "speech_start": 2.0, "speech_end": 4.1, "ambient_file": "crowd_room.wav"}
+    ]
+speech_start/speech_end are null for clips without speech. The ambient threshold is
+taken from ambient_file if given, otherwise from the first AMBIENT_CHECK_SECONDS of the clip.
+
+Usage: python benchmarkEndpointing.py <corpus_dir> [params.json] [results.json]
+"""
+
+import os
+import sys
+import json
+import time
+import itertools
+import sharedVars
+import recordAudio4
+from recordAudio4 import manageAudio
+from audioSource import WavReplaySource
+
+# Grid used when no params.json is given
+DEFAULT_PARAMETER_GRID = {
+    "NUMBER_OF_CHECKS": [2, 4, 6],
+    "AMBIENT_PERCENT_OVER_DIFF": [0.1, 0.2, 0.3],
+}
+ONSET_TOLERANCE = 0.1  # seconds the capture may start after the labelled speech start
+
+
+def expand_grid(grid):
+    """Turn {"NAME": [values]} into a list of {"NAME": value} parameter sets."""
+    names = sorted(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+
+def apply_parameters(parameters):
+    """Set the recordAudio4 module constants for one run."""
+    for name, value in parameters.items():
+        if not hasattr(recordAudio4, name):
+            raise ValueError("Unknown recordAudio4 parameter: {}".format(name))
+        setattr(recordAudio4, name, value)
+
+
+def run_clip(corpus_dir, label, parameters):
+    """Run one clip through the ambient check and the recording state machine."""
+    apply_parameters(parameters)
+    clip_path = os.path.join(corpus_dir, label["file"])
+    chunk_seconds = float(recordAudio4.CHUNK) / recordAudio4.RATE
+
+    # Ambient threshold, as main.py does at startup
+    if label.get("ambient_file"):
+        ambient_source = WavReplaySource(os.path.join(corpus_dir, label["ambient_file"]), recordAudio4.RATE)
+    else:
+        ambient_source = WavReplaySource(clip_path, recordAudio4.RATE)
+    manageAudio(audio_source=ambient_source).ambient_sound_check()
+
+    source = WavReplaySource(clip_path, recordAudio4.RATE)
+    manage_audio = manageAudio(audio_source=source)
+
+    transitions = []
+    recordAudio4.CHAT_STATE_OLD = ""
+    recordAudio4.CHAT_STATE_NEW = ""
+    sharedVars.ISNEAR = True
+    sharedVars.ISRECORDING = False
+
+    start = time.time()
+    file_path = manage_audio.record_audio(on_state=lambda state: transitions.append((state, source.position())))
+    wall_time = time.time() - start
+    endpoint = source.position()
+    if file_path:
+        manage_audio.delete_file(file_path)
+
+    heard = [position for state, position in transitions if state == "HEARD SOMETHING"]
+    active = [position for state, position in transitions if state == "ACTIVE LISTENING"]
+    capture_start = heard[0] - chunk_seconds if heard else None
+
+    speech_start = label.get("speech_start")
+    speech_end = label.get("speech_end")
+    has_speech = speech_start is not None
+
+    result = {
+        "file": label["file"],
+        "parameters": parameters,
+        "endpoint": endpoint,
+        "endpoint_latency": endpoint - speech_end if has_speech and active else None,
+        "clipped_onset": bool(has_speech and (capture_start is None or capture_start > speech_start + ONSET_TOLERANCE)),
+        "false_trigger": bool(active and (not has_speech or active[0] < speech_start - ONSET_TOLERANCE)),
+        "missed": bool(has_speech and not active),
+        "gate_rejected": bool(has_speech and active and file_path is None),
+        "realtime_factor": endpoint / wall_time if wall_time > 0 else None,
+        "transitions": transitions,
+    }
+    return result
+
+
+def summarize(results):
+    """Aggregate per parameter set."""
+    summary = []
+    for key, group in itertools.groupby(results, key=lambda r: json.dumps(r["parameters"], sort_keys=True)):
+        group = list(group)
+        latencies = sorted(r["endpoint_latency"] for r in group if r["endpoint_latency"] is not None)
+        summary.append({
+            "parameters": json.loads(key),
+            "clips": len(group),
+            "median_endpoint_latency": latencies[len(latencies) // 2] if latencies else None,
+            "max_endpoint_latency": latencies[-1] if latencies else None,
+            "clipped_onsets": sum(1 for r in group if r["clipped_onset"]),
+            "false_triggers": sum(1 for r in group if r["false_trigger"]),
+            "missed": sum(1 for r in group if r["missed"]),
+        })
+    return summary
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return "{:.2f}".format(value)
+    return str(value)
+
+
+def print_report(results, summary):
+    print("\n" + "=" * 78)
+    print("PER CLIP")
+    print("=" * 78)
+    for r in results:
+        print("{:<28} {:<45} latency={:>6} clipped={} false={} missed={} x{}".format(
+            r["file"], json.dumps(r["parameters"], sort_keys=True), format_value(r["endpoint_latency"]),
+            r["clipped_onset"], r["false_trigger"], r["missed"], format_value(r["realtime_factor"])))
+
+    print("\n" + "=" * 78)
+    print("PER PARAMETER SET")
+    print("=" * 78)
+    for s in summary:
+        print("{:<45} clips={} median_latency={} max_latency={} clipped={} false={} missed={}".format(
+            json.dumps(s["parameters"], sort_keys=True), s["clips"], format_value(s["median_endpoint_latency"]),
+            format_value(s["max_endpoint_latency"]), s["clipped_onsets"], s["false_triggers"], s["missed"]))
+
+
+def run_benchmark(corpus_dir, parameter_sets):
+    with open(os.path.join(corpus_dir, "labels.json")) as f:
+        labels = json.load(f)
+
+    results = []
+    for parameters in parameter_sets:
+        for label in labels:
+            results.append(run_clip(corpus_dir, label, parameters))
+    return results, summarize(results)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarkEndpointing.py <corpus_dir> [params.json] [results.json]")
+        print("params.json maps recordAudio4 constants to lists of values, e.g.")
+        print('  {"NUMBER_OF_CHECKS": [3, 4], "AMBIENT_PERCENT_OVER_DIFF": [0.15, 0.2]}')
+        sys.exit(1)
+
+    grid = DEFAULT_PARAMETER_GRID
+    if len(sys.argv) > 2:
+        with open(sys.argv[2]) as f:
+            grid = json.load(f)
+
+    results, summary = run_benchmark(sys.argv[1], expand_grid(grid))
+    print_report(results, summary)
+
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], "w") as f:
+            json.dump({"results": results, "summary": summary}, f, indent=2)
+        print("\nResults written to {}".format(sys.argv[3]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Per-turn RPC benchmark on the NAOqi simulator
+Drives myPepper through the robot-side steps of conversation turns (animation state,
+eye rotation, thinking filler, per-sentence eye fades and speech, a gesture) against
+naoqiSimulator, then reports RPC count and summed latency per turn.
+
+Usage: python benchmarkTurn.py [turns] [latencies.json] [results.json]
+Set KILL_SERVICE (e.g. ALLeds) to destroy that module halfway through the run.
+"""
+
+import os
+import sys
+import json
+import time
+import naoqiSimulator
+
+simulator = naoqiSimulator.install(naoqiSimulator.Simulator(time_scale=float(os.getenv("SIM_TIME_SCALE", "0.1")), seed=1))
+
+from myPepper import myPepper  # noqa: E402  (must come after the simulator is installed)
+
+DEFAULT_TURNS = 5
+SENTENCES = [
+    "Well hello there.",
+    "I am Pepper, and I am very happy to meet you.",
+    "What would you like to talk about today?",
+]
+GESTURE = "animations/Stand/Gestures/Shy_1"
+
+
+def run_turn(pepper):
+    """The robot calls main.py and chatGPTInteract make for one exchange."""
+    pepper.pepperAnnimation(False)  # quiet while recording
+    pepper.pepperAnnimation(True)
+    pepper.start_eye_rotation(200, 200, 200, 1)
+    pepper.start_thinking_phrase()
+    pepper.stop_thinking_phrase()
+    pepper.stop_eye_rotation()
+    for index, sentence in enumerate(SENTENCES):
+        pepper.fade_eyes("white")
+        if index == 1:
+            pepper.launchAndStopBehavior(GESTURE)
+        pepper.have_pepper_say(sentence)
+
+
+def print_report(turns, stats):
+    print("\n" + "=" * 78)
+    print("PER TURN")
+    print("=" * 78)
+    for turn in turns:
+        print("{:<10} rpcs={:>4} errors={:>2} latency={:>7.3f}s".format(
+            str(turn["turn"]), turn["rpcs"], turn["errors"], turn["latency"]))
+
+    print("\n" + "=" * 78)
+    print("PER METHOD")
+    print("=" * 78)
+    for key in sorted(stats, key=lambda k: -stats[k]["calls"]):
+        print("{:<48} calls={:>4} errors={:>2} latency={:>7.3f}s".format(
+            key, stats[key]["calls"], stats[key]["errors"], stats[key]["latency"]))
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TURNS
+    if len(sys.argv) > 2:
+        simulator.load_latencies(sys.argv[2])
+    kill_service = os.getenv("KILL_SERVICE")
+
+    simulator.mark("startup")
+    pepper = myPepper(PIP="simulator", PPORT=9559, LOCAL="127.0.0.1")
+    pepper.set_voice("naoenu")
+
+    for turn in range(turns):
+        if kill_service and turn == turns // 2:
+            simulator.kill(kill_service)
+        simulator.mark("turn {}".format(turn + 1))
+        run_turn(pepper)
+    time.sleep(0.5)  # let the LED engine's last commands land in the log
+
+    summary = simulator.summarize_turns()
+    stats = simulator.get_stats()
+    print_report(summary, stats)
+    print("\nSkipped by the state cache: {}".format(pepper.get_cache_stats()["total_saved"]))
+    print("Phrase cache: {}".format(pepper.phrase_cache.get_stats()))
+
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], "w") as f:
+            json.dump({"turns": summary, "methods": stats}, f, indent=2)
+        print("\nResults written to {}".format(sys.argv[3]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Broker supervisor for Pepper
+Owns the local ALBroker, the ALModules registered on it and their ALMemory event
+subscriptions. A monitor thread checks that the robot still routes our events; after a
+network blip it rebuilds the broker, re-registers every module under the same name and
+replays all subscriptions in one batch, recording how long the recovery took.
+Python 2.7 compatible version.
+"""
+
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from naoqi import ALBroker
+from naoqi import ALModule
+from proxyRegistry import get_registry
+from circuitBreaker import backoff_delay
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BROKER_CHECK_SECONDS = 2.0   # how often the event link is checked (one ALMemory call)
+SUBSCRIBE_TIMEOUT = 5.0      # seconds for the whole batch of re-subscriptions
+RECOVERY_HISTORY = 20        # recovery times kept for get_stats()
+
+
+class BrokerSupervisor:
+    """
+    Keeps the local broker and every module's event subscriptions alive.
+    Modules subscribe through subscribe() so the supervisor can replay them.
+    """
+
+    def __init__(self, pip, pport, name="myBroker", registry=None):
+        self.pip = pip
+        self.pport = pport
+        self.name = name
+        self.registry = registry if registry is not None else get_registry(pip, pport)
+        self.memory = self.registry.get("ALMemory")
+        self.lock = threading.RLock()
+        self.broker = None
+        self.modules = OrderedDict()        # module name -> ALModule instance
+        self.subscriptions = OrderedDict()  # (event, module name) -> callback name
+        self.recovery_listeners = []
+        self.is_monitoring = False
+        self.monitor_thread = None
+        self.wake = threading.Event()
+        self.recovery_times = deque(maxlen=RECOVERY_HISTORY)
+        self.stats = {"checks": 0, "losses": 0, "recoveries": 0, "failed_recoveries": 0}
+        # A failing ALMemory call in normal traffic triggers a check right away
+        self.registry.add_health_listener(self.on_health_signal)
+
+    def start(self):
+        """Create the broker; returns it for code that still wants a handle."""
+        with self.lock:
+            self.broker = ALBroker(self.name, "0.0.0.0", 0, self.pip, self.pport)
+            return self.broker
+
+    def register_module(self, module):
+        """Track a module so it is re-registered under the same name after a broker loss."""
+        with self.lock:
+            self.modules[module.getName()] = module
+        return module
+
+    def subscribe(self, module, event, callback_name):
+        """Subscribe module.callback_name to an ALMemory event and remember it for replay."""
+        self.register_module(module)
+        self.memory.subscribeToEvent(event, module.getName(), callback_name)
+        with self.lock:
+            self.subscriptions[(event, module.getName())] = callback_name
+
+    def unsubscribe(self, module, event):
+        with self.lock:
+            self.subscriptions.pop((event, module.getName()), None)
+        self.memory.unsubscribeToEvent(event, module.getName())
+
+    def unsubscribe_all(self):
+        """Drop every subscription, e.g. on shutdown."""
+        with self.lock:
+            subscriptions = list(self.subscriptions.keys())
+            self.subscriptions.clear()
+        for event, module_name in subscriptions:
+            try:
+                self.memory.unsubscribeToEvent(event, module_name)
+            except Exception as e:
+                logger.error("Error unsubscribing {} from {}: {}".format(module_name, event, e))
+
+    def add_recovery_listener(self, callback):
+        """Call callback(seconds) after every successful recovery."""
+        self.recovery_listeners.append(callback)
+
+    def on_health_signal(self, service, healthy):
+        if service == "ALMemory" and not healthy:
+            self.wake.set()
+
+    def is_linked(self):
+        """One RPC: ALMemory answers and still lists our first subscriber."""
+        with self.lock:
+            first = next(iter(self.subscriptions), None)
+        if first is None:
+            self.registry.probe("ALMemory")
+            return True
+        event, module_name = first
+        return module_name in (self.memory.getSubscribers(event) or [])
+
+    def check(self):
+        self.stats["checks"] += 1
+        try:
+            return self.is_linked()
+        except Exception as e:
+            logger.warning("Broker link check failed: {}".format(e))
+            return False
+
+    def recover(self):
+        """Rebuild the broker, re-register modules and replay subscriptions. Returns True on success."""
+        start = time.time()
+        logger.warning("Broker link lost, rebuilding {} with {} modules and {} subscriptions".format(
+            self.name, len(self.modules), len(self.subscriptions)))
+        with self.lock:
+            try:
+                if self.broker is not None:
+                    try:
+                        self.broker.shutdown()
+                    except Exception as e:
+                        logger.warning("Old broker did not shut down cleanly: {}".format(e))
+                self.broker = ALBroker(self.name, "0.0.0.0", 0, self.pip, self.pport)
+
+                # Proxies and everything cached about the robot may be stale after the blip
+                self.registry.invalidate()
+
+                for name, module in self.modules.items():
+                    ALModule.__init__(module, name)
+
+                # Send every subscription before waiting on any of them
+                memory = self.memory.post
+                task_ids = [memory.subscribeToEvent(event, module_name, callback_name)
+                            for (event, module_name), callback_name in self.subscriptions.items()]
+                deadline = time.time() + SUBSCRIBE_TIMEOUT
+                for task_id in task_ids:
+                    remaining_ms = int((deadline - time.time()) * 1000)
+                    # A timeout of 0 means "wait forever" to NAOqi
+                    if remaining_ms < 1 or not self.memory.wait(task_id, remaining_ms):
+                        raise RuntimeError("re-subscription timed out")
+            except Exception as e:
+                self.stats["failed_recoveries"] += 1
+                logger.error("Broker recovery failed: {}".format(e))
+                return False
+
+        elapsed = time.time() - start
+        self.stats["recoveries"] += 1
+        self.recovery_times.append(elapsed)
+        logger.info("Broker recovered in {:.2f}s".format(elapsed))
+        for callback in self.recovery_listeners:
+            try:
+                callback(elapsed)
+            except Exception as e:
+                logger.error("Error in broker recovery listener: {}".format(e))
+        return True
+
+    def monitor(self):
+        """Check the link every BROKER_CHECK_SECONDS; retry a failed recovery with backoff."""
+        delay = BROKER_CHECK_SECONDS
+        attempt = 0
+        while self.is_monitoring:
+            self.wake.wait(delay)
+            self.wake.clear()
+            if not self.is_monitoring:
+                break
+            if self.check():
+                attempt = 0
+                delay = BROKER_CHECK_SECONDS
+                continue
+            if attempt == 0:
+                self.stats["losses"] += 1
+            if self.recover():
+                attempt = 0
+                delay = BROKER_CHECK_SECONDS
+            else:
+                delay = backoff_delay(attempt)
+                attempt += 1
+
+    def start_monitoring(self):
+        if not self.is_monitoring:
+            self.is_monitoring = True
+            self.monitor_thread = threading.Thread(target=self.monitor)
+            self.monitor_thread.daemon = True
+            self.monitor_thread.start()
+            logger.info("Broker supervision started")
+
+    def stop_monitoring(self):
+        if self.is_monitoring:
+            self.is_monitoring = False
+            self.wake.set()
+            if self.monitor_thread:
+                self.monitor_thread.join()
+            logger.info("Broker supervision stopped")
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["modules"] = len(self.modules)
+            stats["subscriptions"] = len(self.subscriptions)
+            stats["recovery_times"] = list(self.recovery_times)
+            return stats
@@ -1,12 +1,17 @@
 
 import json
-import requests
 import os
 import re
 import datetime
 import threading
 import sharedVars
-from myPepper import myPepper
+from qiPepper import create_pepper
+from transcriptionBackends import create_transcriber
+from behaviorCatalog import load_behaviors_list
+from tabletPage import get_tablet_page
+from thinkingFiller import FillerScheduler
+from metrics import http_request
+from operatorDashboard import get_operator_dashboard
 from dotenv import load_dotenv
 
 
@@ -49,6 +54,9 @@ LOCAL = os.getenv("LOCAL")
 
 PERSONALITY = "PREPROMPT_EVENT"
 
+# Said when the chat request fails; pre-rendered like the other fixed phrases
+APOLOGY_PHRASE = "Sorry, I didn't get that, please say again."
+
 ALLPREPROMPT = PREPROMPT + "\n\n [THIS IS WHAT YOUR ROBOT EYES SEE: " + IMAGE_PREPROMPT + " :]"
 
 class chatGPTInteract():
@@ -56,43 +64,60 @@ class chatGPTInteract():
     def __init__(self,  APIKEY):
         self.APIKEY = APIKEY
         if __name__ != "__main__":
-            self.my_pepper = myPepper(PIP=PIP, PPORT=PPORT, LOCAL=LOCAL)
+            self.my_pepper = create_pepper(PIP=PIP, PPORT=PPORT, LOCAL=LOCAL)
+
+            # The model may only launch the behaviors it is offered; report any the robot or behaviorsList.txt lacks
+            self.my_pepper.behavior_catalog.set_allowed(BEHAVIORS_ENUM)
+            undocumented = sorted(set(BEHAVIORS_ENUM) - set(load_behaviors_list()))
+            if undocumented:
+                print("BEHAVIORS_ENUM entries missing from behaviorsList.txt: " + str(undocumented))
+
+            # Thinking phrases while the user waits, only when the wait is predicted to be long
+            self.filler = FillerScheduler(self.my_pepper)
+            self.my_pepper.phrase_cache.add_phrases([APOLOGY_PHRASE])
+
+        self.dashboard = get_operator_dashboard()
+        self.answer_listeners = []
+        self.dashboard.set_personality(PERSONALITY)
 
         # Initialize conversation with a persona prompt
         self.conversation = [
             {"role": "system", "content": ALLPREPROMPT}
         ]
 
-        self.stop_thread = False  # Initialize the stop flag
+        # Speech-to-text backend, loaded once (local model or HTTP upload)
+        self.transcriber = create_transcriber(APIKEY)
 
-    def rotate_eyes(self):
-        """
-        Loop that animates Pepper's eyes while waiting for a response.
-        Runs in a background thread until self.stop_thread is True.
-        Calls self.my_pepper.change_eye_color_with_turn() to show rotating white/gray eye effect.
-        Used as a 'waiting' indicator during AI processing.
-        """
-        while not self.stop_thread:
-            print("--- MAIN - rotate_eyes")
-            self.my_pepper.change_eye_color_with_turn(200, 200, 200, 1, 1)
-            #time.sleep(0.1)  # Wait for 1 second before repeating
-            
     def start_rotate_eyes_thread(self):
         """
-        Start the eye-rotation thread.
-        Resets self.stop_thread to False, creates and starts a thread running rotate_eyes().
+        Start rotating Pepper's eyes as a 'waiting' indicator during AI processing.
+        The animation runs on the shared LED engine thread, so this returns immediately.
         """
-        self.stop_thread = False  # Make sure the flag is reset when starting
-        self.rotate_eyes_thread = threading.Thread(target=self.rotate_eyes)
-        self.rotate_eyes_thread.start()
+        self.my_pepper.start_eye_rotation(200, 200, 200, 1)
     
     def stop_rotate_eyes_thread(self):
         """
-        Stop the eye-rotation thread.
-        Sets self.stop_thread to True and joins the thread so it exits cleanly.
+        Stop the eye rotation started by start_rotate_eyes_thread().
+        Called right before the first sentence is spoken, so it also cuts off any thinking filler.
+        """
+        self.filler.answer_started()
+        self.my_pepper.stop_eye_rotation()
+        get_tablet_page().set_status("")
+        for callback in self.answer_listeners:
+            callback()
+
+    def add_answer_listener(self, callback):
+        """Call callback() as the answer starts to be spoken."""
+        self.answer_listeners.append(callback)
+
+    def launch_behaviors(self, behavior_names):
         """
-        self.stop_thread = True  # Set the flag to signal the thread to stop
-        self.rotate_eyes_thread.join()  # Wait for the thread to finish its current task and exit
+        Start the gestures requested by the model, without waiting for them.
+        Called as the sentence they accompany starts to be spoken.
+        """
+        for behavior_name in behavior_names:
+            self.my_pepper.launchAndStopBehavior(behavior_name)
+        del behavior_names[:]
 
     def update_conversation_preprompt(self):
         print("--- update_conversation_preprompt ---")
@@ -124,7 +149,7 @@ class chatGPTInteract():
                 }
             ]
         }
-        response = requests.post(CHATURL, headers=headers, json=payload)
+        response = http_request("vision", "POST", CHATURL, headers=headers, json=payload)
         if response.status_code != 200:
             return "Error getting image description: " + str(response.status_code)
         return response.json()["choices"][0]["message"]["content"]
@@ -197,7 +222,7 @@ class chatGPTInteract():
                 {"role": "user", "content": message}
             ]
         }
-        response = requests.post(CHATURL, headers=headers, json=payload)
+        response = http_request("chat", "POST", CHATURL, headers=headers, json=payload)
         return response.json()["choices"][0]["message"]["content"]
 
     def reset_chat(self):
@@ -208,6 +233,50 @@ class chatGPTInteract():
         """
         self.conversation = [{"role": "system", "content": ALLPREPROMPT}]
 
+    def get_tools(self):
+        """
+        Tool definitions offered to the chat model.
+        perform_behavior runs a Pepper behavior; change_personality switches the persona.
+        """
+        return [
+            {
+                "type": "function",
+                "function": {
+                    "name": "perform_behavior",
+                    "description": BEHAVIORS_METHOD_DESCRIPTION,
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "behavior_name": {
+                                "type": "string",
+                                "description": BEHAVIORS_DESCRIPTION,
+                                "enum": BEHAVIORS_ENUM
+                            }
+                        },
+                        "required": ["behavior_name"]
+                    }
+                }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "change_personality",
+                    "description": PERSONALITIES_METHOD_DESCRIPTION,
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "personality": {
+                                "type": "string",
+                                "description": PERSONALITIES_DESCRIPTION,
+                                "enum": PERSONALITIES_ENUM
+                            }
+                        },
+                        "required": ["personality"]
+                    }
+                }
+            }
+        ]
+
     def chat_with_gpt_stream(self, message):
         """
         Stream ChatGPT response and speak it sentence-by-sentence via Pepper.
@@ -218,6 +287,7 @@ class chatGPTInteract():
         """
         filtered_message = self.filter_text(message)
         self.conversation.append({"role": "user", "content": filtered_message})
+        self.dashboard.start_reply()
 
         headers = {
             "Authorization": "Bearer " + self.APIKEY,
@@ -229,7 +299,7 @@ class chatGPTInteract():
             "stream": True
         }
 
-        response = requests.post(CHATURL, headers=headers, json=payload, stream=True)
+        response = http_request("chat", "POST", CHATURL, headers=headers, json=payload, stream=True)
 
         full_reply = ""
         current_sentence = ""
@@ -248,6 +318,7 @@ class chatGPTInteract():
                             chunk = delta["content"]
                             full_reply += chunk
                             current_sentence += chunk
+                            self.dashboard.append_reply(chunk)
 
                             if current_sentence.rstrip().endswith((".", "!", "?")):
                                 sentence_to_say = self.filter_text(current_sentence)
@@ -265,11 +336,31 @@ class chatGPTInteract():
         self.conversation.append({"role": "assistant", "content": full_reply})
         return "done"
 
-    def chat_with_gpt_stream_behaviors(self, message):
+    def open_chat_stream(self, message):
+        """
+        Open a streaming chat request without touching the conversation.
+        Sends the current conversation plus the filtered message with the same tools
+        as chat_with_gpt_stream_behaviors(). Used for speculative requests: pass the
+        returned response to chat_with_gpt_stream_behaviors() or close() it.
+        """
+        headers = {
+            "Authorization": "Bearer " + self.APIKEY,
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": CHATMODEL,
+            "messages": self.conversation + [{"role": "user", "content": self.filter_text(message)}],
+            "stream": True,
+            "tools": self.get_tools()
+        }
+        return http_request("chat", "POST", CHATURL, headers=headers, json=payload, stream=True)
+
+    def chat_with_gpt_stream_behaviors(self, message, response=None):
         """
         Stream ChatGPT response with tool calls for behaviors and personality switching.
         Filters message, appends to conversation, starts eye-rotation thread.
-        Sends streaming request with tools: perform_behavior, change_personality.
+        Sends streaming request with tools: perform_behavior, change_personality,
+        unless an already open response (from open_chat_stream) is passed in.
         Parses streaming chunks for text and tool_calls. On sentence boundaries: stops eye
         rotation, sets eye color by personality, calls have_pepper_say() if ISNEAR.
         If tool called: perform_behavior runs behavior in thread; change_personality updates
@@ -282,59 +373,30 @@ class chatGPTInteract():
         filtered_message = self.filter_text(message)
         self.conversation.append({"role": "user", "content": filtered_message})
         self.start_rotate_eyes_thread()
+        self.dashboard.start_reply()
 
         headers = {
             "Authorization": "Bearer " + self.APIKEY,
             "Content-Type": "application/json"
         }
 
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "perform_behavior",
-                    "description": BEHAVIORS_METHOD_DESCRIPTION,
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "behavior_name": {
-                                "type": "string",
-                                "description": BEHAVIORS_DESCRIPTION,
-                                "enum": BEHAVIORS_ENUM
-                            }
-                        },
-                        "required": ["behavior_name"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "change_personality",
-                    "description": PERSONALITIES_METHOD_DESCRIPTION,
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "personality": {
-                                "type": "string",
-                                "description": PERSONALITIES_DESCRIPTION,
-                                "enum": PERSONALITIES_ENUM
-                            }
-                        },
-                        "required": ["personality"]
-                    }
-                }
-            }
-        ]
+        tools = self.get_tools()
 
-        payload = {
-            "model": CHATMODEL,
-            "messages": self.conversation,
-            "stream": True,
-            "tools": tools
-        }
+        if response is None:
+            payload = {
+                "model": CHATMODEL,
+                "messages": self.conversation,
+                "stream": True,
+                "tools": tools
+            }
+            response = http_request("chat", "POST", CHATURL, headers=headers, json=payload, stream=True)
 
-        response = requests.post(CHATURL, headers=headers, json=payload, stream=True)
+        if response.status_code != 200:
+            print("Chat request failed: " + str(response.status_code))
+            self.stop_rotate_eyes_thread()
+            if sharedVars.ISNEAR:
+                self.my_pepper.say_phrase(APOLOGY_PHRASE)
+            return "done"
 
         full_reply = ""
         current_sentence = ""
@@ -356,6 +418,7 @@ class chatGPTInteract():
                             chunk = delta["content"]
                             full_reply += chunk
                             current_sentence += chunk
+                            self.dashboard.append_reply(chunk)
 
                             if current_sentence.rstrip().endswith((".", "!", "?")):
                                 if eyes_running:
@@ -400,6 +463,7 @@ class chatGPTInteract():
 
         # Process accumulated tool calls
         second_request_needed = False
+        pending_behaviors = []  # launched with the first sentence of the follow-up reply
         for idx in sorted(tool_calls.keys()):
             tc = tool_calls[idx]
             try:
@@ -409,11 +473,11 @@ class chatGPTInteract():
 
             if tc["name"] == "perform_behavior":
                 behavior_name = args.get("behavior_name", "")
-                behavior_thread = threading.Thread(
-                    target=self.my_pepper.launchAndStopBehavior,
-                    args=(behavior_name,)
-                )
-                behavior_thread.start()
+                catalog = self.my_pepper.behavior_catalog
+                if catalog.is_allowed(behavior_name) and catalog.is_installed(behavior_name):
+                    pending_behaviors.append(behavior_name)
+                else:
+                    print("Behavior '{}' is not available.".format(behavior_name))
                 second_request_needed = True
 
             elif tc["name"] == "change_personality":
@@ -424,6 +488,7 @@ class chatGPTInteract():
                 else:
                     PREPROMPT = PREPROMPT_EVENT
                     PERSONALITY = "PREPROMPT_EVENT"
+                self.dashboard.set_personality(PERSONALITY)
                 ALLPREPROMPT = PREPROMPT + "\n\n [THIS IS WHAT YOUR ROBOT EYES SEE: " + IMAGE_PREPROMPT + " :]"
                 self.reset_chat()
                 self.conversation.append({"role": "user", "content": filtered_message})
@@ -438,7 +503,7 @@ class chatGPTInteract():
                 "tools": tools,
                 "tool_choice": "none"
             }
-            response2 = requests.post(CHATURL, headers=headers, json=payload2, stream=True)
+            response2 = http_request("chat", "POST", CHATURL, headers=headers, json=payload2, stream=True)
 
             full_reply = ""
             current_sentence = ""
@@ -457,12 +522,14 @@ class chatGPTInteract():
                                 chunk = delta["content"]
                                 full_reply += chunk
                                 current_sentence += chunk
+                                self.dashboard.append_reply(chunk)
 
                                 if current_sentence.rstrip().endswith((".", "!", "?")):
                                     if PERSONALITY == "PREPROMPT_SPICY":
                                         self.my_pepper.fade_eyes(PREPROMPT_SPICY_COLOR)
                                     else:
                                         self.my_pepper.fade_eyes(PREPROMPT_EVENT_COLOR)
+                                    self.launch_behaviors(pending_behaviors)
                                     if sharedVars.ISNEAR:
                                         sentence_to_say = self.filter_text(current_sentence)
                                         if sentence_to_say.strip():
@@ -471,6 +538,9 @@ class chatGPTInteract():
                         except (ValueError, KeyError):
                             pass
 
+            # Gestures still pending if the reply had no sentence to pair them with
+            self.launch_behaviors(pending_behaviors)
+
             if current_sentence.strip() and sharedVars.ISNEAR:
                 sentence_to_say = self.filter_text(current_sentence)
                 if sentence_to_say.strip():
@@ -497,7 +567,7 @@ class chatGPTInteract():
             "model": CHATMODEL,
             "messages": self.conversation
         }
-        response = requests.post(CHATURL, headers=headers, json=payload)
+        response = http_request("chat", "POST", CHATURL, headers=headers, json=payload)
         reply = response.json()["choices"][0]["message"]["content"]
         self.conversation.append({"role": "assistant", "content": reply})
         return reply
@@ -505,24 +575,12 @@ class chatGPTInteract():
 
     def transcribe_audio_file(self, file_path):
         """
-        Transcribe an audio file to text using the transcription API (e.g., Whisper).
-        Sends file to TRANSCRIPTIONURL. Returns the response object (or error placeholder).
-        Handles request exceptions.
+        Transcribe an audio file to text.
+        Delegates to self.transcriber, which uploads to TRANSCRIPTIONURL or runs the
+        local model depending on TRANSCRIPTION_BACKEND, utterance length and network RTT.
+        Returns an object with a .text attribute, or None on failure.
         """
-        try:
-            headers = {"Authorization": "Bearer " + self.APIKEY}
-            files = {"file": (os.path.basename(file_path), open(file_path, "rb"), "audio/wav")}
-            data = {"model": TRANSCRIPTIONMODEL}
-            response = requests.post(TRANSCRIPTIONURL, headers=headers, files=files, data=data)
-
-            class TranscriptionResult(object):
-                pass
-            result = TranscriptionResult()
-            result.text = response.json()["text"]
-            return result
-        except requests.exceptions.RequestException as e:
-            print("Transcription request error: " + str(e))
-            return None
+        return self.transcriber.transcribe(file_path)
 
 # Example usage:
 
@@ -0,0 +1,161 @@
+"""
+Per-service circuit breakers for Pepper's NAOqi proxies
+A breaker opens after repeated connection failures so callers fail fast instead of
+waiting on a dead service; a background worker retries the service with jittered
+exponential backoff (half-open) and closes the breaker once a trial succeeds.
+Python 2.7 compatible version.
+"""
+
+import time
+import random
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 2        # consecutive connection failures that open the breaker
+BACKOFF_BASE_SECONDS = 0.5   # first retry delay; doubles with every failed trial
+BACKOFF_MAX_SECONDS = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose breaker is open."""
+    pass
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE_SECONDS, maximum=BACKOFF_MAX_SECONDS, rng=random):
+    """Exponential delay for the given retry attempt, with half of it jittered."""
+    delay = min(maximum, base * (2 ** attempt))
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. Open: calls fail fast until retry_at.
+    Half-open: one recovery trial is running; calls still fail fast.
+    """
+
+    def __init__(self, service, failure_threshold=FAILURE_THRESHOLD):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.attempt = 0
+        self.retry_at = 0
+        self.opened_at = None
+        self.stats = {"opened": 0, "rejected": 0, "trials": 0}
+
+    def allow_request(self):
+        if self.state == CLOSED:
+            return True
+        with self.lock:
+            self.stats["rejected"] += 1
+        return False
+
+    def record_success(self):
+        if self.state == CLOSED and self.failures == 0:
+            return  # the common case, on every successful call
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info("Circuit for {} closed after {:.1f}s".format(self.service, time.time() - self.opened_at))
+            self.state = CLOSED
+            self.failures = 0
+            self.attempt = 0
+
+    def record_failure(self):
+        """Count a connection failure. Returns True if the breaker is (still) open."""
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                if self.state == CLOSED:
+                    self.opened_at = time.time()
+                    self.stats["opened"] += 1
+                    logger.warning("Circuit for {} opened after {} failures".format(self.service, self.failures))
+                self.state = OPEN
+                self.retry_at = time.time() + backoff_delay(self.attempt)
+                self.attempt += 1
+            return self.state == OPEN
+
+    def trip(self):
+        """Open now (a probe found the service dead); the first trial may start at once."""
+        with self.lock:
+            if self.state == CLOSED:
+                self.opened_at = time.time()
+                self.stats["opened"] += 1
+                logger.warning("Circuit for {} opened by health check".format(self.service))
+                self.state = OPEN
+                self.retry_at = time.time()
+
+    def start_trial(self):
+        """Move to half-open for a recovery attempt; False if the breaker is not open."""
+        with self.lock:
+            if self.state != OPEN:
+                return False
+            self.state = HALF_OPEN
+            self.stats["trials"] += 1
+            return True
+
+    def get_state(self):
+        with self.lock:
+            state = {"state": self.state, "failures": self.failures, "attempt": self.attempt}
+            if self.state != CLOSED:
+                state["retry_in"] = max(0.0, self.retry_at - time.time())
+            state.update(self.stats)
+            return state
+
+
+class RecoveryWorker:
+    """
+    Background scheduler that runs recover(service) for open breakers when their
+    backoff has elapsed. Each trial gets its own thread so a service that hangs does
+    not hold up the others; the breaker allows one trial per service at a time.
+    """
+
+    def __init__(self, recover):
+        self.recover = recover
+        self.condition = threading.Condition()
+        self.scheduled = {}   # service -> time to try
+        self.thread = None
+
+    def schedule(self, service, at_time):
+        with self.condition:
+            self.scheduled[service] = at_time
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify_all()
+
+    def is_scheduled(self, service):
+        with self.condition:
+            return service in self.scheduled
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if not self.scheduled:
+                        self.thread = None
+                        return
+                    service = min(self.scheduled, key=self.scheduled.get)
+                    remaining = self.scheduled[service] - time.time()
+                    if remaining <= 0:
+                        del self.scheduled[service]
+                        break
+                    self.condition.wait(remaining)
+            trial = threading.Thread(target=self._trial, args=(service,))
+            trial.daemon = True
+            trial.start()
+
+    def _trial(self, service):
+        try:
+            self.recover(service)
+        except Exception as e:
+            logger.error("Recovery of {} failed: {}".format(service, e))
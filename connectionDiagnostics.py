@@ -5,8 +5,13 @@ This script helps diagnose connection issues and provides recovery recommendatio
 """
 
 import time
+import json
+import socket
+import threading
 import traceback
 from naoqi import ALProxy
+from proxyRegistry import PROBE_METHODS, DEFAULT_PROBE_METHOD
+from metrics import percentile
 import logging
 import sys
 
@@ -14,6 +19,13 @@ import sys
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+PROFILE_CALLS = 50            # timed calls per service in profiling mode
+PROFILE_INTERVAL = 0.05       # pause between calls, so samples spread over a few seconds
+# A venue is judged able to carry the robot if every critical service stays within these
+PROFILE_MAX_P95 = 0.25        # seconds
+PROFILE_MAX_FAILURE_RATE = 0.01
+
+
 class PepperConnectionDiagnostics:
     """
     Comprehensive diagnostics for Pepper robot connections and common issues.
@@ -290,6 +302,136 @@ class PepperConnectionDiagnostics:
         
         return issues
 
+    def summarize_samples(self, rtts, failures):
+        """RTT distribution, jitter and failure rate of one series of timed calls."""
+        summary = {"calls": len(rtts) + failures, "failures": failures,
+                   "failure_rate": float(failures) / max(1, len(rtts) + failures)}
+        if rtts:
+            summary.update({
+                "min": min(rtts),
+                "p50": percentile(rtts, 0.50),
+                "p95": percentile(rtts, 0.95),
+                "max": max(rtts),
+                "mean": sum(rtts) / len(rtts),
+                # mean change between consecutive calls, as RTP measures jitter
+                "jitter": (sum(abs(b - a) for a, b in zip(rtts, rtts[1:])) / (len(rtts) - 1)
+                           if len(rtts) > 1 else 0.0),
+            })
+        return summary
+
+    def profile_tcp(self, calls=PROFILE_CALLS):
+        """Time TCP connects to NAOqi: the network alone, without any service behind it."""
+        rtts = []
+        failures = 0
+        for _ in range(calls):
+            try:
+                start = time.time()
+                sock = socket.create_connection((self.pip, self.pport), timeout=2)
+                rtts.append(time.time() - start)
+                sock.close()
+            except Exception:
+                failures += 1
+            time.sleep(PROFILE_INTERVAL)
+        return self.summarize_samples(rtts, failures)
+
+    def profile_service(self, service_name, calls=PROFILE_CALLS):
+        """Create a proxy (timed), then time calls to the service's cheapest method."""
+        result = {"service": service_name}
+        try:
+            start = time.time()
+            proxy = ALProxy(service_name, self.pip, self.pport)
+            result["proxy_creation"] = time.time() - start
+        except Exception as e:
+            result["error"] = str(e)
+            result.update(self.summarize_samples([], calls))
+            return result
+
+        method = getattr(proxy, PROBE_METHODS.get(service_name, DEFAULT_PROBE_METHOD))
+        rtts = []
+        failures = 0
+        for _ in range(calls):
+            try:
+                start = time.time()
+                method()
+                rtts.append(time.time() - start)
+            except Exception as e:
+                failures += 1
+                result["error"] = str(e)
+            time.sleep(PROFILE_INTERVAL)
+        result.update(self.summarize_samples(rtts, failures))
+        return result
+
+    def profile_latency(self, calls=PROFILE_CALLS, venue=None):
+        """
+        Profile every service concurrently (one thread each, plus one for TCP) and
+        judge whether the network can support the robot. Returns a JSON-ready report.
+        """
+        services = self.critical_services + self.optional_services
+        logger.info("Profiling {} services with {} calls each...".format(len(services), calls))
+        results = {}
+
+        def run(name, target, *args):
+            results[name] = target(*args)
+
+        started = time.time()
+        threads = [threading.Thread(target=run, args=("tcp", self.profile_tcp, calls))]
+        threads += [threading.Thread(target=run, args=(service, self.profile_service, service, calls))
+                    for service in services]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        problems = []
+        for service in self.critical_services:
+            result = results[service]
+            if result["failure_rate"] > PROFILE_MAX_FAILURE_RATE:
+                problems.append("{} failed {:.1%} of calls".format(service, result["failure_rate"]))
+            if result.get("p95", 0) > PROFILE_MAX_P95:
+                problems.append("{} p95 is {:.0f}ms".format(service, result["p95"] * 1000))
+
+        return {
+            "venue": venue,
+            "target": "{}:{}".format(self.pip, self.pport),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "calls_per_service": calls,
+            "duration": time.time() - started,
+            "thresholds": {"max_p95": PROFILE_MAX_P95, "max_failure_rate": PROFILE_MAX_FAILURE_RATE},
+            "suitable": not problems,
+            "problems": problems,
+            "tcp": results.pop("tcp"),
+            "services": results,
+        }
+
+    def print_profile(self, report):
+        logger.info("=" * 60)
+        logger.info("LATENCY PROFILE ({} calls per service)".format(report["calls_per_service"]))
+        logger.info("=" * 60)
+        logger.info("   {:<22} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>6}".format(
+            "service", "create", "min", "p50", "p95", "max", "jitter", "fail"))
+        rows = [("tcp connect", report["tcp"])] + sorted(report["services"].items())
+        for name, result in rows:
+            times = ["{:.1f}".format(result[key] * 1000) if key in result else "-"
+                     for key in ("proxy_creation", "min", "p50", "p95", "max", "jitter")]
+            logger.info("   {:<22} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>6}".format(
+                name, *(times + ["{:.1%}".format(result["failure_rate"])])))
+        if report["suitable"]:
+            logger.info("[OK] Network is suitable for the robot")
+        else:
+            for problem in report["problems"]:
+                logger.info("[FAIL] {}".format(problem))
+
+
+def write_profile_report(report, path=None):
+    """Write a profile as JSON so venues and runs can be compared; returns the path."""
+    if path is None:
+        path = "latency_profile_{}_{}.json".format(report["venue"] or "robot", time.strftime("%Y%m%d_%H%M%S"))
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+    logger.info("Latency profile written to {}".format(path))
+    return path
+
 
 def monitor_realtime_connections(pip, pport, duration=30):
     """Monitor connections in real-time for a specified duration."""
@@ -323,11 +465,23 @@ def main():
         print("Usage: python connectionDiagnostics.py <robot_ip> <port> [monitor_duration]")
         print("Example: python connectionDiagnostics.py 192.168.8.204 9559")
         print("Example: python connectionDiagnostics.py 192.168.8.204 9559 60  # Monitor for 60 seconds")
+        print("Profile: python connectionDiagnostics.py <robot_ip> <port> profile [calls] [venue] [output.json]")
         sys.exit(1)
     
     pip = sys.argv[1]
     pport = int(sys.argv[2])
     
+    # Latency profiling mode: timed calls only, written as JSON
+    if len(sys.argv) > 3 and sys.argv[3] == "profile":
+        calls = int(sys.argv[4]) if len(sys.argv) > 4 else PROFILE_CALLS
+        venue = sys.argv[5] if len(sys.argv) > 5 else None
+        output = sys.argv[6] if len(sys.argv) > 6 else None
+        diagnostics = PepperConnectionDiagnostics(pip, pport)
+        report = diagnostics.profile_latency(calls, venue)
+        diagnostics.print_profile(report)
+        write_profile_report(report, output)
+        sys.exit(0 if report["suitable"] else 1)
+    
     # Run diagnostics
     diagnostics = PepperConnectionDiagnostics(pip, pport)
     issues = diagnostics.run_full_diagnostics()
@@ -7,30 +7,33 @@ Python 2.7 compatible version.
 import time
 import threading
 import traceback
-from naoqi import ALProxy
 from naoqi import ALBroker
 from naoqi import ALModule
+from proxyRegistry import get_registry
+from circuitBreaker import CircuitOpenError
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+PROBE_TIMEOUT = 2.0          # seconds a probe may take before the service counts as down
+MAX_PROBE_INTERVAL = 60      # seconds; the probe interval of a healthy service doubles up to this
+
 class ConnectionMonitor:
     """
     Monitors connections to Pepper robot and provides automatic recovery mechanisms.
     """
     
-    def __init__(self, pip, pport, monitoring_interval=5):
+    def __init__(self, pip, pport, monitoring_interval=5, registry=None):
         self.pip = pip
         self.pport = pport
         self.monitoring_interval = monitoring_interval
         self.is_monitoring = False
         self.monitor_thread = None
-        self.connections = {}
-        self.connection_status = {}
+        # Proxies and their health are shared with myPepper and the main modules
+        self.registry = registry if registry is not None else get_registry(pip, pport)
         self.reconnect_attempts = {}
-        self.max_reconnect_attempts = 3
         self.callbacks = {}
         
         # Initialize connection status tracking
@@ -42,8 +45,18 @@ class ConnectionMonitor:
         ]
         
         for proxy_type in self.proxy_types:
-            self.connection_status[proxy_type] = False
             self.reconnect_attempts[proxy_type] = 0
+
+        # Adaptive probing: services are probed concurrently, healthy ones less and less
+        # often, and not at all while real traffic keeps showing they work
+        self.lock = threading.Lock()
+        self.connected = dict((proxy_type, False) for proxy_type in self.proxy_types)
+        self.probe_interval = dict((proxy_type, monitoring_interval) for proxy_type in self.proxy_types)
+        self.next_probe = dict((proxy_type, 0) for proxy_type in self.proxy_types)
+        self.in_flight = set()
+        self.wake = threading.Event()
+        self.probe_stats = {"probes": 0, "failures": 0, "timeouts": 0, "skipped_by_traffic": 0}
+        self.registry.add_health_listener(self.on_health_signal)
     
     def add_disconnect_callback(self, proxy_type, callback):
         """Add a callback to be executed when a specific proxy disconnects."""
@@ -54,75 +67,105 @@ class ConnectionMonitor:
     def test_connection(self, proxy_type):
         """Test if a specific proxy connection is working."""
         try:
-            if proxy_type not in self.connections:
-                self.connections[proxy_type] = ALProxy(proxy_type, self.pip, self.pport)
-            
-            # Test the connection with a safe method call
-            proxy = self.connections[proxy_type]
-            
-            if proxy_type == "ALTextToSpeech":
-                proxy.getAvailableLanguages()
-            elif proxy_type == "ALMotion":
-                proxy.getSummary()
-            elif proxy_type == "ALMemory":
-                proxy.getEventList()
-            elif proxy_type == "ALBehaviorManager":
-                proxy.getInstalledBehaviors()
-            elif proxy_type == "ALLeds":
-                proxy.listGroups()
-            elif proxy_type == "ALVideoDevice":
-                proxy.getCameraName(0)
-            elif proxy_type == "ALAutonomousLife":
-                proxy.getState()
-            elif proxy_type == "ALTabletService":
-                proxy.robotIp()
-            elif proxy_type == "PackageManager":
-                proxy.packages()
-            elif proxy_type == "ALSpeechRecognition":
-                proxy.getAvailableLanguages()
-            elif proxy_type == "ALAnimatedSpeech":
-                proxy.getTagsConfiguration()
-            elif proxy_type == "ALPeoplePerception":
-                proxy.getCurrentPeriod()
-            
+            # Test the connection with the lightest call the service has
+            self.registry.probe(proxy_type)
             return True
             
         except Exception as e:
             logger.warning("Connection test failed for {}: {}".format(proxy_type, e))
+            self.registry.mark_failed(proxy_type, e)
             return False
     
-    def recover_connection(self, proxy_type):
-        """Attempt to recover a failed connection."""
-        try:
-            logger.info("Attempting to recover connection for {}".format(proxy_type))
-            
-            # Remove the failed connection
-            if proxy_type in self.connections:
-                del self.connections[proxy_type]
-            
-            # Wait a moment before attempting reconnection
-            time.sleep(1)
-            
-            # Create new connection
-            self.connections[proxy_type] = ALProxy(proxy_type, self.pip, self.pport)
-            
-            # Test the new connection
-            if self.test_connection(proxy_type):
-                logger.info("Successfully recovered connection for {}".format(proxy_type))
-                self.reconnect_attempts[proxy_type] = 0
-                self.connection_status[proxy_type] = True
-                return True
+    def probe_all(self, proxy_types, timeout=PROBE_TIMEOUT):
+        """
+        Test several connections at once. Returns {proxy_type: connected}; a probe
+        still running after timeout counts as failed (its thread is left to finish).
+        """
+        results = {}
+
+        def probe(proxy_type):
+            try:
+                results[proxy_type] = self.test_connection(proxy_type)
+            finally:
+                with self.lock:
+                    self.in_flight.discard(proxy_type)
+
+        threads = []
+        for proxy_type in proxy_types:
+            with self.lock:
+                self.in_flight.add(proxy_type)
+            thread = threading.Thread(target=probe, args=(proxy_type,))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        deadline = time.time() + timeout
+        for thread in threads:
+            thread.join(max(0, deadline - time.time()))
+
+        outcome = {}
+        for proxy_type in proxy_types:
+            if proxy_type in results:
+                outcome[proxy_type] = results[proxy_type]
             else:
-                logger.error("Failed to recover connection for {}".format(proxy_type))
-                return False
-                
-        except Exception as e:
-            logger.error("Error during connection recovery for {}: {}".format(proxy_type, e))
+                logger.warning("Connection test timed out for {}".format(proxy_type))
+                self.probe_stats["timeouts"] += 1
+                self.registry.mark_failed(proxy_type, "probe timed out after {}s".format(timeout))
+                outcome[proxy_type] = False
+        return outcome
+
+    def on_health_signal(self, proxy_type, healthy):
+        """Registry listener: a failure in real traffic, or a recovery, gets the service probed right away."""
+        if proxy_type in self.next_probe and healthy != self.connected[proxy_type]:
+            self.next_probe[proxy_type] = 0
+            self.wake.set()
+
+    def is_probe_due(self, proxy_type, now):
+        if proxy_type in self.in_flight:
             return False
+        if not self.registry.is_available(proxy_type):
+            return False  # the registry's recovery worker is already retrying it
+        health = self.registry.health.get(proxy_type)
+        if health is not None and self.connected[proxy_type]:
+            if not health["healthy"]:
+                return True  # failed in real traffic
+            if now - health["checked_at"] < self.probe_interval[proxy_type]:
+                # A real call succeeded recently; that is as good as a probe
+                if now >= self.next_probe[proxy_type]:
+                    self.probe_stats["skipped_by_traffic"] += 1
+                    self.next_probe[proxy_type] = health["checked_at"] + self.probe_interval[proxy_type]
+                return False
+        return now >= self.next_probe[proxy_type]
+
+    def record_probe(self, proxy_type, connected):
+        """Update the schedule and the connection state from one probe result."""
+        was_connected = self.connected[proxy_type]
+        self.probe_stats["probes"] += 1
+        if connected:
+            if not was_connected:  # Was disconnected, now connected
+                logger.info("Connection restored for {}".format(proxy_type))
+                self.reconnect_attempts[proxy_type] = 0
+            self.registry.mark_healthy(proxy_type)
+            self.probe_interval[proxy_type] = min(self.probe_interval[proxy_type] * 2, MAX_PROBE_INTERVAL)
+        else:
+            self.probe_stats["failures"] += 1
+            self.probe_interval[proxy_type] = self.monitoring_interval
+        self.connected[proxy_type] = connected
+        self.next_probe[proxy_type] = time.time() + self.probe_interval[proxy_type]
+        if was_connected and not connected:  # Was connected, now disconnected
+            self.handle_disconnect(proxy_type)
+
+    def recover_connection(self, proxy_type):
+        """
+        Start recovering a failed connection without waiting for it: the service's
+        circuit breaker opens (callers fail fast) and the registry's background worker
+        re-creates the proxy with jittered exponential backoff until it answers.
+        """
+        logger.info("Scheduling recovery for {}".format(proxy_type))
+        self.registry.request_recovery(proxy_type)
     
     def handle_disconnect(self, proxy_type):
         """Handle a detected disconnect."""
-        self.connection_status[proxy_type] = False
         self.reconnect_attempts[proxy_type] += 1
         
         logger.warning("Disconnect detected for {} (attempt {})".format(proxy_type, self.reconnect_attempts[proxy_type]))
@@ -135,32 +178,23 @@ class ConnectionMonitor:
                 except Exception as e:
                     logger.error("Error in disconnect callback for {}: {}".format(proxy_type, e))
         
-        # Attempt recovery if within limits
-        if self.reconnect_attempts[proxy_type] <= self.max_reconnect_attempts:
-            if self.recover_connection(proxy_type):
-                logger.info("Connection recovered for {}".format(proxy_type))
-            else:
-                logger.error("Failed to recover connection for {}".format(proxy_type))
-        else:
-            logger.error("Max reconnection attempts reached for {}".format(proxy_type))
+        self.recover_connection(proxy_type)
     
     def monitor_connections(self):
         """Main monitoring loop."""
         logger.info("Starting connection monitoring...")
         
         while self.is_monitoring:
-            for proxy_type in self.proxy_types:
-                if not self.test_connection(proxy_type):
-                    if self.connection_status[proxy_type]:  # Was connected, now disconnected
-                        self.handle_disconnect(proxy_type)
-                else:
-                    # Connection is good
-                    if not self.connection_status[proxy_type]:  # Was disconnected, now connected
-                        logger.info("Connection restored for {}".format(proxy_type))
-                        self.reconnect_attempts[proxy_type] = 0
-                    self.connection_status[proxy_type] = True
-            
-            time.sleep(self.monitoring_interval)
+            now = time.time()
+            due = [proxy_type for proxy_type in self.proxy_types if self.is_probe_due(proxy_type, now)]
+            if due:
+                for proxy_type, connected in self.probe_all(due).items():
+                    self.record_probe(proxy_type, connected)
+
+            # Sleep until the next scheduled probe, or until traffic reports a failure
+            waits = [self.next_probe[proxy_type] - time.time() for proxy_type in self.proxy_types]
+            self.wake.wait(max(0.1, min(waits + [self.monitoring_interval])))
+            self.wake.clear()
     
     def start_monitoring(self):
         """Start the connection monitoring in a separate thread."""
@@ -175,25 +209,32 @@ class ConnectionMonitor:
         """Stop the connection monitoring."""
         if self.is_monitoring:
             self.is_monitoring = False
+            self.wake.set()
             if self.monitor_thread:
                 self.monitor_thread.join()
             logger.info("Connection monitoring stopped")
     
     def get_proxy(self, proxy_type):
-        """Get a proxy with automatic connection handling."""
-        if proxy_type not in self.connections or not self.connection_status[proxy_type]:
-            if not self.recover_connection(proxy_type):
-                raise RuntimeError("Unable to establish connection to {}".format(proxy_type))
+        """Get a proxy with automatic connection handling; fails fast while the service is down."""
+        if not self.registry.is_available(proxy_type):
+            raise CircuitOpenError("Unable to establish connection to {} (recovery in progress)".format(proxy_type))
         
-        return self.connections[proxy_type]
+        return self.registry.get(proxy_type)
     
     def is_connected(self, proxy_type):
         """Check if a specific proxy is connected."""
-        return self.connection_status.get(proxy_type, False)
+        return self.registry.is_healthy(proxy_type)
     
     def get_connection_status(self):
         """Get the status of all connections."""
-        return self.connection_status.copy()
+        return dict((proxy_type, self.registry.is_healthy(proxy_type)) for proxy_type in self.proxy_types)
+
+    def get_probe_stats(self):
+        """Probe counts, plus the current probe interval of every service."""
+        stats = dict(self.probe_stats)
+        stats["intervals"] = dict(self.probe_interval)
+        stats["breakers"] = self.registry.get_breaker_states()
+        return stats
 
 
 class SafeEventHandler:
@@ -201,8 +242,10 @@ class SafeEventHandler:
     Provides safe event subscription and unsubscription with automatic recovery.
     """
     
-    def __init__(self, connection_monitor):
+    def __init__(self, connection_monitor, supervisor=None):
         self.connection_monitor = connection_monitor
+        # With a BrokerSupervisor, subscriptions are also replayed after a broker loss
+        self.supervisor = supervisor
         self.subscriptions = {}  # event -> (handler, method_name)
         self.active_subscriptions = set()
     
@@ -215,7 +258,10 @@ class SafeEventHandler:
             self.subscriptions[event_name] = (handler, method_name)
             
             # Subscribe to the event
-            memory.subscribeToEvent(event_name, handler.getName(), method_name)
+            if self.supervisor is not None:
+                self.supervisor.subscribe(handler, event_name, method_name)
+            else:
+                memory.subscribeToEvent(event_name, handler.getName(), method_name)
             self.active_subscriptions.add(event_name)
             
             logger.info("Successfully subscribed to event: {}".format(event_name))
@@ -233,7 +279,10 @@ class SafeEventHandler:
                 
                 # Check if the memory module is still available
                 if self.connection_monitor.is_connected("ALMemory"):
-                    memory.unsubscribeToEvent(event_name, handler.getName())
+                    if self.supervisor is not None:
+                        self.supervisor.unsubscribe(handler, event_name)
+                    else:
+                        memory.unsubscribeToEvent(event_name, handler.getName())
                     logger.info("Successfully unsubscribed from event: {}".format(event_name))
                 else:
                     logger.warning("Memory module unavailable, skipping unsubscribe for: {}".format(event_name))
@@ -256,9 +305,10 @@ class SafeEventHandler:
         """Resubscribe to all previously active events after a reconnection."""
         logger.info("Resubscribing to all events after reconnection...")
         
-        for event_name, (handler, method_name) in self.subscriptions.items():
-            if event_name not in self.active_subscriptions:
-                self.subscribe_to_event(event_name, handler, method_name)
+        # The robot may have dropped every subscription, including the ones we think are active
+        self.active_subscriptions.clear()
+        for event_name, (handler, method_name) in list(self.subscriptions.items()):
+            self.subscribe_to_event(event_name, handler, method_name)
     
     def unsubscribe_all(self, handlers):
         """Safely unsubscribe from all events."""
@@ -301,15 +351,16 @@ class RobustALModule(ALModule):
         return self.connection_monitor.get_proxy(proxy_type)
 
 
-def create_robust_pepper_system(pip, pport):
+def create_robust_pepper_system(pip, pport, supervisor=None):
     """
     Factory function to create a robust Pepper system with connection monitoring.
+    Pass a BrokerSupervisor to have subscriptions replayed after a broker loss too.
     """
     # Create connection monitor
     connection_monitor = ConnectionMonitor(pip, pport)
     
     # Create event handler
-    event_handler = SafeEventHandler(connection_monitor)
+    event_handler = SafeEventHandler(connection_monitor, supervisor)
     
     # Set up ALMemory reconnection callback to resubscribe to events
     connection_monitor.add_disconnect_callback("ALMemory", lambda proxy_type: event_handler.resubscribe_all())
@@ -0,0 +1,182 @@
+"""
+Conversation state machine for Pepper
+One object owns the conversation state (Idle, Listening, Transcribing, Thinking,
+Speaking, Ending) behind a condition variable. Taps and arrivals change it directly
+and wake the main loop at once instead of on its next poll; every transition is
+timestamped. Each session has a generation number so a turn still running when the
+session ends can tell that its results are stale.
+sharedVars.ISNEAR is kept in step for the modules that still read it.
+Python 2.7 compatible version.
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+import sharedVars
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"
+LISTENING = "listening"
+TRANSCRIBING = "transcribing"
+THINKING = "thinking"
+SPEAKING = "speaking"
+ENDING = "ending"
+
+TRANSITION_HISTORY = 100     # transitions kept for get_history()
+
+# Allowed moves; ENDING can be entered from anywhere while a session is active
+TRANSITIONS = {
+    IDLE: (LISTENING, ENDING),
+    LISTENING: (TRANSCRIBING, LISTENING, ENDING),
+    TRANSCRIBING: (THINKING, LISTENING, ENDING),
+    THINKING: (SPEAKING, LISTENING, ENDING),
+    SPEAKING: (LISTENING, ENDING),
+    ENDING: (IDLE,),
+}
+
+
+class InvalidTransition(RuntimeError):
+    pass
+
+
+class ConversationState:
+    """
+    The current state, whether someone is engaged (active), and the session generation.
+    """
+
+    def __init__(self, active=True):
+        self.condition = threading.Condition()
+        self.state = IDLE
+        self.active = active
+        self.generation = 0
+        self.entered_at = time.time()
+        self.history = deque(maxlen=TRANSITION_HISTORY)
+        self.time_in_state = {}
+        self.listeners = []
+        sharedVars.ISNEAR = active
+
+    def add_listener(self, callback):
+        """Call callback(old_state, new_state, reason) after every transition."""
+        self.listeners.append(callback)
+
+    def _move(self, new_state, reason):
+        # Called with the condition held; returns the listener arguments
+        old_state = self.state
+        if new_state not in TRANSITIONS[old_state]:
+            raise InvalidTransition("{} -> {}".format(old_state, new_state))
+        now = time.time()
+        self.time_in_state[old_state] = self.time_in_state.get(old_state, 0.0) + now - self.entered_at
+        self.history.append((now, old_state, new_state, reason))
+        self.state = new_state
+        self.entered_at = now
+        self.condition.notify_all()
+        return old_state, new_state, reason
+
+    def _notify(self, change):
+        if change is None:
+            return
+        logger.info("Conversation {} -> {} ({})".format(*change))
+        for callback in self.listeners:
+            try:
+                callback(*change)
+            except Exception as e:
+                logger.error("Error in conversation listener: {}".format(e))
+
+    def transition(self, new_state, generation=None, reason=""):
+        """
+        Move to new_state. With generation, only if that session is still the current
+        one; returns False (and changes nothing) when the session has moved on.
+        """
+        with self.condition:
+            if generation is not None and generation != self.generation:
+                return False
+            change = self._move(new_state, reason)
+        self._notify(change)
+        return True
+
+    def advance(self, from_state, new_state, reason=""):
+        """Move to new_state only if the state is still from_state; for callers outside the main loop."""
+        with self.condition:
+            if self.state != from_state:
+                return False
+            change = self._move(new_state, reason)
+        self._notify(change)
+        return True
+
+    def begin_session(self, reason=""):
+        """Someone engaged (tap, arrival): wake the main loop to listen."""
+        with self.condition:
+            if not self.active:
+                self.active = True
+                self.generation += 1
+                sharedVars.ISNEAR = True
+                logger.info("Conversation session {} started ({})".format(self.generation, reason))
+                self.condition.notify_all()
+            return self.generation
+
+    def end_session(self, reason=""):
+        """The person left or tapped to stop: the running turn becomes stale at once."""
+        with self.condition:
+            if not self.active:
+                return False
+            self.active = False
+            self.generation += 1
+            sharedVars.ISNEAR = False
+            change = self._move(ENDING, reason) if self.state != ENDING else None
+        self._notify(change)
+        return True
+
+    def finish_ending(self):
+        """The main loop has stopped the turn; go idle until the next session."""
+        with self.condition:
+            change = self._move(IDLE, "turn stopped") if self.state == ENDING else None
+        self._notify(change)
+
+    def is_active(self):
+        return self.active
+
+    def is_current(self, generation):
+        return self.active and generation == self.generation
+
+    def wait_for_session(self, timeout=None):
+        """Block until someone is engaged; returns the session generation, or None on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while not self.active:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            return self.generation
+
+    def wait_while(self, states, timeout=None):
+        """Block while the state is one of states; returns the state reached."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while self.state in states:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return self.state
+
+    def get_state(self):
+        with self.condition:
+            return self.state, time.time() - self.entered_at
+
+    def get_history(self):
+        """Transitions as (timestamp, from, to, reason), oldest first."""
+        with self.condition:
+            return list(self.history)
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.time_in_state)
+            stats[self.state] = stats.get(self.state, 0.0) + time.time() - self.entered_at
+            stats["transitions"] = len(self.history)
+            stats["generation"] = self.generation
+            return stats
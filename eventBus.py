@@ -0,0 +1,179 @@
+"""
+In-process event bus for Pepper's ALMemory events
+One bridge ALModule holds a single subscription per event; its NAOqi callback only
+enqueues. Handlers run on a small worker pool, one call at a time per handler, with
+optional filtering, debouncing (a tap storm becomes one action) and coalescing (only
+the latest value of a state event is handled). Queue depth and handler latency are
+tracked per handler.
+Python 2.7 compatible version.
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+from naoqi import ALModule
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EVENT_WORKERS = 4            # handlers that may run at the same time
+MAX_PENDING_PER_HANDLER = 50 # events waiting for one handler before new ones are dropped
+
+
+class Subscription:
+    """One handler of one event, with its own pending events and counters."""
+
+    def __init__(self, event, handler, when=None, debounce=0.0, coalesce=False):
+        self.event = event
+        self.handler = handler
+        self.name = "{}:{}".format(event, getattr(handler, "__name__", repr(handler)))
+        self.when = when
+        self.debounce = debounce
+        self.coalesce = coalesce
+        self.pending = deque()
+        self.queued = False      # waiting in the bus's ready queue
+        self.running = False
+        self.last_accepted = 0
+        self.stats = {"received": 0, "handled": 0, "filtered": 0, "debounced": 0, "coalesced": 0,
+                      "dropped": 0, "errors": 0, "max_depth": 0,
+                      "wait_time": 0.0, "handler_time": 0.0, "max_handler_time": 0.0}
+
+
+class EventBus:
+    """
+    Fan-out of events to handlers on a bounded worker pool.
+    subscribe_event(event) is called once, when an event gets its first handler.
+    """
+
+    def __init__(self, subscribe_event=None, workers=EVENT_WORKERS):
+        self.subscribe_event = subscribe_event
+        self.condition = threading.Condition()
+        self.handlers = {}    # event -> [Subscription]
+        self.ready = deque()  # subscriptions with pending events and no call in progress
+        self.workers = []
+        self.is_running = True
+        for index in range(workers):
+            worker = threading.Thread(target=self._work, name="EventBusWorker{}".format(index))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def on(self, event, handler, when=None, debounce=0.0, coalesce=False):
+        """
+        Call handler(event, value, message) for every event that passes when(value).
+        debounce: ignore events within this many seconds of the last accepted one.
+        coalesce: while the handler is busy, keep only the latest pending value.
+        """
+        subscription = Subscription(event, handler, when, debounce, coalesce)
+        with self.condition:
+            first = event not in self.handlers
+            self.handlers.setdefault(event, []).append(subscription)
+        if first and self.subscribe_event is not None:
+            self.subscribe_event(event)
+        return subscription
+
+    def events(self):
+        with self.condition:
+            return list(self.handlers.keys())
+
+    def publish(self, event, value, message=""):
+        """Called on the NAOqi callback thread: never blocks on a handler."""
+        now = time.time()
+        with self.condition:
+            for subscription in self.handlers.get(event, []):
+                stats = subscription.stats
+                stats["received"] += 1
+                if subscription.when is not None and not subscription.when(value):
+                    stats["filtered"] += 1
+                    continue
+                if subscription.debounce and now - subscription.last_accepted < subscription.debounce:
+                    stats["debounced"] += 1
+                    continue
+                subscription.last_accepted = now
+                if subscription.coalesce and subscription.pending:
+                    subscription.pending[-1] = (value, message, now)
+                    stats["coalesced"] += 1
+                    continue
+                if len(subscription.pending) >= MAX_PENDING_PER_HANDLER:
+                    stats["dropped"] += 1
+                    continue
+                subscription.pending.append((value, message, now))
+                stats["max_depth"] = max(stats["max_depth"], len(subscription.pending))
+                if not subscription.queued and not subscription.running:
+                    subscription.queued = True
+                    self.ready.append(subscription)
+                    self.condition.notify()
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while self.is_running and not self.ready:
+                    self.condition.wait()
+                if not self.is_running:
+                    return
+                subscription = self.ready.popleft()
+                subscription.queued = False
+                subscription.running = True
+                value, message, published_at = subscription.pending.popleft()
+
+            start = time.time()
+            try:
+                subscription.handler(subscription.event, value, message)
+            except Exception as e:
+                subscription.stats["errors"] += 1
+                logger.error("Event handler {} failed: {}".format(subscription.name, e))
+            elapsed = time.time() - start
+
+            with self.condition:
+                stats = subscription.stats
+                stats["handled"] += 1
+                stats["wait_time"] += start - published_at
+                stats["handler_time"] += elapsed
+                stats["max_handler_time"] = max(stats["max_handler_time"], elapsed)
+                subscription.running = False
+                if subscription.pending:
+                    subscription.queued = True
+                    self.ready.append(subscription)
+                    self.condition.notify()
+
+    def shutdown(self):
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+
+    def get_stats(self):
+        """Counters per handler, plus the events currently waiting."""
+        with self.condition:
+            stats = {}
+            pending = 0
+            for subscriptions in self.handlers.values():
+                for subscription in subscriptions:
+                    stats[subscription.name] = dict(subscription.stats, depth=len(subscription.pending))
+                    pending += len(subscription.pending)
+            stats["pending"] = pending
+            return stats
+
+
+class EventBridge(ALModule):
+    """The single ALModule that receives every bus event from ALMemory."""
+
+    def __init__(self, name, bus):
+        ALModule.__init__(self, name)
+        self.bus = bus
+
+    def onEvent(self, key, value, message):
+        self.bus.publish(key, value, message)
+
+
+def create_event_bus(name, supervisor, workers=EVENT_WORKERS):
+    """
+    Create a bus whose events arrive through one bridge module, subscribed via the
+    BrokerSupervisor so the subscriptions survive a broker rebuild.
+    """
+    bus = EventBus(workers=workers)
+    bridge = EventBridge(name, bus)
+    supervisor.register_module(bridge)
+    bus.subscribe_event = lambda event: supervisor.subscribe(bridge, event, "onEvent")
+    return bus
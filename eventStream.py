@@ -0,0 +1,100 @@
+"""
+In-memory event stream served as Server-Sent Events
+Publishers append to a bounded backlog and never wait on readers; each browser
+connection reads from the backlog at its own pace and resumes with Last-Event-ID.
+A reader that falls further behind than the backlog simply skips the oldest events.
+Python 2.7 compatible version.
+"""
+
+import json
+import socket
+import threading
+import logging
+from collections import deque
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EVENT_BACKLOG = 200          # events kept for late or reconnecting readers
+KEEPALIVE_SECONDS = 15       # comment line sent when nothing happened, so proxies keep the connection
+
+
+class EventStream:
+    """
+    Bounded backlog of (id, event, data) with blocking reads for SSE connections.
+    """
+
+    def __init__(self, backlog=EVENT_BACKLOG):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=backlog)
+        self.last_id = 0
+        self.clients = 0
+        self.published = 0
+
+    def publish(self, event, data):
+        """Append an event and wake the readers. Never blocks on a reader."""
+        with self.condition:
+            self.last_id += 1
+            self.events.append((self.last_id, event, data))
+            self.published += 1
+            self.condition.notify_all()
+            return self.last_id
+
+    def events_after(self, event_id, timeout=None):
+        """Events newer than event_id, waiting up to timeout seconds for one to arrive."""
+        with self.condition:
+            if self.last_id <= event_id:
+                self.condition.wait(timeout)
+            return [entry for entry in self.events if entry[0] > event_id]
+
+    def get_stats(self):
+        return {"clients": self.clients, "published": self.published,
+                "backlog": len(self.events), "last_id": self.last_id}
+
+    def serve(self, handler, initial_events=None):
+        """
+        Stream events to a BaseHTTPRequestHandler until the browser disconnects.
+        initial_events is a list of (event, data) sent first to a fresh connection
+        (not to one resuming with Last-Event-ID) so the page can draw the current state.
+        """
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "keep-alive")
+        handler.end_headers()
+
+        resume_id = handler.headers.get("Last-Event-ID")
+        with self.condition:
+            self.clients += 1
+            last_id = self.last_id
+        try:
+            if resume_id is not None and resume_id.isdigit():
+                last_id = int(resume_id)
+            elif initial_events:
+                for event, data in initial_events:
+                    write_event(handler.wfile, None, event, data)
+                handler.wfile.flush()
+
+            while True:
+                entries = self.events_after(last_id, KEEPALIVE_SECONDS)
+                if not entries:
+                    handler.wfile.write(b": keepalive\n\n")
+                for event_id, event, data in entries:
+                    write_event(handler.wfile, event_id, event, data)
+                    last_id = event_id
+                handler.wfile.flush()
+        except (socket.error, IOError, ValueError):
+            pass  # browser went away
+        finally:
+            with self.condition:
+                self.clients -= 1
+
+
+def write_event(wfile, event_id, event, data):
+    lines = []
+    if event_id is not None:
+        lines.append("id: {}".format(event_id))
+    lines.append("event: {}".format(event))
+    lines.append("data: {}".format(json.dumps(data)))
+    wfile.write(("\n".join(lines) + "\n\n").encode("utf-8"))
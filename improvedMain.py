@@ -7,17 +7,17 @@ import time
 import threading
 import os
 import sharedVars
-import SimpleHTTPServer
-import SocketServer
-import socket
-from naoqi import ALProxy
-from naoqi import ALBroker
 from myPepper import myPepper
 from recordAudio4 import manageAudio
 from chatGPT import chatGPTInteract
 from dotenv import load_dotenv
 import OverrideBtn
 from connectionMonitor import create_robust_pepper_system, RobustALModule
+from proxyRegistry import get_registry
+from brokerSupervisor import BrokerSupervisor
+from webServer import WebServer, find_ip
+from conversationState import ConversationState, LISTENING, TRANSCRIBING, THINKING, SPEAKING
+from behaviorCatalog import BEHAVIOR_ADDED_EVENT, BEHAVIOR_REMOVED_EVENT, BEHAVIORS_RUN_EVENT
 import logging
 
 # Configure logging
@@ -36,6 +36,7 @@ IMAGEURL = os.getenv("IMAGEURL")
 IS_MANUAL_CONVERSATION = False
 LOCAL = os.getenv("LOCAL")
 IMAGE_PREPROMPT = os.getenv("IMAGE_PREPROMPT")
+HEAD_TAP_DEBOUNCE_SECONDS = 2  # taps this soon after the last handled one are ignored
 
 # Define website location and address info
 WEBPORT = 8000
@@ -47,10 +48,12 @@ event_handler = None
 my_pepper = None
 chatGPT_interact = None
 manage_audio = None
-thread_event = None
+conversation = None
 HeadTappedInstance = None
 PersonDetectorInstance = None
+RobotStateWatcherInstance = None
 broker = None
+broker_supervisor = None
 
 # Used to determine when to take image and update preprompt
 last_run_time = None
@@ -62,6 +65,7 @@ class ImprovedHeadTapped(RobustALModule):
     
     def __init__(self, name, connection_monitor, event_handler):
         super(ImprovedHeadTapped, self).__init__(name, connection_monitor, event_handler)
+        self.last_tap_time = 0
         self.initialize()
     
     def initialize(self):
@@ -79,10 +83,15 @@ class ImprovedHeadTapped(RobustALModule):
             logger.info(f"onTactilTouched: value = {value}")
             
             if value == 1.0:  # Tactile sensor is pressed
-                if sharedVars.ISNEAR:
-                    # Stop talking and stop listening
+                # Ignore repeat taps instead of blocking the event callback with a sleep
+                if time.time() - self.last_tap_time < HEAD_TAP_DEBOUNCE_SECONDS:
+                    return
+                self.last_tap_time = time.time()
+
+                if conversation.is_active():
+                    # Stop talking and stop listening; the turn in progress sees its session is over
                     logger.info("GOODBYE - Head tapped while person near")
-                    sharedVars.ISNEAR = False
+                    conversation.end_session("head tap")
                     
                     try:
                         tts = self.get_safe_proxy("ALTextToSpeech")
@@ -90,16 +99,12 @@ class ImprovedHeadTapped(RobustALModule):
                     except Exception as e:
                         logger.error(f"Error stopping TTS: {e}")
                     
-                    global thread_event
-                    if thread_event:
-                        thread_event.set()
-                    
                     try:
                         my_pepper.start_behavior("ht_animation_lib/tickle_1")
                     except Exception as e:
                         logger.error(f"Error starting tickle behavior: {e}")
                     
-                    time.sleep(2)
+                    self.last_tap_time = time.time()
                     
                 else:
                     # Start listening
@@ -111,9 +116,6 @@ class ImprovedHeadTapped(RobustALModule):
                     except Exception as e:
                         logger.error(f"Error stopping TTS: {e}")
                     
-                    if thread_event:
-                        thread_event.set()
-                    
                     # Setup for a new chat
                     try:
                         chatGPT_interact.reset_chat()
@@ -123,8 +125,9 @@ class ImprovedHeadTapped(RobustALModule):
                     except Exception as e:
                         logger.error(f"Error during chat reset: {e}")
                     
-                    sharedVars.ISNEAR = True
-                    time.sleep(2)
+                    # Wakes the main loop right away
+                    conversation.begin_session("head tap")
+                    self.last_tap_time = time.time()
                     
         except Exception as e:
             logger.error(f"Error in onTactilTouched: {e}")
@@ -172,32 +175,53 @@ class ImprovedPersonDetector(RobustALModule):
             logger.error(f"Error in onJustLeft: {e}")
 
 
-class CustomHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
-    def translate_path(self, path):
-        path = SimpleHTTPServer.SimpleHTTPRequestHandler.translate_path(self, path)
-        relpath = os.path.relpath(path, os.getcwd())
-        fullpath = os.path.join(os.getcwd(), WEBDIRECTORY, relpath)
-        return fullpath
+class ImprovedRobotStateWatcher(RobustALModule):
+    """Keeps my_pepper's actuator cache and behavior catalog in step with changes made on the robot."""
+    
+    def __init__(self, name, connection_monitor, event_handler):
+        super(ImprovedRobotStateWatcher, self).__init__(name, connection_monitor, event_handler)
+        self.initialize()
+    
+    def initialize(self):
+        """Subscribe to the robot state events."""
+        try:
+            self.safe_subscribe("AutonomousLife/State", "onAutonomousLifeState")
+            self.safe_subscribe(BEHAVIOR_ADDED_EVENT, "onBehaviorAdded")
+            self.safe_subscribe(BEHAVIOR_REMOVED_EVENT, "onBehaviorRemoved")
+            self.safe_subscribe(BEHAVIORS_RUN_EVENT, "onBehaviorsRun")
+            logger.info("RobotStateWatcher module initialized successfully")
+        except Exception as e:
+            logger.error(f"Error initializing RobotStateWatcher: {e}")
+    
+    def onAutonomousLifeState(self, key, value, message):
+        my_pepper.actuator_cache.observe(("ALAutonomousLife", "state"), value)
+        my_pepper.led_engine.invalidate()  # autonomous life sets the eye LEDs too
+    
+    def onBehaviorAdded(self, key, value, message):
+        my_pepper.behavior_catalog.on_behavior_added(value)
+    
+    def onBehaviorRemoved(self, key, value, message):
+        my_pepper.behavior_catalog.on_behavior_removed(value)
+    
+    def onBehaviorsRun(self, key, value, message):
+        my_pepper.behavior_catalog.on_behaviors_run(value)
+        my_pepper.led_engine.invalidate()  # a behavior starting or ending may have changed the eyes
 
 
 def thinking():
     """Enhanced thinking function with error handling."""
     logger.info("THINKING")
-    start_time = time.time()
     
     try:
         center_head()
         logger.info("Thinking - vision checked")
         
-        while not thread_event.is_set():
-            elapsed_time = time.time() - start_time
-            if elapsed_time > 3:
-                try:
-                    my_pepper.pepper_thinking()
-                except Exception as e:
-                    logger.error(f"Error in pepper_thinking: {e}")
-                start_time = time.time()
-            time.sleep(0.1)
+        # A thinking phrase every 3 seconds until the transcription is done or the session ends
+        while conversation.wait_while((TRANSCRIBING,), 3) == TRANSCRIBING:
+            try:
+                my_pepper.pepper_thinking()
+            except Exception as e:
+                logger.error(f"Error in pepper_thinking: {e}")
             
     except Exception as e:
         logger.error(f"Error in thinking function: {e}")
@@ -214,9 +238,10 @@ def center_head():
 def rotate_eyes():
     """Rotate eyes while waiting for response."""
     try:
-        while not thread_event.is_set():
-            logger.info("rotate_eyes")
-            my_pepper.change_eye_color_with_turn(200, 200, 200, 1, 1)
+        logger.info("rotate_eyes")
+        my_pepper.start_eye_rotation(200, 200, 200, 1)
+        conversation.wait_while((TRANSCRIBING, THINKING))
+        my_pepper.stop_eye_rotation()
     except Exception as e:
         logger.error(f"Error in rotate_eyes: {e}")
 
@@ -230,7 +255,7 @@ def wake_pepper_up():
             logger.info("Pepper is now awake.")
         else:
             logger.warning("Motion proxy not available, using fallback method")
-            motion_proxy = ALProxy("ALMotion", PIP, PPORT)
+            motion_proxy = get_registry(PIP, PPORT).get("ALMotion")
             motion_proxy.wakeUp()
             logger.info("Pepper is now awake (fallback).")
             
@@ -258,31 +283,12 @@ def check_for_vision():
         logger.error(f"Error in check_for_vision: {e}")
 
 
-def find_ip():
-    """Find local IP address."""
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    try:
-        s.connect(('10.255.255.255', 1))
-        IP = s.getsockname()[0]
-    except Exception:
-        IP = '127.0.0.1'
-    finally:
-        s.close()
-    return IP
-
-
 def serve_website():
     """Start the website server."""
     try:
-        ip_address = find_ip()
-        httpd = SocketServer.TCPServer((ip_address, WEBPORT), CustomHandler)
-        web_address = "http://{}:{}".format(ip_address, WEBPORT)
+        web_server = WebServer(WEBDIRECTORY, find_ip(), WEBPORT)
+        web_address = web_server.start()
         logger.info(f"Serving at {web_address}")
-        
-        server_thread = threading.Thread(target=httpd.serve_forever)
-        server_thread.daemon = True
-        server_thread.start()
-        
         return web_address
         
     except Exception as e:
@@ -292,14 +298,15 @@ def serve_website():
 
 def graceful_shutdown():
     """Perform graceful shutdown with proper cleanup."""
-    global connection_monitor, event_handler, HeadTappedInstance, PersonDetectorInstance, broker
+    global connection_monitor, event_handler, HeadTappedInstance, PersonDetectorInstance, RobotStateWatcherInstance
+    global broker, broker_supervisor
     
     logger.info("Starting graceful shutdown...")
     
     try:
         # Stop main loop
-        if thread_event:
-            thread_event.set()
+        if conversation:
+            conversation.end_session("shutdown")
         
         # Stop TTS if available
         try:
@@ -315,6 +322,8 @@ def graceful_shutdown():
             handlers.append(HeadTappedInstance)
         if PersonDetectorInstance:
             handlers.append(PersonDetectorInstance)
+        if RobotStateWatcherInstance:
+            handlers.append(RobotStateWatcherInstance)
         
         if event_handler and handlers:
             event_handler.unsubscribe_all(handlers)
@@ -322,6 +331,9 @@ def graceful_shutdown():
         # Stop connection monitoring
         if connection_monitor:
             connection_monitor.stop_monitoring()
+        if broker_supervisor:
+            broker_supervisor.stop_monitoring()
+            logger.info(f"Broker supervision: {broker_supervisor.get_stats()}")
         
         # Stop broker if it exists
         if broker:
@@ -339,26 +351,33 @@ def graceful_shutdown():
 def initialize_system():
     """Initialize the entire system with robust connection handling."""
     global connection_monitor, event_handler, my_pepper, chatGPT_interact, manage_audio
-    global HeadTappedInstance, PersonDetectorInstance, broker, thread_event
+    global HeadTappedInstance, PersonDetectorInstance, RobotStateWatcherInstance, broker, broker_supervisor, conversation
     
     try:
-        # Create broker
-        broker = ALBroker("myBroker", "0.0.0.0", 0, PIP, PPORT)
+        # Create broker; the supervisor rebuilds it and re-subscribes our modules after a network blip
+        broker_supervisor = BrokerSupervisor(PIP, PPORT, "myBroker")
+        broker = broker_supervisor.start()
         
         # Create robust connection system
-        connection_monitor, event_handler = create_robust_pepper_system(PIP, PPORT)
+        connection_monitor, event_handler = create_robust_pepper_system(PIP, PPORT, broker_supervisor)
         
         # Initialize core components
         my_pepper = myPepper(PIP=PIP, PPORT=PPORT, LOCAL=LOCAL)
         chatGPT_interact = chatGPTInteract(APIKEY=API_KEY)
         manage_audio = manageAudio()
         
+        # Taps change the conversation state; the main loop waits on it instead of polling ISNEAR
+        conversation = ConversationState(active=sharedVars.ISNEAR)
+        chatGPT_interact.add_answer_listener(lambda: conversation.advance(THINKING, SPEAKING, "first sentence"))
+        
         # Wake Pepper up
         wake_pepper_up()
         
         # Initialize modules with robust connection handling
         HeadTappedInstance = ImprovedHeadTapped("HeadTappedInstance", connection_monitor, event_handler)
         PersonDetectorInstance = ImprovedPersonDetector("PersonDetectorInstance", connection_monitor, event_handler, PIP, PPORT)
+        RobotStateWatcherInstance = ImprovedRobotStateWatcher("RobotStateWatcherInstance", connection_monitor, event_handler)
+        broker_supervisor.start_monitoring()
         
         # Setup speech and other components
         my_pepper.toggle_speech_recognition(True)
@@ -368,7 +387,7 @@ def initialize_system():
         
         # Voice setup
         try:
-            my_pepper.tts.setVoice('naoenu')
+            my_pepper.set_voice('naoenu')
             my_pepper.have_pepper_say("ahem")
         except Exception as e:
             logger.error(f"Error in voice setup: {e}")
@@ -380,16 +399,13 @@ def initialize_system():
         
         # Manual conversation setup if enabled
         if IS_MANUAL_CONVERSATION:
-            sharedVars.ISNEAR = True
+            conversation.begin_session("manual conversation")
             try:
                 firstResponse = chatGPT_interact.chat_with_gpt_stream_behaviors("Introduce yourself.")
                 logger.info(firstResponse)
             except Exception as e:
                 logger.error(f"Error in manual conversation setup: {e}")
         
-        # Setup thread event
-        thread_event = threading.Event()
-        
         # Clean up pesky packages
         try:
             my_pepper.uninstallDefaultPackage("ht_cms_1_5")
@@ -411,63 +427,55 @@ def main_loop():
     
     try:
         while True:
-            logger.info(f"MAIN LOOP: {sharedVars.ISNEAR}")
+            # A session that ended mid-turn is wrapped up here, then wait (without polling) for the next one
+            conversation.finish_ending()
+            generation = conversation.wait_for_session()
+            logger.info(f"MAIN LOOP: session {generation}")
             
-            if sharedVars.ISNEAR:
+            if conversation.transition(LISTENING, generation, "next turn"):
+                thinking_thread = None
                 try:
-                    # Setup thread event
-                    thread_event.clear()
-                    
                     # Vision check
                     check_for_vision()
                     logger.info("vision checked")
                     
-                    # Record audio
+                    # Record audio; a head tap drops the recording at once
                     annimation_status = my_pepper.pepperAnnimation(False)
-                    file_path = manage_audio.record_audio()
+                    file_path = manage_audio.record_audio(should_stop=lambda: not conversation.is_current(generation))
                     annimation_status = my_pepper.pepperAnnimation(True)
                     
-                    # Start thinking thread
-                    thinking_thread = threading.Thread(target=thinking)
-                    thinking_thread.start()
-                    
                     # Process audio if available
-                    if sharedVars.ISNEAR and file_path:
-                        try:
-                            transcription_response = chatGPT_interact.transcribe_audio_file(file_path)
+                    if file_path and conversation.transition(TRANSCRIBING, generation, "recorded"):
+                        # Thinking phrases until the transcription is done
+                        thinking_thread = threading.Thread(target=thinking)
+                        thinking_thread.start()
+                        
+                        transcription_response = chatGPT_interact.transcribe_audio_file(file_path)
+                        
+                        # Delete audio file
+                        is_audio_file_deleted = manage_audio.delete_file(file_path)
+                        logger.info(f"Audio deleted: {is_audio_file_deleted}")
+                        
+                        if transcription_response and transcription_response.text:
+                            transcription_text = transcription_response.text
+                            logger.info(f"User said: {transcription_text}")
                             
-                            if transcription_response and transcription_response.text:
-                                transcription_text = transcription_response.text
-                                logger.info(f"User said: {transcription_text}")
-                                
-                                # Delete audio file
-                                is_audio_file_deleted = manage_audio.delete_file(file_path)
-                                logger.info(f"Audio deleted: {is_audio_file_deleted}")
-                                
-                                # Stop thinking
-                                thread_event.set()
+                            # Fails if the session ended while transcribing
+                            if conversation.transition(THINKING, generation, "transcribed"):
                                 thinking_thread.join()
-                                
                                 logger.info("All threads should be stopped now")
                                 
-                                if sharedVars.ISNEAR:
-                                    # Get chatbot response
-                                    chatbot_response = chatGPT_interact.chat_with_gpt_stream_behaviors(transcription_text)
-                                    
-                        except Exception as e:
-                            logger.error(f"Error processing audio: {e}")
-                            thread_event.set()
-                            thinking_thread.join()
+                                # Get chatbot response
+                                chatbot_response = chatGPT_interact.chat_with_gpt_stream_behaviors(transcription_text)
                     
                 except Exception as e:
                     logger.error(f"Error in main loop iteration: {e}")
-                    # Ensure threads are cleaned up
-                    if 'thinking_thread' in locals():
-                        thread_event.set()
+                finally:
+                    # Leaving TRANSCRIBING (next turn or session end) stops the thinking thread
+                    conversation.advance(TRANSCRIBING, LISTENING, "nothing to answer")
+                    if thinking_thread:
                         thinking_thread.join()
             
-            time.sleep(0.5)
-            
     except KeyboardInterrupt:
         logger.info("Interrupted by user, stopping script...")
         graceful_shutdown()
@@ -0,0 +1,107 @@
+"""
+Deferred imports for Pepper's heavy libraries
+cv2, numpy, pydub and pyaudio take seconds to import on the robot's laptop and are
+not needed until the first image or recording. lazy_import() returns a stand-in that
+imports the real module on first attribute access, so importing main.py stays fast
+and the startup orchestrator can warm the libraries in the background with preload().
+Python 2.7 compatible version.
+"""
+
+import sys
+import time
+import threading
+import logging
+import importlib
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """
+    Imports name on first use; after that every attribute comes straight from the module.
+    """
+
+    def __init__(self, name):
+        # Set through __dict__ so __getattr__ never sees these names
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+        self.__dict__["import_seconds"] = None
+
+    def load(self):
+        """Import the module now (once); returns it. ImportError propagates to the first user."""
+        module = self.__dict__["_module"]
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                start = time.time()
+                module = importlib.import_module(self._name)
+                self.__dict__["import_seconds"] = time.time() - start
+                self.__dict__["_module"] = module
+                logger.info("Imported {} in {:.2f}s".format(self._name, self.import_seconds))
+            return self._module
+
+    def is_loaded(self):
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded() else "not loaded"
+        return "<lazy module {} ({})>".format(self._name, state)
+
+
+_lazy_modules = {}
+_lazy_lock = threading.Lock()
+
+
+def _get_lazy(name):
+    # Called with _lazy_lock held
+    module = _lazy_modules.get(name)
+    if module is None:
+        module = _lazy_modules[name] = LazyModule(name)
+    return module
+
+
+def lazy_import(name):
+    """The process-wide stand-in for module name (one per name, so preload() warms every user)."""
+    with _lazy_lock:
+        return _get_lazy(name)
+
+
+def is_available(name):
+    """Whether name can be imported, without importing it."""
+    if name in sys.modules:
+        return True
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        import imp
+        try:
+            imp.find_module(name)
+            return True
+        except ImportError:
+            return False
+    return find_spec(name) is not None
+
+
+def preload(names=None):
+    """
+    Import the given lazy modules (default: every one registered so far).
+    Returns {name: seconds}; a library that is missing is logged and left for its first user to report.
+    """
+    with _lazy_lock:
+        modules = dict(_lazy_modules) if names is None else dict((name, _get_lazy(name)) for name in names)
+    timings = {}
+    for name, module in sorted(modules.items()):
+        try:
+            module.load()
+            timings[name] = module.import_seconds
+        except ImportError as e:
+            logger.warning("Could not preload {}: {}".format(name, e))
+    return timings
+
@@ -0,0 +1,197 @@
+"""
+LED animation engine for Pepper
+A single long-lived thread that plays declarative eye animations (rotate, fade,
+pulse). Each animation segment is one non-blocking RPC; a new command cancels the
+running one, and a command identical to what is already showing is dropped.
+Python 2.7 compatible version.
+"""
+
+import time
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SEGMENT_SECONDS = 3.0  # length of one rotateEyes call while an animation loops
+
+
+def rgb_to_hex(red, green, blue):
+    """Convert 0-255 RGB to the 0xRRGGBB integer ALLeds expects."""
+    return (int(red) << 16) + (int(green) << 8) + int(blue)
+
+
+class LedCommand(object):
+    """
+    One animation request.
+    kind is "rotate", "pulse", "fade", "reset" or "idle" (stop whatever is playing).
+    """
+
+    def __init__(self, kind, color=None, duration=None, period=None):
+        self.kind = kind
+        self.color = color
+        self.duration = duration
+        self.period = period
+
+    def key(self):
+        return (self.kind, self.color, self.duration, self.period)
+
+    def __eq__(self, other):
+        return isinstance(other, LedCommand) and self.key() == other.key()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return "LedCommand{}".format(self.key())
+
+
+class LedEngine:
+    """
+    Plays LedCommands on one background thread.
+
+    Commands are latest-wins: if several arrive while one is starting, only the newest
+    is played. Looping animations run until another command (or cancel()) replaces them.
+    """
+
+    def __init__(self, leds, group="FaceLeds", segment_seconds=SEGMENT_SECONDS):
+        self.leds = leds
+        self.group = group
+        self.segment_seconds = segment_seconds
+        self.condition = threading.Condition()
+        self.pending = None
+        self.current = None
+        self.running = False
+        self.thread = None
+        self.rpc_count = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the engine thread."""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def shutdown(self):
+        """Stop the engine thread after the current segment is cancelled."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join()
+
+    def submit(self, command):
+        """Queue a command, replacing anything not yet started."""
+        with self.condition:
+            if command == self.pending or (self.pending is None and command == self.current):
+                self.dropped += 1
+                return
+            self.pending = command
+            self.condition.notify_all()
+
+    def rotate(self, red, green, blue, rotate_seconds=1.0):
+        """Rotate the eyes in the given color until replaced."""
+        self.submit(LedCommand("rotate", rgb_to_hex(red, green, blue), period=rotate_seconds))
+
+    def pulse(self, color, period=1.0):
+        """Fade the eyes in and out of color until replaced."""
+        self.submit(LedCommand("pulse", color, period=period))
+
+    def fade(self, color, duration=0.1):
+        """Fade the eyes to a color name or 0xRRGGBB value."""
+        self.submit(LedCommand("fade", color, duration=duration))
+
+    def reset(self):
+        """Return the eyes to their default state."""
+        self.submit(LedCommand("reset"))
+
+    def cancel(self):
+        """Stop the running animation, leaving the eyes as they are."""
+        self.submit(LedCommand("idle"))
+
+    def invalidate(self):
+        """Forget what the eyes are showing, e.g. after a reconnect."""
+        with self.condition:
+            self.current = None
+
+    def on_proxy_recreated(self, service):
+        if service == "ALLeds":
+            self.invalidate()
+
+    def get_stats(self):
+        return {"rpc_count": self.rpc_count, "dropped": self.dropped}
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and self.running:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                command = self.pending
+                self.pending = None
+                self.current = command
+
+            try:
+                self._play(command)
+            except Exception as e:
+                logger.error("LED command {} failed: {}".format(command, e))
+                self.invalidate()
+
+    def _wait_for_next(self, timeout):
+        """Wait up to timeout seconds; True if a new command or shutdown interrupted."""
+        end = time.time() + timeout
+        with self.condition:
+            while self.pending is None and self.running:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+    def _play(self, command):
+        if command.kind == "fade":
+            self.rpc_count += 1
+            self.leds.fadeRGB(self.group, command.color, command.duration)
+        elif command.kind == "reset":
+            self.rpc_count += 1
+            self.leds.reset(self.group)
+        elif command.kind == "rotate":
+            while True:
+                self.rpc_count += 1
+                task = self.leds.post.rotateEyes(command.color, command.period, self.segment_seconds)
+                if self._wait_for_next(self.segment_seconds):
+                    self.leds.stop(task)
+                    return
+        elif command.kind == "pulse":
+            half = command.period / 2.0
+            colors = [command.color, 0x000000]
+            step = 0
+            while True:
+                self.rpc_count += 1
+                task = self.leds.post.fadeRGB(self.group, colors[step % 2], half)
+                if self._wait_for_next(half):
+                    self.leds.stop(task)
+                    return
+                step += 1
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_led_engine(leds, registry=None):
+    """Return the process-wide engine, starting it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = LedEngine(leds)
+            if registry is not None:
+                registry.add_recreate_listener(_engine.on_proxy_recreated)
+            _engine.start()
+        return _engine
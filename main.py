@@ -3,16 +3,22 @@ import time
 import threading
 import os
 import sharedVars
-import SimpleHTTPServer
-import SocketServer
-import socket
-from naoqi import ALProxy
-from myPepper import myPepper
+from qiPepper import create_pepper
+from proxyRegistry import get_registry
 from recordAudio4 import manageAudio
 from chatGPT import chatGPTInteract
+from speculativeChat import SpeculativeTurn, SpeculativeStats
+from behaviorCatalog import BEHAVIOR_ADDED_EVENT, BEHAVIOR_REMOVED_EVENT, BEHAVIORS_RUN_EVENT
+from tabletPage import get_tablet_page, TABLET_EVENTS_PATH
+from metrics import get_metrics, METRICS_PATH
+from webServer import WebServer, find_ip
+from operatorDashboard import get_operator_dashboard, DASHBOARD_PAGE, DASHBOARD_EVENTS_PATH
+from conversationState import ConversationState, LISTENING, TRANSCRIBING, THINKING, SPEAKING
 from dotenv import load_dotenv
-from naoqi import ALBroker
-from naoqi import ALModule
+from brokerSupervisor import BrokerSupervisor
+from eventBus import create_event_bus
+from startupOrchestrator import StartupOrchestrator
+from lazyImport import preload
 try:
     import OverrideBtn
 except ImportError:
@@ -31,30 +37,56 @@ IMAGEURL = os.getenv("IMAGEURL")
 IS_MANUAL_CONVERSATION = False
 LOCAL = os.getenv("LOCAL")
 IMAGE_PREPROMPT = os.getenv("IMAGE_PREPROMPT")
+SPECULATIVE_MODE = os.getenv("SPECULATIVE_MODE") == "True" # start the chat request on a provisional transcript
+HEAD_TAP_DEBOUNCE_SECONDS = 2 # taps this soon after the last handled one are ignored
+TABLET_PAGE_MODE = os.getenv("TABLET_PAGE") == "True" # tablet loads website/tablet.html once and gets text pushed to it
+OPERATOR_DASHBOARD_MODE = os.getenv("OPERATOR_DASHBOARD") == "True" # serve website/operator.html with live turn state
+METRICS_ENDPOINT_MODE = os.getenv("METRICS_ENDPOINT", "True") == "True" # serve RPC and API latency histograms on /metrics
 
 
 # Define website location and address info
 WEBPORT = 8000
 WEBDIRECTORY = "website"
 
-# Create a broker
-broker = ALBroker("myBroker", "0.0.0.0", 0, PIP, PPORT)
+# Services myPepper and the modules below use; their proxies are opened in parallel at start-up
+STARTUP_SERVICES = ["ALTextToSpeech", "ALAnimatedSpeech", "ALBehaviorManager", "ALLeds", "ALSpeechRecognition",
+                    "ALTabletService", "PackageManager", "ALAutonomousLife", "ALMotion", "ALVideoDevice",
+                    "ALMemory", "ALPeoplePerception"]
 
-my_pepper = myPepper(PIP=PIP, PPORT=PPORT, LOCAL=LOCAL)
-chatGPT_interact = chatGPTInteract(APIKEY=API_KEY)
+# One shared proxy per NAOqi service for the whole process; ROBOT_BACKEND picks ALProxy or qi
+registry = get_registry(PIP, PPORT)
+
+# The supervisor rebuilds the broker and re-subscribes our modules after a network blip
+broker_supervisor = BrokerSupervisor(PIP, PPORT, "myBroker", registry=registry)
+_run_id = str(int(time.time()))
+
+# Created by the start-up steps at the bottom of this file
+broker = None
+event_bus = None
+my_pepper = None
+chatGPT_interact = None
+manage_audio = None
 
 # Used to determine when to take image and update preprompt
 last_run_time = None
 interval = 900  # Interval in seconds
 
-# Stops pepper from talking when head touched
-class HeadTapped(ALModule):
-    def __init__(self, name):
-        ALModule.__init__(self, name)
-        self.tts = ALProxy("ALTextToSpeech")
-        self.memory = ALProxy("ALMemory")
+# Hit/miss counts for speculative chat requests
+speculative_stats = SpeculativeStats()
 
-        self.memory.subscribeToEvent("FrontTactilTouched", self.getName(), "onTactilTouched")
+# Who owns the conversation: taps change it and the main loop waits on it instead of polling ISNEAR
+conversation = ConversationState(active=sharedVars.ISNEAR)
+conversation.add_listener(lambda old_state, new_state, reason: get_operator_dashboard().set_conversation(new_state))
+
+# Stops pepper from talking when head touched
+class HeadTapped:
+    def __init__(self):
+        self.tts = registry.get("ALTextToSpeech")
+        self.memory = registry.get("ALMemory")
+
+        # A tap storm collapses to one action: only presses count, and repeats are ignored for a while
+        event_bus.on("FrontTactilTouched", self.onTactilTouched,
+                     when=lambda value: value == 1.0, debounce=HEAD_TAP_DEBOUNCE_SECONDS)
         #self.memory.subscribeToEvent("MiddleTactilTouched", self.getName(), "onTactilTouched")
         #self.memory.subscribeToEvent("RearTactilTouched", self.getName(), "onTactilTouched")
 
@@ -62,36 +94,31 @@ class HeadTapped(ALModule):
         print("--- MAIN -> onTactilTouched -> value = " + str(value))
 
         if value == 1.0:  # Tactile sensor is pressed
-            
-            if sharedVars.ISNEAR == True:
-                # Stop talking and stop listening
+
+            if conversation.is_active():
+                # Stop talking and stop listening; the turn in progress sees its session is over
                 print("------ GOOD BYE  -------------- ")
-                sharedVars.ISNEAR = False
+                conversation.end_session("head tap")
 
+                chatGPT_interact.filler.cancel()
                 self.tts.stopAll()
-                global thread_event
-                thread_event.set()
                 my_pepper.start_behavior("ht_animation_lib/tickle_1")
                 
-                time.sleep(2)
-                
             else :
                 # Start listening
                 print("------ HELLO --------------- - ")
             
                 #Stop everything prior
                 self.tts.stopAll()
-                global thread_event
-                thread_event.set()
 
                 #Setup for a new chat
                 chatGPT_interact.reset_chat()
-                my_pepper.have_pepper_say("Ahh")
+                my_pepper.say_phrase("Ahh")
                 my_pepper.start_behavior("animations/Stand/Reactions/TouchHead_3")
                 my_pepper.stop_all_behaviors()
 
-                sharedVars.ISNEAR = True
-                time.sleep(2)
+                # Wakes the main loop right away
+                conversation.begin_session("head tap")
         
         '''
         if value == 1.0:  # Tactile sensor is pressed
@@ -105,20 +132,19 @@ class HeadTapped(ALModule):
         '''
             
 
-class PersonDetector(ALModule):
-    def __init__(self, name):
-        ALModule.__init__(self, name)
-        self.people_perception = ALProxy("ALPeoplePerception", PIP, PPORT)
-        self.memory = ALProxy("ALMemory", PIP, PPORT)
-        self.tts = ALProxy("ALTextToSpeech", PIP, PPORT)
+class PersonDetector:
+    def __init__(self):
+        self.people_perception = registry.get("ALPeoplePerception")
+        self.memory = registry.get("ALMemory")
+        self.tts = registry.get("ALTextToSpeech")
         self.people_perception.setMaximumDetectionRange(0.5)
 
         # Subscribe to the PeoplePerception/PeopleDetected event
-        self.memory.subscribeToEvent("PeoplePerception/JustArrived", self.getName(), "onJustArrived")
-        self.memory.subscribeToEvent("PeoplePerception/JustLeft", self.getName(), "onJustLeft")
+        event_bus.on("PeoplePerception/JustArrived", self.onJustArrived)
+        event_bus.on("PeoplePerception/JustLeft", self.onJustLeft)
 
 
-    def onJustArrived(self, value ):
+    def onJustArrived(self, key, value, message):
         print("--- MAIN -> ON_JUST_ARRIVED -> value = " + str(value))
         #check_for_vision() # Take image when someone comes into view.
         '''
@@ -143,7 +169,7 @@ class PersonDetector(ALModule):
             '''
             
 
-    def onJustLeft(self, value):  
+    def onJustLeft(self, key, value, message):
         print("--- MAIN -> ON_JUST_LEFT -> value = " + str(value))
         '''
         if ISNEAR == True:
@@ -162,12 +188,34 @@ class PersonDetector(ALModule):
             self.people_perception.resetPopulation()
         '''
 
-class CustomHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
-    def translate_path(self, path):
-        path = SimpleHTTPServer.SimpleHTTPRequestHandler.translate_path(self, path)
-        relpath = os.path.relpath(path, os.getcwd())
-        fullpath = os.path.join(os.getcwd(), WEBDIRECTORY, relpath)
-        return fullpath
+# Keeps my_pepper's actuator state cache and behavior catalog in step with changes made on the robot itself
+class RobotStateWatcher:
+    def __init__(self):
+        # State events only matter for their latest value
+        event_bus.on("AutonomousLife/State", self.onAutonomousLifeState, coalesce=True)
+        event_bus.on(BEHAVIOR_ADDED_EVENT, self.onBehaviorAdded)
+        event_bus.on(BEHAVIOR_REMOVED_EVENT, self.onBehaviorRemoved)
+        event_bus.on(BEHAVIORS_RUN_EVENT, self.onBehaviorsRun, coalesce=True)
+        if TABLET_PAGE_MODE:
+            event_bus.on("ALTextToSpeech/CurrentWord", self.onCurrentWord, coalesce=True)
+
+    def onAutonomousLifeState(self, key, value, message):
+        my_pepper.actuator_cache.observe(("ALAutonomousLife", "state"), value)
+        my_pepper.led_engine.invalidate()  # autonomous life sets the eye LEDs too
+
+    def onBehaviorAdded(self, key, value, message):
+        my_pepper.behavior_catalog.on_behavior_added(value)
+
+    def onBehaviorRemoved(self, key, value, message):
+        my_pepper.behavior_catalog.on_behavior_removed(value)
+
+    def onBehaviorsRun(self, key, value, message):
+        my_pepper.behavior_catalog.on_behaviors_run(value)
+        my_pepper.led_engine.invalidate()  # a behavior starting or ending may have changed the eyes
+
+    def onCurrentWord(self, key, value, message):
+        if value:
+            get_tablet_page().show_word(value)
 
 ''' 4/2/24 - replaced with thinking below per GPT       
 def thinking():
@@ -188,7 +236,6 @@ def thinking():
 '''  
 def thinking():
     print("--- MAIN - THINKING")
-    start_time = time.time()
     
     #Sometimes the head wanders to look at the presenter.
     #When we start thinking, center the head so that it is looking at the audience.   
@@ -199,31 +246,23 @@ def thinking():
     #check_for_vision_on_arrival()
 
     print("Thinking - vision checked")
-    while not thread_event.is_set():
-        
-        
-        
-        elapsed_time = time.time() - start_time
-        if elapsed_time > 3:
-            my_pepper.pepper_thinking()
-            start_time = time.time()  # Reset the start time
-        time.sleep(0.1)  # Sleep for a short time to avoid busy waiting
+    # Thinking phrases are now played by chatGPT_interact.filler, only when the wait is predicted to be long
 
 def center_head():
     my_pepper.center_pepper_head()
 
 # 4/2/24 - Added to roate eyes while pepper is waiting to get a response
 def rotate_eyes(): 
-    while not thread_event.is_set():
-        print("--- MAIN - rotate_eyes")
-        my_pepper.change_eye_color_with_turn(200, 200, 200, 1, 1)
-        #time.sleep(0.1)  # Wait for 1 second before repeating
+    print("--- MAIN - rotate_eyes")
+    my_pepper.start_eye_rotation(200, 200, 200, 1)
+    conversation.wait_while((TRANSCRIBING, THINKING))
+    my_pepper.stop_eye_rotation()
 
 
 def wake_pepper_up():
     try:
-        # Create a proxy to ALMotion
-        motion_proxy = ALProxy("ALMotion", PIP, PPORT)
+        # Get the shared proxy to ALMotion
+        motion_proxy = registry.get("ALMotion")
         
         # Wake Pepper up
         motion_proxy.wakeUp()
@@ -257,37 +296,42 @@ def check_for_vision_on_arrival():
     getimagethread.start()
 
 
-def find_ip():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    try:
-        # doesn't even have to be reachable
-        s.connect(('10.255.255.255', 1))
-        IP = s.getsockname()[0]
-    except Exception:
-        IP = '127.0.0.1'
-    finally:
-        s.close()
-    return IP
-
 def serve_website():
-    # Automatically detect the IP
-    ip_address = find_ip()
-
-    httpd = SocketServer.TCPServer((ip_address, WEBPORT), CustomHandler)
-    web_address = "http://{}:{}".format(ip_address, WEBPORT)
+    # One threaded server for the static pages (served from memory) and the dynamic routes
+    web_server = WebServer(WEBDIRECTORY, find_ip(), WEBPORT)
+    web_server.add_route(TABLET_EVENTS_PATH, get_tablet_page().serve_events, streaming=True)
+    web_server.add_route(DASHBOARD_EVENTS_PATH, get_operator_dashboard().serve_events, streaming=True)
+    if METRICS_ENDPOINT_MODE:
+        web_server.add_route(METRICS_PATH, get_metrics().serve)
+    web_address = web_server.start()
     print("Serving at {}".format(web_address))
+    return web_address
 
-    # Start the server in a new thread
-    server_thread = threading.Thread(target=httpd.serve_forever)
-    server_thread.daemon = True  # This ensures that the thread will close when the main program exits
-    server_thread.start()
 
-    return web_address
+# Start-up steps; each runs on its own thread once the steps it requires are done
+
+def start_broker():
+    global broker
+    broker = broker_supervisor.start()
+
 
+def start_event_bus():
+    # ALMemory events arrive through one bridge module and are handled on the bus's worker threads,
+    # so a slow handler never holds up the NAOqi callback thread
+    global event_bus
+    event_bus = create_event_bus("EventBridgeInstance" + _run_id, broker_supervisor)
 
-#Wake PEPPER Up
 
-wake_pepper_up()
+def start_pepper():
+    global my_pepper
+    my_pepper = create_pepper(PIP=PIP, PPORT=PPORT, LOCAL=LOCAL, registry=registry) # ROBOT_BACKEND picks myPepper or qiPepper
+
+
+def start_chat():
+    # Loads the transcription backend (and local whisper model) while the robot is being set up
+    global chatGPT_interact
+    chatGPT_interact = chatGPTInteract(APIKEY=API_KEY)
+    chatGPT_interact.add_answer_listener(lambda: conversation.advance(THINKING, SPEAKING, "first sentence"))
 
 
 #Service Website
@@ -298,48 +342,122 @@ get_address = serve_website()
 my_pepper.show_what_pepper_says(get_address, "hello")
 '''
 
+def start_website():
+    # Serve website/tablet.html and push the spoken text to it instead of reloading the tablet each sentence,
+    # website/operator.html with what Pepper is doing for the staff, and/or the metrics for a scraper
+    web_address = serve_website()
+    if METRICS_ENDPOINT_MODE:
+        print("Metrics at {}".format(web_address + METRICS_PATH))
+    if TABLET_PAGE_MODE:
+        get_tablet_page().enable(web_address)
+    if OPERATOR_DASHBOARD_MODE:
+        dashboard = get_operator_dashboard()
+        dashboard.add_queue("event handlers", lambda: event_bus.get_stats()["pending"])
+        dashboard.add_queue("phrase renders", lambda: my_pepper.phrase_cache.get_stats()["pending"])
+        dashboard.start()
+        print("Operator dashboard at {}".format(web_address + DASHBOARD_PAGE))
 
 
-# Stop the speech recognition service
-my_pepper.toggle_speech_recognition(True)  # This will disable speech recognition
-            
+def disable_speech_recognition():
+    # Stop the speech recognition service
+    my_pepper.toggle_speech_recognition(True)  # This will disable speech recognition
 
-# Create an instance of the class to manage person detection
-global PersonDetectorInstance
-_run_id = str(int(time.time()))
-PersonDetectorInstance = PersonDetector("PersonDetectorInstance" + _run_id)
 
-# Create an instance of the class to manage watching out for head taps
-global HeadTappedInstance
-HeadTappedInstance = HeadTapped("HeadTappedInstance" + _run_id)
+def register_modules():
+    global PersonDetectorInstance, HeadTappedInstance, RobotStateWatcherInstance
 
-#Take the first image
-check_for_vision()
+    # Create an instance of the class to manage person detection
+    PersonDetectorInstance = PersonDetector()
 
-#get a sound check for ambient noise
-manage_audio = manageAudio()
+    # Create an instance of the class to manage watching out for head taps
+    HeadTappedInstance = HeadTapped()
 
+    # Create an instance of the class that tracks state changes made on the robot
+    RobotStateWatcherInstance = RobotStateWatcher()
 
+    # Watch for the event link dropping from here on
+    broker_supervisor.start_monitoring()
 
-print(my_pepper.tts.getVoice())
-my_pepper.tts.setVoice('naoenu')
-# Default is naoenu
-#['anna', 'naoenu', 'naomnc']
 
-my_pepper.have_pepper_say("ahem")
-#5/12/24 silenced as get_address isn't available until web server is figured out
-'''
-my_pepper.show_what_pepper_says(get_address, "Please be quiet for a moment as I check the room for noise.")
-'''
-annimation_status = my_pepper.pepperAnnimation(False) # make pepper quiet by not moving
-manage_audio.ambient_sound_check()
-annimation_status = my_pepper.pepperAnnimation(True) # alive again
+def start_audio():
+    global manage_audio
+    manage_audio = manageAudio()
+
+
+def setup_voice():
+    print(my_pepper.tts.getVoice())
+    # Canned reactions are rendered for the voice in the background and then play instantly
+    my_pepper.phrase_cache.add_phrases(["ahem", "Ahh"])
+    my_pepper.set_voice('naoenu')
+    # Default is naoenu
+    #['anna', 'naoenu', 'naomnc']
+
+
+def check_ambient_sound():
+    #get a sound check for ambient noise
+    my_pepper.say_phrase("ahem")
+    #5/12/24 silenced as get_address isn't available until web server is figured out
+    '''
+    my_pepper.show_what_pepper_says(get_address, "Please be quiet for a moment as I check the room for noise.")
+    '''
+    annimation_status = my_pepper.pepperAnnimation(False) # make pepper quiet by not moving
+    manage_audio.ambient_sound_check()
+    annimation_status = my_pepper.pepperAnnimation(True) # alive again
+
+
+def remove_default_packages():
+    #Get rid of the pesky downloaded package.
+    try:
+        my_pepper.uninstallDefaultPackage("ht_cms_1_5")
+        my_pepper.uninstallDefaultPackage("automatic-update")
+        behavior_manager = registry.get("ALBehaviorManager")
+        behavior_manager.stopAllBehaviors()
+
+        # Connect to the package manager on the robot
+        package_manager = registry.get("PackageManager")
+        package_name = "ht_cms_1_5"  # replace with the actual package name
+        package_manager.removePkg(package_name)
+        installed_packages = package_manager.packages()
+        if package_name not in installed_packages:
+            print("Package %s has been successfully uninstalled.", package_name)
+        else:
+            print("Failed to uninstall package %s. , ", package_name)
+    except Exception:
+        print("Package has been successfully uninstalled.")
+
+
+# Steps are listed after the steps they need; anything without a dependency between them overlaps
+startup = StartupOrchestrator("Pepper start-up")
+startup.add_step("broker", start_broker)
+startup.add_step("proxies", lambda: registry.warm(STARTUP_SERVICES), optional=True)
+startup.add_step("imports", preload, optional=True) # cv2, numpy, pydub, pyaudio off the critical path
+startup.add_step("pepper", start_pepper)
+startup.add_step("chat", start_chat)
+startup.add_step("event_bus", start_event_bus, requires=["broker"])
+startup.add_step("wake_up", wake_pepper_up, requires=["pepper"], optional=True)
+startup.add_step("speech_recognition", disable_speech_recognition, requires=["pepper"], optional=True)
+# stopAllBehaviors() in packages would kill a tap's reaction, so taps are only handled once it is done;
+# voice and the ambient check start no behaviors and can overlap it
+startup.add_step("packages", remove_default_packages, requires=["wake_up"], optional=True)
+startup.add_step("modules", register_modules, requires=["event_bus", "pepper", "chat", "packages"])
+# The head leaves its rest posture in wake_up; a photo taken before that would describe the floor
+startup.add_step("vision", check_for_vision, requires=["wake_up", "chat"], optional=True)
+startup.add_step("audio", start_audio)
+startup.add_step("voice", setup_voice, requires=["wake_up"], optional=True)
+# Measured once the libraries are in, so an import burning CPU can't drop microphone frames
+startup.add_step("ambient_sound", check_ambient_sound, requires=["voice", "audio", "imports"])
+if TABLET_PAGE_MODE or OPERATOR_DASHBOARD_MODE or METRICS_ENDPOINT_MODE:
+    # Metrics alone are not worth failing start-up over (e.g. the port is taken)
+    startup.add_step("website", start_website, optional=not (TABLET_PAGE_MODE or OPERATOR_DASHBOARD_MODE))
+
+startup.run()
+startup.print_timeline()
 
 #If settings indicate manual conversation without proximity detection...
 if IS_MANUAL_CONVERSATION :
     
     #Pepper  will automatically think a person is near and wont trigger detection processes.
-    sharedVars.ISNEAR = True
+    conversation.begin_session("manual conversation")
 
     # Initial greeting to get the conversation started
     firstResponse = chatGPT_interact.chat_with_gpt_stream_behaviors("Introduce yourself.")
@@ -355,46 +473,22 @@ if IS_MANUAL_CONVERSATION :
 
 #my_pepper.tabletImage(IMAGEURL)
 #print(IMAGEURL)
-                      
-                      
-#setup thread event
-thread_event = threading.Event()
-
-
-#Get rid of the pesky downloaded package.
-try:
-    my_pepper.uninstallDefaultPackage("ht_cms_1_5")
-    my_pepper.uninstallDefaultPackage("automatic-update")
-    behavior_manager = ALProxy("ALBehaviorManager", PIP, PPORT)
-    behavior_manager.stopAllBehaviors()
-
-    # Connect to the package manager on the robot
-    package_manager = ALProxy("PackageManager", PIP, PPORT)
-    package_name = "ht_cms_1_5"  # replace with the actual package name
-    package_manager.removePkg(package_name)
-    installed_packages = package_manager.packages()
-    if package_name not in installed_packages:
-        print("Package %s has been successfully uninstalled.", package_name)
-    else:
-        print("Failed to uninstall package %s. , ", package_name)
-except Exception:
-    print("Package has been successfully uninstalled.")
 
 
 print("FIRST CHECK BEFORE MAIN LOOP :" + str(sharedVars.ISNEAR))
 try:
     while True:
 
+        # A session that ended mid-turn is wrapped up here, then wait (without polling) for someone to engage
+        conversation.finish_ending()
+        generation = conversation.wait_for_session()
+
         print("MAIN LOOP :" + str(sharedVars.ISNEAR))
-        if sharedVars.ISNEAR:
+        if conversation.transition(LISTENING, generation, "next turn"):
 
             # stop prior chat if there is overlap
             #my_pepper.tts.stopAll()
 
-            
-            #setup thread event
-            thread_event = threading.Event()
-
             # ---- Image Capture every 2 minutes ---
             #check_for_vision()
             print("vision checked")
@@ -403,9 +497,23 @@ try:
             #eye_thread = threading.Thread(target=my_pepper.change_eye_color_with_turn, args=(0,255,0,2, 7))
             #eye_thread.start()
 
+            # Speculatively start the chat request while waiting for the silence to run out
+            speculative_turn = None
+            on_partial = None
+            if SPECULATIVE_MODE:
+                speculative_turn = SpeculativeTurn(chatGPT_interact, manage_audio, speculative_stats)
+                on_partial = speculative_turn.on_partial
+
             # Record an audio file
             annimation_status = my_pepper.pepperAnnimation(False) # make pepper quiet by not moving
-            file_path = manage_audio.record_audio()
+            get_tablet_page().set_status("Listening...")
+            get_operator_dashboard().start_turn()
+            file_path = manage_audio.record_audio(on_partial=on_partial, on_state=get_operator_dashboard().set_listening,
+                                                  should_stop=lambda: not conversation.is_current(generation))
+            conversation.transition(TRANSCRIBING, generation, "recorded")
+            get_operator_dashboard().mark_stage("listening")
+            get_operator_dashboard().set_listening("THINKING")
+            get_tablet_page().set_status("Thinking...")
             annimation_status = my_pepper.pepperAnnimation(True)  # make pepper animated again.
             
             '''#Eye rotation now handled in chat processes so that the eyes will stop when the chatting starts.
@@ -414,24 +522,31 @@ try:
             rotate_eyes_thread.start()
             '''
             
+            # Fillers only if the answer is predicted to take longer than the budget; cancelled by the first sentence
+            chatGPT_interact.filler.start_turn(manage_audio.recording_buffer.duration())
+
             # start the thinking thread
             thinking_thread  = threading.Thread(target=thinking)
             thinking_thread.start()
 
             # Perform transcription
+            transcription_text = None
             print("TRANSCRIPTION :" + str(sharedVars.ISNEAR))
-            if sharedVars.ISNEAR: #ISNEAR might have been made false by this time if head tapped. 
+            if conversation.is_current(generation): #the session might have ended by this time if head tapped.
                 if file_path:
                     transcription_response = chatGPT_interact.transcribe_audio_file(file_path)
-                    
+                    chatGPT_interact.filler.mark_transcribed()
 
                     #output the response
                     #if transcription_response:
 
-                    transcription_text = transcription_response.text
+                    if transcription_response:
+                        transcription_text = transcription_response.text
                     #cleaned_transcription_text = chatGPT_interact.filter_text(transcription_text)
                     if transcription_text:
                         print("I said :" + transcription_text)
+                    get_operator_dashboard().mark_stage("transcription")
+                    get_operator_dashboard().show_transcript(transcription_text or "")
 
                     #12/27 chatbot_response = chatGPT_interact.chat_with_gpt(transcription_text)
                     #12/27 cleaned_chatbot_response = chatGPT_interact.filter_text(chatbot_response)
@@ -454,7 +569,6 @@ try:
 
                     # Stop the thinking thread
 
-            thread_event.set()
             thinking_thread.join()
 
             
@@ -464,25 +578,38 @@ try:
             '''
             print("All threads should be stopped now")
             
-            if sharedVars.ISNEAR: #it is possible that ISNEAR might be false if head tapped.
+            if transcription_text and conversation.transition(THINKING, generation, "transcribed"): #fails if the session ended (head tapped). No text if the recording was only noise.
                 # Have pepper say the response
                 #try:
                     #12/27 added the following as the saying aspect is wrapped into the gpt streaming
-                    chatbot_response = chatGPT_interact.chat_with_gpt_stream_behaviors(transcription_text)
+                    speculative_response = None
+                    if speculative_turn:
+                        speculative_response = speculative_turn.resolve(transcription_text)
+                    chatbot_response = chatGPT_interact.chat_with_gpt_stream_behaviors(transcription_text, response=speculative_response)
                     #12/27 my_pepper.have_pepper_say(cleaned_chatbot_response)
                 #except:
                     #my_pepper.have_pepper_say("Say 'Sorry I didn't get that, please say again.' ")
                     #chatGPT_interact.reset_chat()
-
-        time.sleep(.5)
+            elif speculative_turn:
+                speculative_turn.cancel()
+            chatGPT_interact.filler.end_turn()
+            get_tablet_page().set_status("")
+            get_operator_dashboard().mark_stage("reply")
+            get_operator_dashboard().end_turn()
+            get_operator_dashboard().set_listening("")
 
 except KeyboardInterrupt:
     print("---Interrupted by user, stopping script----------------")
     print(IMAGE_PREPROMPT)
     #my_pepper.tts.stopAll()
-    HeadTappedInstance.memory.unsubscribeToEvent("FrontTactilTouched", HeadTappedInstance.getName())
-    #HeadTappedInstance.memory.unsubscribeToEvent("MiddleTactilTouched", HeadTappedInstance.getName())
-    #HeadTappedInstance.memory.unsubscribeToEvent("RearTactilTouched", HeadTappedInstance.getName())
-    PersonDetectorInstance.memory.unsubscribeToEvent("PeoplePerception/PeopleDetected", PersonDetectorInstance.getName())
-    PersonDetectorInstance.memory.unsubscribeToEvent("PeoplePerception/JustArrived", PersonDetectorInstance.getName())
-    PersonDetectorInstance.memory.unsubscribeToEvent("PeoplePerception/JustLeft", PersonDetectorInstance.getName())
+    # Every module subscribed through the supervisor, so it can drop them all
+    broker_supervisor.stop_monitoring()
+    broker_supervisor.unsubscribe_all()
+    print("Broker supervision: " + str(broker_supervisor.get_stats()))
+    event_bus.shutdown()
+    print("Event handlers: " + str(event_bus.get_stats()))
+    print("Robot commands skipped by the state cache: " + str(my_pepper.get_cache_stats()))
+    print("Thinking fillers: " + str(chatGPT_interact.filler.get_stats()))
+    if SPECULATIVE_MODE:
+        print("Speculative chat requests: " + str(speculative_stats.summary()))
+    print("Conversation state time: " + str(conversation.get_stats()))
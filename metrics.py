@@ -0,0 +1,221 @@
+"""
+Process metrics for Pepper
+Counters, gauges and latency histograms kept in memory and rendered in the Prometheus
+text format. Robot RPCs are recorded by the proxy registry, HTTP calls to the chat and
+transcription APIs by http_request(); the web server exposes everything on /metrics so
+p95 latency and error rates can be watched live.
+Python 2.7 compatible version.
+"""
+
+import time
+import bisect
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; covers a fast ALMemory read up to a slow chat completion
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        escaped.append("{}=\"{}\"".format(name, value))
+    return "{" + ",".join(escaped) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty sequence, fraction in [0, 1]."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Metric:
+    """A named metric with one series per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.series = {}   # label values -> value (or histogram state)
+
+    def _key(self, label_values):
+        if len(label_values) != len(self.label_names):
+            raise ValueError("{} takes labels {}".format(self.name, self.label_names))
+        return tuple(label_values)
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.help_text),
+                 "# TYPE {} {}".format(self.name, self.kind)]
+        with self.lock:
+            for key in sorted(self.series):
+                lines.extend(self._render_series(key, self.series[key]))
+        return lines
+
+    def _render_series(self, key, value):
+        return ["{}{} {}".format(self.name, format_labels(self.label_names, key), format_value(value))]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, **kwargs):
+        key = self._key(label_values)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + kwargs.get("amount", 1)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        key = self._key(label_values)
+        with self.lock:
+            self.series[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        Metric.__init__(self, name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        key = self._key(label_values)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.series.get(key)
+            if state is None:
+                state = self.series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def quantile(self, q, *label_values):
+        """Estimate a quantile from the buckets (upper bound of the bucket it falls in)."""
+        key = self._key(label_values)
+        with self.lock:
+            state = self.series.get(key)
+            if not state or not state["count"]:
+                return None
+            rank = q * state["count"]
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                total += count
+                if total >= rank:
+                    return bound
+        return None
+
+    def _render_series(self, key, state):
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+            total += count
+            labels = format_labels(self.label_names, key, ("le", format_value(bound)))
+            lines.append("{}_bucket{} {}".format(self.name, labels, total))
+        labels = format_labels(self.label_names, key)
+        lines.append("{}_sum{} {}".format(self.name, labels, format_value(state["sum"])))
+        lines.append("{}_count{} {}".format(self.name, labels, state["count"]))
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Get-or-create access to every metric in the process, and the /metrics page.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _get(self, cls, name, help_text, label_names, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, label_names, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError("{} is already registered as a {}".format(name, metric.kind))
+            return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._get(Counter, name, help_text, label_names)
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._get(Gauge, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self):
+        with self.lock:
+            metrics = [self.metrics[name] for name in sorted(self.metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, handler):
+        """Answer a GET on METRICS_PATH from a BaseHTTPRequestHandler."""
+        body = self.render().encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", CONTENT_TYPE)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+_metrics = MetricsRegistry()
+
+
+def get_metrics():
+    """The process-wide metrics registry."""
+    return _metrics
+
+
+def record_rpc(service, method, seconds, error=None):
+    """One robot RPC; error is the exception it raised, if any."""
+    _metrics.histogram("pepper_rpc_seconds", "Duration of NAOqi proxy calls",
+                       ("service", "method")).observe(seconds, service, method)
+    if error is not None:
+        _metrics.counter("pepper_rpc_errors_total", "NAOqi proxy calls that raised",
+                         ("service", "method")).inc(service, method)
+
+
+def http_request(endpoint, method, url, **kwargs):
+    """
+    requests.request() that records its latency and status under endpoint (e.g. "chat").
+    For streamed responses the time is until the headers arrive.
+    """
+    import requests  # not needed by processes that only record robot RPCs
+    start = time.time()
+    status = "error"
+    try:
+        response = requests.request(method, url, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        _metrics.histogram("pepper_http_request_seconds", "Duration of HTTP API calls",
+                           ("endpoint",)).observe(time.time() - start, endpoint)
+        _metrics.counter("pepper_http_requests_total", "HTTP API calls by response status",
+                         ("endpoint", "status")).inc(endpoint, status)
@@ -1,14 +1,22 @@
 
 import random
 import time
-from naoqi import ALProxy
+from proxyRegistry import get_registry
+from ledEngine import get_led_engine
+from actuatorCache import get_actuator_cache
+from behaviorCatalog import get_behavior_catalog
+from tabletPage import get_tablet_page
+from phraseCache import get_phrase_cache
 import base64
-import cv2
-import numpy as np
 import string
 import os
 import socket
 from dotenv import load_dotenv
+from lazyImport import lazy_import
+
+# Only needed for camera images; imported on first use to keep start-up fast
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -16,6 +24,11 @@ load_dotenv()
 HTML_TOP = os.getenv("HTML_TOP")
 HTML_BOTTOM = os.getenv("HTML_BOTTOM")
 
+BEHAVIOR_STOP_TIMEOUT = 2.0  # seconds to wait for behaviors to report stopped
+HEAD_MOVE_TIMEOUT = 3.0      # seconds to wait for the head to reach its target
+HEAD_TOLERANCE = 0.05        # radians; closer than this to center counts as centered
+PHRASE_PLAY_TIMEOUT = 10.0   # seconds to wait for a pre-rendered phrase to finish playing
+
 def find_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
@@ -30,11 +43,19 @@ def find_ip():
 LOCAL = find_ip()
 
 class myPepper:
-    def __init__(self, PIP, PPORT, LOCAL):
-        self.tts = ALProxy("ALTextToSpeech", PIP, PPORT)
-        self.animated_tts = ALProxy("ALAnimatedSpeech", PIP, PPORT)
-        self.behavior_manager = ALProxy("ALBehaviorManager", PIP, PPORT)
-        self.leds = ALProxy("ALLeds",PIP,PPORT)
+    def __init__(self, PIP, PPORT, LOCAL, registry=None):
+        # Proxies are shared process-wide and created on first use
+        self.registry = registry if registry is not None else get_registry(PIP, PPORT)
+        self.tts = self.registry.get("ALTextToSpeech")
+        self.animated_tts = self.registry.get("ALAnimatedSpeech")
+        self.behavior_manager = self.registry.get("ALBehaviorManager")
+        # Installed/running behaviors, loaded once and kept current from ALMemory events
+        self.behavior_catalog = get_behavior_catalog(self.behavior_manager, self.registry)
+        self.leds = self.registry.get("ALLeds")
+        # Eye animations are played by one shared background thread
+        self.led_engine = get_led_engine(self.leds, self.registry)
+        # Last commanded robot state, so repeated commands can be skipped
+        self.actuator_cache = get_actuator_cache(self.registry)
         self.PIP = PIP
         self.PPORT = PPORT
         
@@ -43,14 +64,20 @@ class myPepper:
         
         
         # Get a proxy for the ALSpeechRecognition module
-        self.asr_service = ALProxy("ALSpeechRecognition", self.PIP, self.PPORT)
-        self.tablet_manager = ALProxy("ALTabletService", self.PIP, self.PPORT)
-        self.package_manager = ALProxy("PackageManager", self.PIP, self.PPORT)
-        self.autonomous_life = ALProxy("ALAutonomousLife", PIP, PPORT)
-        self.motion = ALProxy("ALMotion", PIP, PPORT)
+        self.asr_service = self.registry.get("ALSpeechRecognition")
+        self.tablet_manager = self.registry.get("ALTabletService")
+        self.package_manager = self.registry.get("PackageManager")
+        self.autonomous_life = self.registry.get("ALAutonomousLife")
+        self.motion = self.registry.get("ALMotion")
+        self.video_service = self.registry.get("ALVideoDevice")
 
         self.last_phrase = None
         self.thinking_phrases = ["thinking", "processing", "contemplating","reflecting","Deliberating","considering","pondering","mulling"]
+        # Fixed phrases are rendered to audio files once per voice and played without synthesis
+        self.audio_player = self.registry.get("ALAudioPlayer")
+        self.phrase_cache = get_phrase_cache(self.tts, self.audio_player, self.registry)
+        self.phrase_cache.add_phrases(self.thinking_phrases)
+        self.last_phrase_cached = False
         
         self.resolution = 2    # VGA
         self.colorSpace = 11   # RGB
@@ -59,10 +86,18 @@ class myPepper:
 
     def initialize_autonomous_life(self):
         print("--> initialize_autonomous_life --")
-        self.autonomous_life = ALProxy("ALAutonomousLife", self.PIP, self.PPORT)
+        self.registry.recreate("ALAutonomousLife")
 
     def initialize_leds(self):
-        self.leds = ALProxy("ALLeds", self.PIP, self.PPORT)
+        self.registry.recreate("ALLeds")
+
+    def get_cache_stats(self):
+        """RPCs skipped because the robot was already in the requested state."""
+        stats = self.actuator_cache.get_stats()
+        stats["ALLeds.dropped"] = self.led_engine.get_stats()["dropped"]
+        stats["total_saved"] += stats["ALLeds.dropped"]
+        stats["phrase_cache"] = self.phrase_cache.get_stats()
+        return stats
 
     def is_module_running(self):
         print("--> is_module_running --")
@@ -72,6 +107,8 @@ class myPepper:
             return False
         
     def is_leds_module_running(self):
+        # A direct call so a dead module raises here; the LED engine no longer knows what the eyes show
+        self.led_engine.invalidate()
         try:
             self.leds.fadeRGB("FaceLeds", "white", 0.1)
             return True
@@ -90,25 +127,47 @@ class myPepper:
         :param wait: Whether to wait for motion to complete (default True)
         """
         try:
-            
-            self.motion.wakeUp()
-
             names = ["HeadYaw", "HeadPitch"]
             angles = [0.0, 0.0]  # radians
             fractionMaxSpeed = speed
 
-            self.motion.setAngles(names, angles, fractionMaxSpeed)
+            # Skip the move if the head is already centered
+            current = self.motion.getAngles(names, True)
+            if max(abs(angle) for angle in current) < HEAD_TOLERANCE:
+                print("center_pepper_head: already centered")
+                return
+
+            if not self.motion.robotIsWakeUp():
+                self.motion.wakeUp()
 
-            if wait:
-                time.sleep(2)  # Adjust based on expected motion duration
+            # Runs until the joints reach the target; the task id tells us when that is
+            task_id = self.motion.post.angleInterpolationWithSpeed(names, angles, fractionMaxSpeed)
+
+            if wait and self.wait_for_tasks(self.motion, [task_id], HEAD_MOVE_TIMEOUT):
+                print("center_pepper_head: timed out before reaching center")
+                return
             
             print("center_pepper_head SUCCESS")
 
         except Exception as e:
             print("Error in center_pepper_head:", e)
 
+    def wait_for_tasks(self, proxy, task_ids, timeout):
+        """
+        Waits for post-ed calls on proxy to finish, sharing one deadline.
+        Returns the ids still running when the timeout ran out.
+        """
+        deadline = time.time() + timeout
+        unfinished = []
+        for task_id in task_ids:
+            remaining_ms = int((deadline - time.time()) * 1000)
+            # A timeout of 0 means "wait forever" to NAOqi, so past the deadline don't wait at all
+            if remaining_ms < 1 or not proxy.wait(task_id, remaining_ms):
+                unfinished.append(task_id)
+        return unfinished
+
     def get_pepper_image_as_base64(self):
-        video_service = ALProxy("ALVideoDevice", self.PIP, self.PPORT)
+        video_service = self.video_service
         resolution = self.resolution    # VGA
         colorSpace = self.colorSpace   # RGB
 
@@ -146,15 +205,46 @@ class myPepper:
     def tabletImage(self, imageURL):
         print("--- MYPEPPER -> TABLETIMAGE -> IMAGEURL = " + str(imageURL))
 
-        self.tablet_manager.showWebview(imageURL)
-        #self.tablet_manager.reloadPage(True)
-        print(self.tablet_manager.loadUrl(imageURL)) # showWebview
+        if self.actuator_cache.is_current(("ALTabletService", "webview"), imageURL):
+            return
+
+        try:
+            self.tablet_manager.showWebview(imageURL)
+            #self.tablet_manager.reloadPage(True)
+            print(self.tablet_manager.loadUrl(imageURL)) # showWebview
+        except RuntimeError as e:
+            # The tablet is down (NAOqi error, or CircuitOpenError once its breaker opens); carry on without it
+            print("Tablet unavailable:", str(e))
+            return
+        self.actuator_cache.update(("ALTabletService", "webview"), imageURL)
 
     def tabletShowSpeech(self, text):
         print("--- MYPEPPER -> TABLETSHOWSPEECH -> TEXT = " + str(text))
 
+        tablet_page = get_tablet_page()
+        if tablet_page.is_enabled():
+            # The page is loaded once; after that the text is pushed to it
+            if not self.actuator_cache.is_current(("ALTabletService", "webview"), tablet_page.url):
+                try:
+                    self.tablet_manager.showWebview(tablet_page.url)
+                    self.actuator_cache.update(("ALTabletService", "webview"), tablet_page.url)
+                except RuntimeError as e:
+                    print("Tablet unavailable:", str(e))
+            tablet_page.show_text(str(text))
+            return
+
         html_content = str(self.HTML_TOP) + str(text) + str(self.HTML_BOTTOM)
-        self.tablet_manager.showWebview("data:text/html," + html_content)
+        url = "data:text/html," + html_content
+        if self.actuator_cache.is_current(("ALTabletService", "webview"), url):
+            return
+
+        try:
+            self.tablet_manager.showWebview(url)
+        except RuntimeError as e:
+            # A dead tablet must not stop the sentence from being spoken
+            print("Tablet unavailable:", str(e))
+            return
+        self.actuator_cache.update(("ALTabletService", "webview"), url)
         print("WEB HTML SENT!")
 
     ''' pepperAnnimation - Old code - 6/27/24
@@ -180,10 +270,11 @@ class myPepper:
             set_state = "interactive"
             print("interactive")
 
-        if not self.is_module_running():
-            print("Module is not running, reinitializing...")
-            self.initialize_autonomous_life()
+        # Already in this state (as last set, or as reported by ALMemory)
+        if self.actuator_cache.is_current(("ALAutonomousLife", "state"), set_state):
+            return set_state
 
+        # No is_module_running() pre-check: the registry proxy re-creates a destroyed module on the call itself
         print("Ready1")
         try:
             self.autonomous_life.setState(set_state)  # Ensure 'autonomous_life' is used correctly
@@ -194,9 +285,43 @@ class myPepper:
                 self.autonomous_life.setState(set_state)
             else:
                 print("Failed to set autonomous life state: {}".format(e))
+                return set_state
+        self.actuator_cache.update(("ALAutonomousLife", "state"), set_state)
         print("Ready2")
         return set_state
     
+    def set_voice(self, voice):
+        """Sets the TTS voice unless it is already in use."""
+        if self.actuator_cache.is_current(("ALTextToSpeech", "voice"), voice):
+            return
+        self.tts.setVoice(voice)
+        self.actuator_cache.update(("ALTextToSpeech", "voice"), voice)
+        self.phrase_cache.set_voice(voice)
+
+    def say_phrase(self, phrase, wait=True):
+        """
+        Say a fixed phrase from its pre-rendered audio if it is ready, otherwise with TTS.
+        Phrases are registered with self.phrase_cache.add_phrases().
+        """
+        print("--- MYPEPPER -> SAY_PHRASE -> PHRASE = " + str(phrase))
+        try:
+            task_id = self.phrase_cache.play(phrase)
+        except RuntimeError as e:
+            print("Could not play cached phrase, speaking it instead: " + str(e))
+            task_id = None
+        if task_id is None:
+            self.have_pepper_say(phrase)
+            return
+        self.tabletShowSpeech(str(phrase))
+        if not wait:
+            return
+        try:
+            if self.wait_for_tasks(self.audio_player, [task_id], PHRASE_PLAY_TIMEOUT):
+                print("Phrase still playing after {}s, stopping it".format(PHRASE_PLAY_TIMEOUT))
+                self.audio_player.stop(task_id)
+        except RuntimeError as e:
+            print("Error while playing cached phrase: " + str(e))
+
     def have_pepper_say(self, speaktext):
         print("--- MYPEPPER -> HAVE_PEPPER_SAY -> SPEAKTEXT = " + str(speaktext))
         try:
@@ -291,39 +416,55 @@ class myPepper:
         behavior = random.choice(thinking_behaviors)
         #self.behavior_manager.runBehavior(behavior, _async=True)
 
+    def start_thinking_phrase(self):
+        """
+        Say a thinking phrase without waiting for it (used by thinkingFiller).
+        Plays the pre-rendered audio when it is ready; stop_thinking_phrase() cuts it off.
+        """
+        new_phrase = random.choice(self.thinking_phrases)
+        self.last_phrase = new_phrase
+        get_tablet_page().set_status(new_phrase + "...")
+        task_id = self.phrase_cache.play(new_phrase)
+        self.last_phrase_cached = task_id is not None
+        if task_id is None:
+            task_id = self.animated_tts.post.say(str(new_phrase))
+        return task_id
+
+    def stop_thinking_phrase(self, task_id=None):
+        """
+        Stop the phrase started by start_thinking_phrase(), whichever way it was played.
+        Given the task id it returned, a spoken phrase is stopped on its own, not with stopAll().
+        """
+        if self.last_phrase_cached:
+            self.phrase_cache.stop()
+        elif task_id is not None:
+            self.animated_tts.stop(task_id)
+        else:
+            self.tts.stopAll()
+
 
 
     def launchAndStopBehavior(self, behavior_name):
         print("--- MYPEPPER -> LAUNCHANDSTOPBEHAVIOR -> BEHAVIOR_NAME = " + str(behavior_name))
 
         """
-        Launch and stop a behavior, if possible.
+        Launch a behavior without waiting for it, if it is known and not already running.
         """
-        # Check that the behavior exists.
-        if (self.behavior_manager.isBehaviorInstalled(behavior_name)):
-            # Check that it is not already running.
-            if (not self.behavior_manager.isBehaviorRunning(behavior_name)):
-                # Launch behavior. This is a blocking call, use _async=True if you do not
-                # want to wait for the behavior to finish.
-                self.behavior_manager.runBehavior(behavior_name, _async=True)
-                time.sleep(0.5)
-            else:
-                print("Behavior is already running.")
-
-        else:
-            print("Behavior not found.")
-
-        return
+        launched = self.behavior_catalog.launch(behavior_name)
+        if launched:
+            self.led_engine.invalidate()  # animations may set the eye LEDs themselves
+        return launched
 
     def start_behavior(self, behavior_name):
          # Stop all the behaviors
         #self.behavior_manager.stopAllBehaviors()
 
         # Check if the behavior is running before attempting to stop it
-        if behavior_name in self.behavior_manager.getInstalledBehaviors():
+        if self.behavior_catalog.is_installed(behavior_name):
         
             #start a new one
             self.behavior_manager.runBehavior(behavior_name)
+            self.led_engine.invalidate()  # animations may set the eye LEDs themselves
             print("Behavior '{}' Started.".format(behavior_name))
             self.behavior_manager.stopAllBehaviors() # so it doesnt loop
         else:
@@ -341,15 +482,13 @@ class myPepper:
         if running_behaviors:
             print("--- Stopping all behaviors-----------")
 
-            # Stop each running behavior
-            for behavior in running_behaviors:
-                self.behavior_manager.stopBehavior(behavior)
-
-            # Wait for some time to ensure the behaviors are stopped
-            time.sleep(2.0)
+            # Stop the running behaviors in parallel and wait until each stop call completes
+            task_ids = [self.behavior_manager.post.stopBehavior(behavior) for behavior in running_behaviors]
+            self.wait_for_tasks(self.behavior_manager, task_ids, BEHAVIOR_STOP_TIMEOUT)
 
             # Check if any behaviors are still running after stopping
             running_behaviors = self.behavior_manager.getRunningBehaviors()
+            self.behavior_catalog.on_behaviors_run(running_behaviors)
 
             if not running_behaviors:
                 print("All behaviors have been stopped.")
@@ -368,13 +507,21 @@ class myPepper:
         color_name (str): The name of the color ("white", "red", "green", "blue", "yellow", "magenta", "cyan").
         duration (float): Time in seconds over which the color transition occurs.
         """
-        try:
+        # Queued on the LED engine; this also ends any running eye rotation
+        self.led_engine.fade(color_name, duration)
+        get_tablet_page().set_color(color_name)
+        print("Fading eyes to {} over {} seconds.".format(color_name, duration))
 
-            # Fade the eyes to the specified color
-            self.leds.fadeRGB("FaceLeds", color_name, duration)
-            print("Fading eyes to {} over {} seconds.".format(color_name, duration))
-        except Exception as e:
-            print("Failed to fade eyes: {}".format(e))
+    def start_eye_rotation(self, red, green, blue, rotate_seconds=1):
+        """
+        Rotates the eyes in the given color until stop_eye_rotation() or fade_eyes() is called.
+        Returns immediately; the animation runs on the LED engine thread.
+        """
+        self.led_engine.rotate(red, green, blue, rotate_seconds)
+
+    def stop_eye_rotation(self):
+        """Stops the eye rotation, leaving the eyes as they are."""
+        self.led_engine.cancel()
 
     ''' change_eye_color_with_turn - OLD
     def change_eye_color_with_turn(self, red, green, blue, rotate_seconds, total_seconds):
@@ -421,6 +568,7 @@ class myPepper:
         
         # To set eyes to white, set R,G,B to max intensity (1.0)
         self.leds.reset("FaceLeds")
+        self.led_engine.invalidate()
 
     def toggle_speech_recognition(self, enable):
         print("--- MYPEPPER -> TOGGLE_SPEECH_RECOGNITION -> ENABLE = " + str(enable))
@@ -0,0 +1,684 @@
+"""
+NAOqi service simulator for Pepper
+Stands in for the naoqi SDK (ALProxy, ALBroker, ALModule) so the robot-side code can
+be run and timed without a robot. Each call sleeps for a latency drawn from a
+configurable per-method distribution and is recorded in a call log; services can be
+scripted to die with "module destroyed"; ALMemory events can be raised and are
+delivered to subscribed ALModules.
+
+Use install() before anything imports naoqi:
+
+    import naoqiSimulator
+    simulator = naoqiSimulator.install()
+    from myPepper import myPepper
+
+Python 2.7 compatible version.
+"""
+
+import sys
+import json
+import time
+import types
+import random
+import inspect
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Round-trip latency per "Service.method" (or "Service" or "default"), in seconds.
+# A distribution is ["fixed", s], ["uniform", low, high], ["normal", mean, sd] or ["lognormal", mu, sigma].
+DEFAULT_LATENCIES = {
+    "default": ["uniform", 0.005, 0.02],
+    "ALBehaviorManager.getInstalledBehaviors": ["uniform", 0.05, 0.15],
+    "ALVideoDevice.getImageRemote": ["uniform", 0.08, 0.2],
+    "ALTabletService.showWebview": ["uniform", 0.03, 0.1],
+    "PackageManager.packages": ["uniform", 0.05, 0.15],
+}
+
+SPEECH_SECONDS_PER_WORD = 0.3
+BEHAVIOR_SECONDS = 2.0
+INSTALLED_BEHAVIORS = [
+    "animations/Stand/Gestures/Shy_1",
+    "animations/Stand/Gestures/Surprised_1",
+    "animations/Stand/Reactions/TouchHead_3",
+    "animations/Stand/Waiting/KnockEye_1",
+    "ht_pepper_five/handshake",
+    "ht_pepper_five/fistbump",
+    "ht_animation_lib/tickle_1",
+]
+
+
+def sample_latency(distribution, rng=random):
+    kind = distribution[0]
+    if kind == "fixed":
+        return float(distribution[1])
+    if kind == "uniform":
+        return rng.uniform(distribution[1], distribution[2])
+    if kind == "normal":
+        return max(0.0, rng.gauss(distribution[1], distribution[2]))
+    if kind == "lognormal":
+        return rng.lognormvariate(distribution[1], distribution[2])
+    raise ValueError("Unknown latency distribution: {}".format(kind))
+
+
+class ServiceDead(RuntimeError):
+    pass
+
+
+# ---------------------------------------------------------------------------
+# Simulated services. Methods may call self.simulator.busy(seconds) for the time
+# the action itself takes (speech, motion, behaviors) on top of the RPC latency.
+# Methods that are not defined here succeed and return None.
+# ---------------------------------------------------------------------------
+
+class SimService(object):
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+
+class SimTextToSpeech(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.voice = "naoenu"
+        self.stopped = threading.Event()
+
+    def say(self, text, *args):
+        self.stopped.clear()
+        self.simulator.busy(len(str(text).split()) * SPEECH_SECONDS_PER_WORD, self.stopped)
+
+    def stopAll(self):
+        self.stopped.set()
+
+    def sayToFile(self, text, path):
+        # Rendering is faster than speaking it
+        self.simulator.busy(len(str(text).split()) * SPEECH_SECONDS_PER_WORD * 0.2)
+        self.simulator.services["ALAudioPlayer"].files[path] = len(str(text).split()) * SPEECH_SECONDS_PER_WORD
+
+    def getLanguage(self):
+        return "English"
+
+    def getAvailableLanguages(self):
+        return ["English"]
+
+    def getVoice(self):
+        return self.voice
+
+    def setVoice(self, voice):
+        self.voice = voice
+
+
+class SimAnimatedSpeech(SimService):
+    def say(self, text, *args):
+        self.simulator.services["ALTextToSpeech"].say(text)
+
+    def getTagsConfiguration(self):
+        return {}
+
+
+class SimAudioPlayer(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.files = {}    # path -> seconds of audio
+        self.loaded = {}   # file id -> path
+        self.stopped = threading.Event()
+
+    def loadFile(self, path):
+        if path not in self.files:
+            raise RuntimeError("ALAudioPlayer::loadFile file not found: {}".format(path))
+        file_id = len(self.loaded) + 1
+        self.loaded[file_id] = path
+        return file_id
+
+    def play(self, file_id, *args):
+        self.stopped.clear()
+        self.simulator.busy(self.files[self.loaded[file_id]], self.stopped)
+
+    def playFile(self, path, *args):
+        self.stopped.clear()
+        self.simulator.busy(self.files.get(path, 0.0), self.stopped)
+
+    def stopAll(self):
+        self.stopped.set()
+
+    def unloadAllFiles(self):
+        self.loaded.clear()
+
+
+class SimBehaviorManager(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.installed = list(INSTALLED_BEHAVIORS)
+        self.running = {}  # name -> stop Event
+
+    def getInstalledBehaviors(self):
+        return list(self.installed)
+
+    def getRunningBehaviors(self):
+        return list(self.running.keys())
+
+    def isBehaviorInstalled(self, name):
+        return name in self.installed
+
+    def isBehaviorRunning(self, name):
+        return name in self.running
+
+    def runBehavior(self, name):
+        if name not in self.installed:
+            raise RuntimeError("ALBehaviorManager::runBehavior Behavior not found: {}".format(name))
+        stop = threading.Event()
+        self.running[name] = stop
+        self.simulator.raise_event("BehaviorsRun", self.getRunningBehaviors())
+        self.simulator.busy(BEHAVIOR_SECONDS, stop)
+        self.running.pop(name, None)
+        self.simulator.raise_event("BehaviorsRun", self.getRunningBehaviors())
+
+    def stopBehavior(self, name):
+        stop = self.running.get(name)
+        if stop:
+            stop.set()
+
+    def stopAllBehaviors(self):
+        for stop in list(self.running.values()):
+            stop.set()
+
+
+class SimLeds(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.colors = {}
+
+    def fadeRGB(self, group, color, duration, *args):
+        self.simulator.busy(duration)
+        self.colors[group] = color
+
+    def rotateEyes(self, rgb, period, duration):
+        self.simulator.busy(duration)
+
+    def reset(self, group):
+        self.colors.pop(group, None)
+
+    def listGroups(self):
+        return ["FaceLeds", "ChestLeds", "EarLeds"]
+
+
+class SimTabletService(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.url = None
+
+    def showWebview(self, url=None):
+        self.url = url
+        return True
+
+    def loadUrl(self, url):
+        self.url = url
+        return True
+
+    def hideWebview(self):
+        self.url = None
+
+    def robotIp(self):
+        return "198.18.0.1"
+
+
+class SimPackageManager(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.installed = ["boot-config"]
+
+    def packages(self):
+        return list(self.installed)
+
+    def removePkg(self, name):
+        if name in self.installed:
+            self.installed.remove(name)
+        return True
+
+
+class SimAutonomousLife(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.state = "solitary"
+
+    def getState(self):
+        return self.state
+
+    def setState(self, state):
+        self.simulator.busy(0.2)
+        if state != self.state:
+            self.state = state
+            self.simulator.raise_event("AutonomousLife/State", state)
+
+
+class SimMotion(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.awake = True
+        self.angles = {"HeadYaw": 0.0, "HeadPitch": 0.0}
+
+    def getSummary(self):
+        return "simulated"
+
+    def wakeUp(self):
+        if not self.awake:
+            self.simulator.busy(2.0)
+        self.awake = True
+
+    def rest(self):
+        self.awake = False
+
+    def robotIsWakeUp(self):
+        return self.awake
+
+    def getAngles(self, names, use_sensors):
+        return [self.angles.get(name, 0.0) for name in names]
+
+    def setAngles(self, names, angles, speed):
+        for name, angle in zip(names, angles):
+            self.angles[name] = angle
+
+    def angleInterpolationWithSpeed(self, names, angles, speed):
+        distance = max([abs(self.angles.get(name, 0.0) - angle) for name, angle in zip(names, angles)] + [0.0])
+        self.simulator.busy(distance / max(speed, 0.01))
+        self.setAngles(names, angles, speed)
+
+
+class SimMemory(SimService):
+    def __init__(self, simulator):
+        SimService.__init__(self, simulator)
+        self.data = {}
+
+    def subscribeToEvent(self, event, module_name, callback_name):
+        self.simulator.subscribe(event, module_name, callback_name)
+
+    def unsubscribeToEvent(self, event, module_name):
+        self.simulator.unsubscribe(event, module_name)
+
+    def getEventList(self):
+        return sorted(self.simulator.subscriptions.keys())
+
+    def getSubscribers(self, event):
+        return sorted(self.simulator.subscriptions.get(event, {}).keys())
+
+    def raiseEvent(self, event, value):
+        self.simulator.raise_event(event, value)
+
+    def insertData(self, key, value):
+        self.data[key] = value
+
+    def getData(self, key):
+        return self.data.get(key)
+
+
+class SimVideoDevice(SimService):
+    def getCameraName(self, index):
+        return "CameraTop" if index == 0 else "CameraBottom"
+
+    def subscribe(self, name, resolution, color_space, fps):
+        return name + "_0"
+
+    def unsubscribe(self, name):
+        return True
+
+    def getImageRemote(self, name):
+        width, height = 640, 480
+        return [width, height, 3, 11, 0, 0, bytearray(width * height * 3)]
+
+
+class SimPeoplePerception(SimService):
+    def getCurrentPeriod(self):
+        return 500
+
+    def setMaximumDetectionRange(self, meters):
+        pass
+
+    def resetPopulation(self):
+        pass
+
+
+SERVICE_CLASSES = {
+    "ALTextToSpeech": SimTextToSpeech,
+    "ALAnimatedSpeech": SimAnimatedSpeech,
+    "ALAudioPlayer": SimAudioPlayer,
+    "ALBehaviorManager": SimBehaviorManager,
+    "ALLeds": SimLeds,
+    "ALSpeechRecognition": SimService,
+    "ALTabletService": SimTabletService,
+    "PackageManager": SimPackageManager,
+    "ALAutonomousLife": SimAutonomousLife,
+    "ALMotion": SimMotion,
+    "ALMemory": SimMemory,
+    "ALVideoDevice": SimVideoDevice,
+    "ALPeoplePerception": SimPeoplePerception,
+}
+
+
+class Simulator:
+    """
+    State of the simulated robot, the call log and the scripted failures.
+    time_scale shrinks every sleep (0.1 runs ten times faster); logged latencies stay unscaled.
+    """
+
+    def __init__(self, latencies=None, time_scale=1.0, seed=None):
+        self.latencies = dict(DEFAULT_LATENCIES)
+        if latencies:
+            self.latencies.update(latencies)
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.services = dict((name, cls(self)) for name, cls in SERVICE_CLASSES.items())
+        self.generations = dict((name, 0) for name in self.services)
+        self.down = set()
+        self.scheduled_deaths = {}  # service -> calls left before it dies
+        self.modules = {}
+        self.subscriptions = {}  # event -> {module_name: callback_name}
+        self.call_log = []
+        self.event_log = []
+
+    # -- configuration ------------------------------------------------------
+
+    def load_latencies(self, path):
+        """Merge latency distributions from a JSON file of {"Service.method": [...]}."""
+        with open(path) as f:
+            self.latencies.update(json.load(f))
+
+    def latency_for(self, service, method):
+        for key in ("{}.{}".format(service, method), service, "default"):
+            if key in self.latencies:
+                return sample_latency(self.latencies[key], self.random)
+        return 0.0
+
+    def busy(self, seconds, stop_event=None):
+        """Time the action itself takes; returns early if stop_event is set."""
+        seconds = float(seconds) * self.time_scale
+        if stop_event is not None:
+            stop_event.wait(seconds)
+        elif seconds > 0:
+            time.sleep(seconds)
+
+    # -- scripted failures --------------------------------------------------
+
+    def kill(self, service):
+        """Existing proxies for service start failing with "module destroyed"; new ones work."""
+        with self.lock:
+            self.generations[service] += 1
+        logger.info("Simulator: {} destroyed".format(service))
+
+    def kill_after(self, service, calls):
+        """Kill service after it has served this many more calls."""
+        with self.lock:
+            self.scheduled_deaths[service] = calls
+
+    def take_down(self, service):
+        """Service is unreachable: calls and new proxies fail until bring_up()."""
+        with self.lock:
+            self.down.add(service)
+            self.generations[service] += 1
+
+    def bring_up(self, service):
+        with self.lock:
+            self.down.discard(service)
+
+    def drop_broker(self):
+        """Network blip: the robot forgets every remote module and its subscriptions."""
+        with self.lock:
+            self.modules.clear()
+            self.subscriptions.clear()
+        logger.info("Simulator: remote broker dropped")
+
+    # -- calls --------------------------------------------------------------
+
+    def check_service(self, service, generation=None):
+        if service not in self.services:
+            raise RuntimeError("ALProxy::ALProxy Can't find service: {}".format(service))
+        if service in self.down:
+            raise RuntimeError("ALProxy::ALProxy Can't find service: {} (not connected)".format(service))
+        if generation is not None and generation != self.generations[service]:
+            raise ServiceDead("{} module destroyed".format(service))
+
+    def call(self, service, generation, method, args):
+        latency = self.latency_for(service, method)
+        record = {"time": time.time(), "service": service, "method": method, "args": list(args),
+                  "latency": latency, "error": None, "thread": threading.current_thread().name}
+        with self.lock:
+            self.call_log.append(record)
+            if service in self.scheduled_deaths:
+                self.scheduled_deaths[service] -= 1
+                if self.scheduled_deaths[service] < 0:
+                    del self.scheduled_deaths[service]
+                    self.generations[service] += 1
+        self.busy(latency)
+        try:
+            self.check_service(service, generation)
+            implementation = getattr(self.services[service], method, None)
+            if implementation is None:
+                return None
+            return implementation(*args)
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+
+    # -- modules and events -------------------------------------------------
+
+    def register_module(self, module):
+        self.modules[module.getName()] = module
+
+    def subscribe(self, event, module_name, callback_name):
+        with self.lock:
+            self.subscriptions.setdefault(event, {})[module_name] = callback_name
+
+    def unsubscribe(self, event, module_name):
+        with self.lock:
+            self.subscriptions.get(event, {}).pop(module_name, None)
+
+    def raise_event(self, event, value, message=""):
+        """Deliver an ALMemory event to every subscribed module on its own thread, as NAOqi does."""
+        with self.lock:
+            targets = list(self.subscriptions.get(event, {}).items())
+            self.event_log.append({"time": time.time(), "event": event, "value": value, "subscribers": len(targets)})
+        threads = []
+        for module_name, callback_name in targets:
+            module = self.modules.get(module_name)
+            if module is None:
+                continue
+            thread = threading.Thread(target=self._deliver, args=(module, callback_name, event, value, message))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def schedule_event(self, delay, event, value, message=""):
+        """Raise an event after delay seconds (scaled by time_scale)."""
+        timer = threading.Timer(delay * self.time_scale, self.raise_event, args=(event, value, message))
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def _deliver(self, module, callback_name, event, value, message):
+        callback = getattr(module, callback_name)
+        # NAOqi passes as many of (key, value, message) as the callback accepts
+        try:
+            spec = inspect.getargspec(callback)
+        except (AttributeError, ValueError):
+            spec = inspect.getfullargspec(callback)
+        arity = len(spec.args) - 1 if inspect.ismethod(callback) else len(spec.args)
+        if arity == 1:
+            arguments = (value,)
+        elif arity == 2:
+            arguments = (event, value)
+        else:
+            arguments = (event, value, message)
+        try:
+            callback(*arguments)
+        except Exception as e:
+            logger.error("Simulator: {}.{} raised {}".format(module.getName(), callback_name, e))
+
+    # -- measurement --------------------------------------------------------
+
+    def mark(self, label):
+        """Insert a marker into the call log, e.g. at the start of each turn."""
+        with self.lock:
+            self.call_log.append({"time": time.time(), "marker": label})
+
+    def reset_log(self):
+        with self.lock:
+            self.call_log = []
+            self.event_log = []
+
+    def get_stats(self):
+        """Calls, errors and total latency per Service.method."""
+        stats = {}
+        with self.lock:
+            records = [record for record in self.call_log if "marker" not in record]
+        for record in records:
+            key = "{}.{}".format(record["service"], record["method"])
+            entry = stats.setdefault(key, {"calls": 0, "errors": 0, "latency": 0.0})
+            entry["calls"] += 1
+            entry["latency"] += record["latency"]
+            if record["error"]:
+                entry["errors"] += 1
+        return stats
+
+    def summarize_turns(self):
+        """RPC count, errors and summed latency between consecutive markers."""
+        turns = []
+        current = None
+        with self.lock:
+            log = list(self.call_log)
+        for record in log:
+            if "marker" in record:
+                current = {"turn": record["marker"], "rpcs": 0, "errors": 0, "latency": 0.0, "by_method": {}}
+                turns.append(current)
+                continue
+            if current is None:
+                current = {"turn": None, "rpcs": 0, "errors": 0, "latency": 0.0, "by_method": {}}
+                turns.append(current)
+            key = "{}.{}".format(record["service"], record["method"])
+            current["rpcs"] += 1
+            current["latency"] += record["latency"]
+            current["by_method"][key] = current["by_method"].get(key, 0) + 1
+            if record["error"]:
+                current["errors"] += 1
+        return turns
+
+
+# ---------------------------------------------------------------------------
+# naoqi interfaces
+# ---------------------------------------------------------------------------
+
+_simulator = None
+
+
+def get_simulator():
+    global _simulator
+    if _simulator is None:
+        _simulator = Simulator()
+    return _simulator
+
+
+class _PostCalls(object):
+    def __init__(self, proxy):
+        self._proxy = proxy
+
+    def __getattr__(self, method):
+        def start(*args):
+            return self._proxy._start(method, args)
+        return start
+
+
+class ALProxy(object):
+    """Simulated ALProxy bound to the service's generation at creation time."""
+
+    def __init__(self, service, ip=None, port=None):
+        self._simulator = get_simulator()
+        self._service = service
+        self._simulator.busy(self._simulator.latency_for(service, "__init__"))
+        self._simulator.check_service(service)
+        self._generation = self._simulator.generations[service]
+        self._tasks = {}
+        self._task_lock = threading.Lock()
+        self._next_task = 0
+        self.post = _PostCalls(self)
+
+    def __getattr__(self, method):
+        if method.startswith("__"):
+            raise AttributeError(method)
+
+        def call(*args):
+            return self._simulator.call(self._service, self._generation, method, args)
+        return call
+
+    def _start(self, method, args):
+        with self._task_lock:
+            self._next_task += 1
+            task_id = self._next_task
+
+        def run():
+            try:
+                self._simulator.call(self._service, self._generation, method, args)
+            except Exception as e:
+                logger.warning("Simulator: post {}.{} failed: {}".format(self._service, method, e))
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        self._tasks[task_id] = thread
+        thread.start()
+        return task_id
+
+    def wait(self, task_id, timeout_ms):
+        self._simulator.call(self._service, self._generation, "wait", (task_id, timeout_ms))
+        thread = self._tasks.get(task_id)
+        if thread is None:
+            return True
+        thread.join(timeout_ms / 1000.0 if timeout_ms else None)
+        return not thread.is_alive()
+
+    def isRunning(self, task_id):
+        thread = self._tasks.get(task_id)
+        return thread is not None and thread.is_alive()
+
+    def stop(self, task_id):
+        self._simulator.call(self._service, self._generation, "stop", (task_id,))
+        # Interrupts speech and behaviors; other actions (LED animations, moves) simply run to completion
+        if self._service in ("ALTextToSpeech", "ALAnimatedSpeech"):
+            self._simulator.services["ALTextToSpeech"].stopAll()
+        elif self._service == "ALBehaviorManager":
+            self._simulator.services["ALBehaviorManager"].stopAllBehaviors()
+
+
+class ALBroker(object):
+    def __init__(self, name, ip, port, pip, pport):
+        self.name = name
+        self.pip = pip
+        self.pport = pport
+
+    def shutdown(self):
+        pass
+
+
+class ALModule(object):
+    def __init__(self, name):
+        self._name = name
+        get_simulator().register_module(self)
+
+    def getName(self):
+        return self._name
+
+
+def install(simulator=None):
+    """
+    Register this module as "naoqi" so later imports get the simulator.
+    Returns the simulator in use.
+    """
+    global _simulator
+    if simulator is not None:
+        _simulator = simulator
+    module = types.ModuleType("naoqi")
+    module.ALProxy = ALProxy
+    module.ALBroker = ALBroker
+    module.ALModule = ALModule
+    sys.modules["naoqi"] = module
+    return get_simulator()
@@ -0,0 +1,137 @@
+"""
+Live operator dashboard for Pepper
+website/operator.html shows what the robot is doing right now: the listening state,
+the transcript of the last utterance, the reply as it streams in, the personality,
+queue depths and how long each stage of the turn took. Everything is pushed over
+Server-Sent Events from an in-memory EventStream, so publishing never waits on a
+slow browser.
+Python 2.7 compatible version.
+"""
+
+import time
+import threading
+import logging
+from eventStream import EventStream
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DASHBOARD_PAGE = "/operator.html"
+DASHBOARD_EVENTS_PATH = "/events/operator"
+QUEUE_SAMPLE_SECONDS = 1.0   # how often queue depths are sampled while a browser is connected
+
+
+class OperatorDashboard:
+    """
+    Current turn state and the event stream that keeps operator pages in sync.
+    """
+
+    def __init__(self):
+        self.events = EventStream()
+        self.lock = threading.Lock()
+        self.state = {"conversation": "", "listening": "", "transcript": "", "reply": "", "personality": "",
+                      "queues": {}, "timings": {}}
+        self.queue_sources = {}    # name -> callable returning a depth
+        self.turn_start = None
+        self.stage_start = None
+        self.timings = {}
+        self.sampler = None
+
+    def _update(self, key, value):
+        with self.lock:
+            if self.state[key] == value:
+                return False
+            self.state[key] = value
+        self.events.publish(key, value)
+        return True
+
+    def set_listening(self, state):
+        """CHAT_STATE from the recorder, or a stage name between recordings."""
+        self._update("listening", state)
+
+    def set_conversation(self, state):
+        """State of the conversation state machine (idle, listening, ... ending)."""
+        self._update("conversation", state)
+
+    def set_personality(self, personality):
+        self._update("personality", personality)
+
+    def show_transcript(self, text):
+        self._update("transcript", text)
+
+    def start_reply(self):
+        self._update("reply", "")
+
+    def append_reply(self, chunk):
+        """Add streamed reply text; the first chunk of a turn also ends its thinking stage."""
+        with self.lock:
+            first = self.turn_start is not None and "first_token" not in self.timings
+            self.state["reply"] += chunk
+        if first:
+            self.mark_stage("first_token")
+        self.events.publish("reply_chunk", chunk)
+
+    def start_turn(self):
+        with self.lock:
+            self.turn_start = self.stage_start = time.time()
+            self.timings = {}
+
+    def mark_stage(self, stage):
+        """Record the time since the previous mark as stage's duration."""
+        now = time.time()
+        with self.lock:
+            if self.stage_start is None:
+                return
+            self.timings[stage] = now - self.stage_start
+            self.stage_start = now
+
+    def end_turn(self):
+        """Publish this turn's stage timings (seconds) and its total."""
+        with self.lock:
+            if self.turn_start is None:
+                return
+            timings = dict(self.timings)
+            timings["total"] = time.time() - self.turn_start
+            self.turn_start = self.stage_start = None
+        self._update("timings", timings)
+
+    def add_queue(self, name, depth):
+        """Sample depth() every QUEUE_SAMPLE_SECONDS and show it under name."""
+        self.queue_sources[name] = depth
+
+    def sample_queues(self):
+        queues = {}
+        for name, depth in list(self.queue_sources.items()):
+            try:
+                queues[name] = depth()
+            except Exception as e:
+                logger.debug("Queue depth {} unavailable: {}".format(name, e))
+        self._update("queues", queues)
+
+    def _sample(self):
+        while True:
+            time.sleep(QUEUE_SAMPLE_SECONDS)
+            if self.events.clients:
+                self.sample_queues()
+
+    def start(self):
+        """Start sampling queue depths; idle while nobody is watching."""
+        if self.sampler is None:
+            self.sampler = threading.Thread(target=self._sample)
+            self.sampler.daemon = True
+            self.sampler.start()
+
+    def serve_events(self, handler):
+        """Stream to one operator page; a fresh connection first gets the current state."""
+        with self.lock:
+            initial = [(key, value) for key, value in self.state.items() if value]
+        self.events.serve(handler, initial)
+
+
+_dashboard = OperatorDashboard()
+
+
+def get_operator_dashboard():
+    """The process-wide operator dashboard."""
+    return _dashboard
@@ -0,0 +1,167 @@
+"""
+Pre-rendered audio for Pepper's fixed phrases
+Short canned utterances (thinking fillers, "ahem", "Ahh", apologies) are rendered once
+per voice with ALTextToSpeech.sayToFile into files on the robot and preloaded into
+ALAudioPlayer, so playing one is a single play() call with no speech synthesis.
+Rendering happens on a background thread; until a phrase is ready the caller falls
+back to normal speech. Changing the voice drops every rendered phrase and re-renders.
+Python 2.7 compatible version.
+"""
+
+import os
+import time
+import hashlib
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PHRASE_CACHE_DIR = os.getenv("PHRASE_CACHE_DIR", "/home/nao/.local/share/phrase_cache")  # on the robot
+
+
+def phrase_file(cache_dir, voice, text):
+    """Robot-side file for a phrase; the name changes with the voice and the exact text."""
+    digest = hashlib.md5(u"{}|{}".format(voice, text).encode("utf-8")).hexdigest()
+    return "{}/{}_{}.wav".format(cache_dir, voice, digest[:16])
+
+
+class PhraseAudioCache:
+    """
+    Rendered phrase files for the current voice, keyed by text.
+    """
+
+    def __init__(self, tts, audio_player, cache_dir=PHRASE_CACHE_DIR):
+        self.tts = tts
+        self.audio_player = audio_player
+        self.cache_dir = cache_dir
+        self.condition = threading.Condition()
+        self.phrases = []          # every phrase registered, in order
+        self.voice = None
+        self.loaded = {}           # text -> ALAudioPlayer file id, for self.voice
+        self.rendered = set()      # (voice, text) whose file exists on the robot
+        self.pending = []          # texts still to render/load for self.voice
+        self.worker = None
+        self.stats = {"hits": 0, "misses": 0, "rendered": 0, "render_time": 0.0,
+                      "render_failures": 0, "invalidations": 0}
+
+    def add_phrases(self, phrases):
+        """Register phrases to keep rendered; they are rendered once a voice is set."""
+        with self.condition:
+            for text in phrases:
+                if text not in self.phrases:
+                    self.phrases.append(text)
+                    if self.voice is not None and text not in self.loaded:
+                        self.pending.append(text)
+            self._start_worker()
+
+    def set_voice(self, voice):
+        """Render everything for voice; files for the previous voice are no longer played."""
+        with self.condition:
+            if voice == self.voice:
+                return
+            if self.voice is not None:
+                self.stats["invalidations"] += 1
+                logger.info("Voice changed from {} to {}, re-rendering {} phrases".format(
+                    self.voice, voice, len(self.phrases)))
+            self.voice = voice
+            self.loaded = {}
+            self.pending = list(self.phrases)
+            self._start_worker()
+
+    def invalidate(self):
+        """Forget the loaded file ids (e.g. the audio player was restarted); files on disk are reused."""
+        with self.condition:
+            self.loaded = {}
+            if self.voice is not None:
+                self.pending = list(self.phrases)
+                self._start_worker()
+
+    def on_proxy_recreated(self, service):
+        if service == "ALAudioPlayer":
+            self.invalidate()
+        elif service == "ALTextToSpeech":
+            # naoqi may have restarted and lost both the voice and our renders
+            with self.condition:
+                self.rendered.clear()
+            self.invalidate()
+
+    def is_ready(self, text):
+        with self.condition:
+            return text in self.loaded
+
+    def play(self, text):
+        """
+        Start the rendered phrase and return its task id (for audio_player.wait/stop),
+        or None if it is not ready and the caller should speak it instead.
+        """
+        with self.condition:
+            file_id = self.loaded.get(text)
+            if file_id is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+        return self.audio_player.post.play(file_id)
+
+    def stop(self):
+        self.audio_player.stopAll()
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats["ready"] = len(self.loaded)
+            stats["pending"] = len(self.pending)
+            stats["voice"] = self.voice
+            return stats
+
+    def _start_worker(self):
+        # Called with the condition held
+        if self.pending and (self.worker is None or not self.worker.is_alive()):
+            self.worker = threading.Thread(target=self._render_pending)
+            self.worker.daemon = True
+            self.worker.start()
+        self.condition.notify_all()
+
+    def _render_pending(self):
+        while True:
+            with self.condition:
+                if not self.pending:
+                    return
+                text = self.pending.pop(0)
+                voice = self.voice
+            path = phrase_file(self.cache_dir, voice, text)
+            try:
+                start = time.time()
+                if (voice, text) not in self.rendered:
+                    # sayToFile renders with the current TTS voice, which set_voice() follows
+                    self.tts.sayToFile(str(text), path)
+                    with self.condition:
+                        self.rendered.add((voice, text))
+                        self.stats["rendered"] += 1
+                        self.stats["render_time"] += time.time() - start
+                file_id = self.audio_player.loadFile(path)
+            except Exception as e:
+                logger.error("Could not render phrase '{}': {}".format(text, e))
+                with self.condition:
+                    self.stats["render_failures"] += 1
+                continue
+            with self.condition:
+                # The voice may have changed while this one was rendering
+                if voice == self.voice:
+                    self.loaded[text] = file_id
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_phrase_cache(tts, audio_player, registry=None):
+    """Return the process-wide phrase cache, creating it on the first call."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PhraseAudioCache(tts, audio_player)
+            if registry is not None:
+                registry.add_recreate_listener(_cache.on_proxy_recreated)
+        return _cache
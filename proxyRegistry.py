@@ -0,0 +1,365 @@
+"""
+Shared NAOqi proxy registry for Pepper
+One process-wide place to get ALProxy objects. Proxies are created lazily, once per
+service, re-created transparently after "module destroyed", and the health of each
+service is shared with ConnectionMonitor. Each service has a circuit breaker: after
+repeated connection failures calls fail fast with CircuitOpenError while a background
+worker re-creates the proxy with backoff.
+Python 2.7 compatible version.
+"""
+
+import os
+import time
+import threading
+import logging
+from naoqi import ALProxy
+from circuitBreaker import CircuitBreaker, CircuitOpenError, RecoveryWorker, CLOSED
+from metrics import get_metrics, record_rpc
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROBOT_BACKEND = os.getenv("ROBOT_BACKEND", "naoqi")  # "naoqi" (ALProxy) or "qi"
+
+# Error text that means the proxy itself is stale and should be rebuilt
+RECOVERABLE_ERRORS = ("module destroyed", "Cannot find service", "Can't find service", "not connected",
+                      "Connection refused", "Connection reset", "Connection lost", "Socket disconnected",
+                      "Broken pipe")
+
+# Calls that are safe to repeat on a fresh proxy. Anything else (say, runBehavior, removePkg,
+# subscribeToEvent, ...) may already have acted on the robot before it failed, so it is not retried.
+RETRY_PREFIXES = ("get", "is", "has")
+RETRY_METHODS = ("ping", "version", "packages", "robotIp", "robotIsWakeUp")
+
+# Cheapest call that proves a service answers. Every ALModule has ping(); the two qi
+# services do not, and PackageManager has nothing lighter than packages().
+PROBE_METHODS = {
+    "ALTabletService": "robotIp",
+    "PackageManager": "packages",
+}
+DEFAULT_PROBE_METHOD = "ping"
+
+
+def is_retryable_method(name):
+    return name in RETRY_METHODS or name.startswith(RETRY_PREFIXES)
+
+
+def is_recoverable_error(error):
+    message = str(error)
+    for marker in RECOVERABLE_ERRORS:
+        if marker in message:
+            return True
+    return False
+
+
+class RegistryProxy(object):
+    """
+    Stand-in for an ALProxy handed out by the registry.
+
+    Method calls go to the registry's current proxy for the service, and every call
+    result is reported to the registry as a health signal. A getter or probe that fails
+    because the proxy went stale is retried once on a freshly created proxy; other calls
+    drop the stale proxy and raise. While the service's circuit breaker is open, calls
+    raise CircuitOpenError without touching the robot. proxy.post.<method> goes through
+    the same path (never retried) and returns the task id.
+    """
+
+    def __init__(self, registry, service, post=False):
+        self._registry = registry
+        self._service = service
+        self._post = post
+
+    def _target(self):
+        proxy = self._registry.get_raw(self._service)
+        return proxy.post if self._post else proxy
+
+    def _connect(self, method):
+        """
+        The current proxy, created if it was dropped. A connection failure counts against
+        the breaker like a failed call, so a service that stays down starts failing fast.
+        """
+        start = time.time()
+        try:
+            return self._target()
+        except Exception as e:
+            if is_recoverable_error(e):
+                self._registry.mark_failed(self._service, e)
+            record_rpc(self._service, method, time.time() - start, e)
+            raise
+
+    def __getattr__(self, name):
+        if name == "post" and not self._post:
+            return RegistryProxy(self._registry, self._service, post=True)
+        method = "post." + name if self._post else name
+        breaker = self._registry.get_breaker(self._service)
+        self._check_breaker(breaker)
+        attribute = getattr(self._connect(method), name)
+        if not callable(attribute):
+            return attribute
+        retryable = not self._post and is_retryable_method(name)
+
+        def call(*args, **kwargs):
+            self._check_breaker(breaker)
+            target = self._connect(method)
+            start = time.time()
+            try:
+                result = getattr(target, name)(*args, **kwargs)
+            except Exception as e:
+                self._report_error(e)
+                if not is_recoverable_error(e):
+                    record_rpc(self._service, method, time.time() - start, e)
+                    raise
+                if not retryable or not breaker.allow_request():
+                    # The robot may already have acted; reconnect on the next call instead of repeating this one
+                    record_rpc(self._service, method, time.time() - start, e)
+                    self._registry.invalidate(self._service)
+                    raise
+                logger.warning("{}.{} failed ({}), re-creating proxy".format(self._service, name, e))
+                try:
+                    self._registry.recreate(self._service)
+                    result = getattr(self._target(), name)(*args, **kwargs)
+                except Exception as retry_error:
+                    self._report_error(retry_error)
+                    record_rpc(self._service, method, time.time() - start, retry_error)
+                    raise
+            record_rpc(self._service, method, time.time() - start)
+            self._registry.mark_healthy(self._service)
+            return result
+
+        return call
+
+    def _check_breaker(self, breaker):
+        if not breaker.allow_request():
+            get_metrics().counter("pepper_rpc_rejected_total", "Calls refused by an open circuit breaker",
+                                  ("service",)).inc(self._service)
+            raise CircuitOpenError("{} is unavailable (circuit open)".format(self._service))
+
+    def _report_error(self, error):
+        if is_recoverable_error(error):
+            self._registry.mark_failed(self._service, error)
+        else:
+            self._registry.mark_healthy(self._service)  # the service answered
+
+    def __repr__(self):
+        if self._post:
+            return "<RegistryProxy {}.post>".format(self._service)
+        return "<RegistryProxy {}>".format(self._service)
+
+
+class ProxyRegistry:
+    """
+    Lazily creates and caches one ALProxy per service.
+    """
+
+    def __init__(self, pip, pport):
+        self.pip = pip
+        self.pport = pport
+        self.lock = threading.Lock()
+        self.service_locks = {}
+        self.proxies = {}
+        self.wrappers = {}
+        self.health = {}
+        self.stats = {}
+        self.recreate_listeners = []
+        self.health_listeners = []
+        self.breakers = {}
+        self.recovery = RecoveryWorker(self._recover)
+        self.service_up = get_metrics().gauge("pepper_service_up", "1 if the service's last call succeeded",
+                                               ("service",))
+
+    def _service_lock(self, service):
+        with self.lock:
+            if service not in self.service_locks:
+                self.service_locks[service] = threading.Lock()
+                self.breakers[service] = CircuitBreaker(service)
+                self.stats[service] = {"created": 0, "creation_time": 0.0, "recreated": 0, "failures": 0}
+            return self.service_locks[service]
+
+    def _create(self, service):
+        start = time.time()
+        proxy = ALProxy(service, self.pip, self.pport)
+        elapsed = time.time() - start
+        stats = self.stats[service]
+        stats["created"] += 1
+        stats["creation_time"] += elapsed
+        logger.info("Created proxy for {} in {:.3f}s".format(service, elapsed))
+        return proxy
+
+    def get_raw(self, service):
+        """The underlying ALProxy, created on first use."""
+        proxy = self.proxies.get(service)
+        if proxy is not None:
+            return proxy
+        with self._service_lock(service):
+            if service not in self.proxies:
+                self.proxies[service] = self._create(service)
+            return self.proxies[service]
+
+    def warm(self, services):
+        """
+        Create the proxies for services concurrently, so the first calls don't each wait
+        for their own connection. Returns {service: exception} for the ones that failed.
+        """
+        failures = {}
+
+        def create(service):
+            try:
+                self.get_raw(service)
+            except Exception as e:
+                failures[service] = e
+
+        threads = [threading.Thread(target=create, args=(service,)) for service in services]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for service, error in failures.items():
+            logger.warning("Could not create proxy for {}: {}".format(service, error))
+        return failures
+
+    def get(self, service):
+        """A self-healing proxy for the service; cheap to call repeatedly."""
+        self._service_lock(service)
+        with self.lock:
+            if service not in self.wrappers:
+                self.wrappers[service] = RegistryProxy(self, service)
+            return self.wrappers[service]
+
+    def recreate(self, service):
+        """Drop the cached proxy and build a new one."""
+        with self._service_lock(service):
+            self.proxies.pop(service, None)
+            self.stats[service]["recreated"] += 1
+            self.proxies[service] = self._create(service)
+            proxy = self.proxies[service]
+        self._notify_recreated(service)
+        return proxy
+
+    def invalidate(self, service=None):
+        """Forget a cached proxy (or all of them) so the next call re-creates it."""
+        with self.lock:
+            services = [service] if service else list(self.proxies.keys())
+            for name in services:
+                self.proxies.pop(name, None)
+        for name in services:
+            self._notify_recreated(name)
+
+    def add_recreate_listener(self, callback):
+        """Call callback(service) whenever a service's proxy is replaced or dropped."""
+        self.recreate_listeners.append(callback)
+
+    def _notify_recreated(self, service):
+        for callback in self.recreate_listeners:
+            try:
+                callback(service)
+            except Exception as e:
+                logger.error("Recreate listener failed for {}: {}".format(service, e))
+
+    def add_health_listener(self, callback):
+        """Call callback(service, healthy) on every failure and on recovery from one."""
+        self.health_listeners.append(callback)
+
+    def _notify_health(self, service, healthy):
+        for callback in self.health_listeners:
+            try:
+                callback(service, healthy)
+            except Exception as e:
+                logger.error("Health listener failed for {}: {}".format(service, e))
+
+    def mark_healthy(self, service):
+        was_healthy = self.is_healthy(service)
+        self.health[service] = {"healthy": True, "checked_at": time.time(), "error": None}
+        self.get_breaker(service).record_success()
+        if not was_healthy:
+            self.service_up.set(1, service)
+            self._notify_health(service, True)
+
+    def mark_failed(self, service, error=None):
+        self._service_lock(service)
+        self.stats[service]["failures"] += 1
+        self.health[service] = {"healthy": False, "checked_at": time.time(), "error": str(error) if error else None}
+        self.service_up.set(0, service)
+        breaker = self.breakers[service]
+        if breaker.record_failure():
+            self.recovery.schedule(service, breaker.retry_at)
+        self._notify_health(service, False)
+
+    def get_breaker(self, service):
+        breaker = self.breakers.get(service)
+        if breaker is None:
+            self._service_lock(service)
+            breaker = self.breakers[service]
+        return breaker
+
+    def is_available(self, service):
+        """False while the service's breaker is open and calls would fail fast."""
+        return self.get_breaker(service).state == CLOSED
+
+    def request_recovery(self, service):
+        """Open the breaker (if closed) and re-create the proxy on the background worker."""
+        breaker = self.get_breaker(service)
+        breaker.trip()
+        if not self.recovery.is_scheduled(service):
+            self.recovery.schedule(service, breaker.retry_at)
+
+    def probe(self, service):
+        """Make the service's cheapest call on the current proxy; raises if it fails."""
+        proxy = self.get_raw(service)
+        return getattr(proxy, PROBE_METHODS.get(service, DEFAULT_PROBE_METHOD))()
+
+    def _recover(self, service):
+        # Runs on the recovery worker: one half-open trial
+        if not self.get_breaker(service).start_trial():
+            return False
+        try:
+            self.recreate(service)
+            self.probe(service)
+        except Exception as e:
+            logger.warning("Recovery trial for {} failed: {}".format(service, e))
+            self.mark_failed(service, e)
+            return False
+        logger.info("Recovered {}".format(service))
+        self.mark_healthy(service)
+        return True
+
+    def get_breaker_states(self):
+        with self.lock:
+            breakers = list(self.breakers.items())
+        return dict((service, breaker.get_state()) for service, breaker in breakers)
+
+    def is_healthy(self, service):
+        return self.health.get(service, {}).get("healthy", False)
+
+    def get_health(self):
+        """Copy of the health of every service seen so far."""
+        return dict((service, state.copy()) for service, state in self.health.items())
+
+    def get_stats(self):
+        """Proxy creation counts and total creation time per service."""
+        with self.lock:
+            return dict((service, stats.copy()) for service, stats in self.stats.items())
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(pip=None, pport=None):
+    """
+    Return the process-wide registry, creating it on the first call.
+    The first caller must pass the robot address. ROBOT_BACKEND decides whether services
+    come from ALProxy or a qi session, so every module shares one connection per service.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            if pip is None or pport is None:
+                raise RuntimeError("Proxy registry has not been created yet; pass pip and pport")
+            if ROBOT_BACKEND == "qi":
+                from qiPepper import QiRegistry  # qiPepper imports this module
+                _registry = QiRegistry(pip, pport)
+            else:
+                _registry = ProxyRegistry(pip, pport)
+        return _registry
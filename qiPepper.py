@@ -0,0 +1,195 @@
+"""
+qi session backend for Pepper
+Drives the robot through one qi.Session instead of one ALProxy per service. Service
+calls can return qi futures, so a single thread can keep several actuators busy at
+once. qiPepper has the same surface as myPepper plus _async variants that return
+futures for speech, behaviors, LEDs and motion.
+Python 2.7 compatible version.
+"""
+
+import time
+import threading
+import logging
+from proxyRegistry import ProxyRegistry, ROBOT_BACKEND, get_registry
+import myPepper as myPepperModule
+from myPepper import myPepper
+
+try:
+    import qi
+    QI_AVAILABLE = True
+except ImportError:
+    QI_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class QiServiceProxy(object):
+    """
+    Makes a qi service object look like an ALProxy.
+
+    Plain calls pass straight through. proxy.post.method(...) starts the call
+    asynchronously and returns a task id, and wait(id, timeout_ms) / stop(id) work on
+    that id as they do on ALProxy, so code written against ALProxy runs unchanged.
+    """
+
+    def __init__(self, service):
+        self._service = service
+        self._futures = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.post = _QiPost(self)
+
+    def __getattr__(self, name):
+        return getattr(self._service, name)
+
+    def _start(self, name, *args):
+        future = getattr(self._service, name)(*args, _async=True)
+        with self._lock:
+            self._next_id += 1
+            task_id = self._next_id
+            self._futures[task_id] = future
+        future.addCallback(lambda finished, task_id=task_id: self._forget(task_id))
+        return task_id
+
+    def _forget(self, task_id):
+        with self._lock:
+            self._futures.pop(task_id, None)
+
+    def wait(self, task_id, timeout_ms):
+        """True if the task finished within timeout_ms (0 waits forever, as ALProxy.wait)."""
+        future = self._futures.get(task_id)
+        if future is None:
+            return True
+        if timeout_ms:
+            future.wait(timeout_ms)
+        else:
+            future.wait()
+        return future.isFinished()
+
+    def isRunning(self, task_id):
+        future = self._futures.get(task_id)
+        return future is not None and not future.isFinished()
+
+    def stop(self, task_id):
+        future = self._futures.get(task_id)
+        if future is not None:
+            future.cancel()
+
+
+class _QiPost(object):
+    def __init__(self, proxy):
+        self._proxy = proxy
+
+    def __getattr__(self, name):
+        def start(*args):
+            return self._proxy._start(name, *args)
+        return start
+
+
+class QiRegistry(ProxyRegistry):
+    """
+    ProxyRegistry whose services come from one shared qi.Session.
+    Health tracking, re-creation and recreate listeners work as for ALProxy.
+    """
+
+    def __init__(self, pip, pport):
+        if not QI_AVAILABLE:
+            raise RuntimeError("The qi module is not installed; use ROBOT_BACKEND=naoqi")
+        ProxyRegistry.__init__(self, pip, pport)
+        self.session = qi.Session()
+        self.session.connect("tcp://{}:{}".format(pip, pport))
+
+    def _create(self, service):
+        start = time.time()
+        if not self.session.isConnected():
+            self.session.connect("tcp://{}:{}".format(self.pip, self.pport))
+        proxy = QiServiceProxy(self.session.service(service))
+        elapsed = time.time() - start
+        stats = self.stats[service]
+        stats["created"] += 1
+        stats["creation_time"] += elapsed
+        logger.info("Got qi service {} in {:.3f}s".format(service, elapsed))
+        return proxy
+
+
+class qiPepper(myPepper):
+    """
+    myPepper on a qi session. Blocking methods behave as in myPepper; the _async
+    variants return qi futures (or None when there is nothing to do).
+    """
+
+    def __init__(self, PIP, PPORT, LOCAL, registry=None):
+        myPepper.__init__(self, PIP, PPORT, LOCAL, registry if registry is not None else get_qi_registry(PIP, PPORT))
+
+    def have_pepper_say_async(self, speaktext):
+        self.tabletShowSpeech(str(speaktext))
+        return self.animated_tts.say(str(speaktext), _async=True)
+
+    def launch_behavior_async(self, behavior_name):
+        if not (self.behavior_catalog.is_allowed(behavior_name) and self.behavior_catalog.is_installed(behavior_name)):
+            print("Behavior '{}' is not available.".format(behavior_name))
+            return None
+        return self.behavior_manager.runBehavior(behavior_name, _async=True)
+
+    def stop_all_behaviors_async(self):
+        return self.behavior_manager.stopAllBehaviors(_async=True)
+
+    def fade_eyes_async(self, color_name, duration=0.1):
+        # Bypasses the LED engine, so it must not assume it knows the eye color any more
+        self.led_engine.cancel()
+        self.led_engine.invalidate()
+        return self.leds.fadeRGB("FaceLeds", color_name, duration, _async=True)
+
+    def center_pepper_head_async(self, speed=0.15):
+        names = ["HeadYaw", "HeadPitch"]
+        current = self.motion.getAngles(names, True)
+        if max(abs(angle) for angle in current) < myPepperModule.HEAD_TOLERANCE:
+            return None
+        return self.motion.angleInterpolationWithSpeed(names, [0.0, 0.0], speed, _async=True)
+
+    def wait_all(self, futures, timeout=None):
+        """
+        Waits for every future (None entries are skipped) under one deadline.
+        Returns the futures that had not finished.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        unfinished = []
+        for future in futures:
+            if future is None:
+                continue
+            if deadline is None:
+                future.wait()
+            else:
+                future.wait(max(0, int((deadline - time.time()) * 1000)))
+            if not future.isFinished():
+                unfinished.append(future)
+        return unfinished
+
+
+_qi_registry = None
+_qi_registry_lock = threading.Lock()
+
+
+def get_qi_registry(pip=None, pport=None):
+    """
+    Return the qi registry, connecting on the first call. With ROBOT_BACKEND=qi this is the
+    process-wide registry; otherwise a separate one, for comparing the backends side by side.
+    """
+    if ROBOT_BACKEND == "qi":
+        return get_registry(pip, pport)
+    global _qi_registry
+    with _qi_registry_lock:
+        if _qi_registry is None:
+            if pip is None or pport is None:
+                raise RuntimeError("qi registry has not been created yet; pass pip and pport")
+            _qi_registry = QiRegistry(pip, pport)
+        return _qi_registry
+
+
+def create_pepper(PIP, PPORT, LOCAL, backend=ROBOT_BACKEND, registry=None):
+    """myPepper for backend "naoqi", qiPepper for "qi"; both on the process-wide registry by default."""
+    if backend == "qi":
+        return qiPepper(PIP=PIP, PPORT=PPORT, LOCAL=LOCAL, registry=registry)
+    return myPepper(PIP=PIP, PPORT=PPORT, LOCAL=LOCAL, registry=registry)
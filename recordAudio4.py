@@ -1,12 +1,11 @@
-import pyaudio
 import wave
 import os
 import time
-import numpy as np
-from pydub import AudioSegment
-from pydub.silence import detect_nonsilent
 import math
 import sharedVars
+from speechGate import SpeechGate
+from audioBuffer import RecordingBuffer, find_speech_bounds
+from audioSource import MicrophoneSource
 #NEW IMPORTS
 try:
     import OverrideBtn
@@ -14,10 +13,14 @@ try:
 except ImportError:
     OVERRIDE_BTN_AVAILABLE = False
 import threading
+from lazyImport import lazy_import
+
+# Imported on first recording rather than at start-up
+np = lazy_import("numpy")
+pydub = lazy_import("pydub")
 
 # CONSTANTS:
 CHUNK = 1024  # Number of audio frames per buffer
-FORMAT = pyaudio.paInt16  # Format for the audio (16-bit int)
 CHANNELS = 1  # Mono audio
 RATE = 44100  # Sample rate (samples per second 44100)
 BACKGROUNDTHRESHOLD = 60
@@ -36,10 +39,18 @@ CHAT_STATE_OLD = ""
 
 
 class manageAudio():
-    def __init__(self):
+    def __init__(self, audio_source=None):
+
+        # Microphone by default; a WavReplaySource runs the same logic on recorded clips
+        if audio_source is None:
+            audio_source = MicrophoneSource(RATE, CHANNELS)
+        self.audio_source = audio_source
+
+        # Drops coughs, door slams and crowd noise before transcription
+        self.speech_gate = SpeechGate()
 
-        # Initialize PyAudio
-        self.audio = pyaudio.PyAudio()
+        # Preallocated once; caps the utterance length (spills to disk in override mode)
+        self.recording_buffer = RecordingBuffer(RATE)
 
     def mad(self, data):
         # Assuming 'data' contains your audio samples
@@ -69,17 +80,12 @@ class manageAudio():
             
         # Calculate the average RMS power of ambient noise only once
         global BACKGROUNDTHRESHOLD
-        p = pyaudio.PyAudio()
-        stream = p.open(format=FORMAT,
-                        channels=CHANNELS,
-                        rate=RATE,
-                        input=True,
-                        frames_per_buffer=CHUNK)
+        self.audio_source.open(CHUNK)
         while True: 
             
             frames_ambient = []
             for _ in range(0, int(RATE / CHUNK * AMBIENT_CHECK_SECONDS)):  # seconds of ambient noise
-                data = stream.read(CHUNK)
+                data = self.audio_source.read(CHUNK)
                 frames_ambient.append(data)
 
             #loop until we get a real number and not a "nan"
@@ -96,21 +102,22 @@ class manageAudio():
                 BACKGROUNDTHRESHOLD = ((100 - AMBIENT_RMS) * AMBIENT_PERCENT_OVER_DIFF) + AMBIENT_RMS #30% of the difference over ambient_rms
                 print("BACKGROUNDTHRESHOLD " + str(BACKGROUNDTHRESHOLD))
                 break
+
+        self.audio_source.close()
            
 
     # Function to handle the recording logic
-    def record_audio(self):
+    # on_partial(audio_data) is called each time the speaker goes quiet, with the
+    # speech captured so far. on_state(state) is called on every CHAT_STATE change.
+    # should_stop() is checked for every chunk; when it returns True the recording is dropped.
+    # All must return quickly.
+    def record_audio(self, on_partial=None, on_state=None, should_stop=None):
         global CHAT_STATE_OLD
         global CHAT_STATE_NEW
 
         if sharedVars.ISNEAR: #this variable is controled by the main.py file.
             try:
-                p = pyaudio.PyAudio()
-                stream = p.open(format=FORMAT,
-                                channels=CHANNELS,
-                                rate=RATE,
-                                input=True,
-                                frames_per_buffer=CHUNK)
+                self.audio_source.open(CHUNK)
                 
                 global OUTPUT_FILE_WITH_PATH 
                 OUTPUT_FILE_WITH_PATH = self.get_root_Dir() + OUTPUT_FILE
@@ -118,12 +125,20 @@ class manageAudio():
 
                 hasStartedTalking = 0
             
-                frames_speech = []
+                self.recording_buffer.reset()
+                buffer_full = False
                 silence_count = 0
                 while True:
                     
-                    data = stream.read(CHUNK)
-                    #1/1/24 frames_speech.append(data)
+                    try:
+                        data = self.audio_source.read(CHUNK)
+                    except EOFError:
+                        break # replayed clip ran out
+
+                    # The session ended (head tap) while listening
+                    if should_stop is not None and should_stop():
+                        print("RECORDING CANCELLED")
+                        return None
                     current_rms = self.mad(np.frombuffer(data, dtype=np.int16))
 
                     #loop until you get a solid value
@@ -136,7 +151,7 @@ class manageAudio():
                         # Check if the current chunk's volume is close to ambient volume
                         if rms_difference_percentage < BACKGROUNDTHRESHOLD and hasStartedTalking == NUMBER_OF_CHECKS  : 
                             #person was talking but went silent
-                            frames_speech.append(data)
+                            buffer_full = not self.recording_buffer.append(data, allow_spill=sharedVars.ISRECORDING)
                             #print("STOPPED TALKING - DIFF = %s BkTh = %s CRNT = %s | AMB = %s" % (math.ceil(rms_difference_percentage),math.ceil(BACKGROUNDTHRESHOLD),math.ceil(current_rms),math.ceil(AMBIENT_RMS)) )
                             silence_count += 1
                             if CHAT_STATE_OLD != "WILL RESPOND" :
@@ -147,14 +162,14 @@ class manageAudio():
                             if hasStartedTalking < NUMBER_OF_CHECKS :
                                 #maybe person was talking but need to wait for a few more to be sure
                                 hasStartedTalking += 1
-                                frames_speech.append(data)
+                                buffer_full = not self.recording_buffer.append(data, allow_spill=sharedVars.ISRECORDING)
                                 #print(hasStartedTalking)
                                 #print("NOISE? %s - DIFF = %s BkTh = %s =  CRNT = %s | AMB = %s" % (math.ceil(hasStartedTalking),math.ceil(rms_difference_percentage),math.ceil(BACKGROUNDTHRESHOLD),math.ceil(current_rms),math.ceil(AMBIENT_RMS)) )
                                 if CHAT_STATE_OLD != "HEARD SOMETHING" :
                                     CHAT_STATE_NEW = "HEARD SOMETHING"
                             else : 
                                 # person is talking
-                                frames_speech.append(data)
+                                buffer_full = not self.recording_buffer.append(data, allow_spill=sharedVars.ISRECORDING)
                                 #print("IS TALKING - DIFF = %s BkTh = %s =  CRNT = %s | AMB = %s" % (math.ceil(rms_difference_percentage),math.ceil(BACKGROUNDTHRESHOLD),math.ceil(current_rms),math.ceil(AMBIENT_RMS)) )
                                 if CHAT_STATE_OLD != "ACTIVE LISTENING" :
                                     CHAT_STATE_NEW = "ACTIVE LISTENING"
@@ -171,36 +186,57 @@ class manageAudio():
                         # Stop recording after 1 seconds of silence
                         if silence_count > int(RATE / CHUNK * 1) and sharedVars.ISRECORDING == False:
                             break
+
+                        # Stop recording once the maximum utterance length is reached
+                        if buffer_full:
+                            print("MAX RECORDING LENGTH REACHED - %.1f seconds" % self.recording_buffer.duration())
+                            break
                 
                     if CHAT_STATE_NEW != CHAT_STATE_OLD : # Only want to see when the chat state changes
                         CHAT_STATE_OLD = CHAT_STATE_NEW
                         print(CHAT_STATE_NEW)
 
+                        # Speaker just went quiet, hand over what we have so far
+                        if CHAT_STATE_NEW == "WILL RESPOND" and on_partial is not None:
+                            on_partial(self.recording_buffer.to_bytes())
+
+                        if on_state is not None:
+                            on_state(CHAT_STATE_NEW)
+
                 # Convert the speech frames to an audio segment for further processing
-                audio_data = b''.join(frames_speech)
-                audio_segment = AudioSegment(data=audio_data, sample_width=2, channels=CHANNELS, frame_rate=RATE)
+                # Find the non-silent part on a zero-copy view of the buffer, with 250 ms on each side
+                start_sample, end_sample = find_speech_bounds(self.recording_buffer.samples(), RATE, silence_db=-14, padding_ms=250)
+
+                # Only the trimmed speech is copied out for encoding
+                audio_data = self.recording_buffer.to_bytes(start_sample * 2, end_sample * 2)
+                audio_segment = pydub.AudioSegment(data=audio_data, sample_width=2, channels=CHANNELS, frame_rate=RATE)
 
-                # Use pydub's detect_nonsilent to find non-silent parts and trim the beginning silence
-                nonsilent_parts = detect_nonsilent(audio_segment, silence_thresh=audio_segment.dBFS-14)
-                if nonsilent_parts:
-                    start_time = max(nonsilent_parts[0][0] - 250, 0)  # Ensure start_time doesn't go negative
-                    end_time = nonsilent_parts[-1][1] + 250  # Add 1 second to the end time
-                    audio_segment = audio_segment[start_time:end_time]  # Trim the audio_segment with the 1 second buffer
 
+                # Skip noise-only recordings so no transcription call is made
+                is_speech = self.speech_gate.accept(audio_segment)
 
                 # Save the cleaned audio segment
-                filename = OUTPUT_FILE_WITH_PATH
-                audio_segment.export(filename, format="wav")
-                #print("Saved as %s" % filename)
+                if is_speech:
+                    filename = OUTPUT_FILE_WITH_PATH
+                    audio_segment.export(filename, format="wav")
+                    #print("Saved as %s" % filename)
 
             finally:
-                stream.stop_stream()
-                stream.close()
-                p.terminate()
+                self.audio_source.close()
+
+            if not is_speech:
+                print("NOISE REJECTED - " + str(self.speech_gate.get_stats()))
+                return None
 
             return OUTPUT_FILE_WITH_PATH
         
 
+    def write_wav(self, audio_data, filename):
+        # Save raw 16-bit mono frames as a wav file without trimming
+        audio_segment = pydub.AudioSegment(data=audio_data, sample_width=2, channels=CHANNELS, frame_rate=RATE)
+        audio_segment.export(filename, format="wav")
+        return filename
+
     def get_root_Dir(self):
             # Get the current working directory
             current_dir = os.getcwd()
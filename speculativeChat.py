@@ -0,0 +1,211 @@
+"""
+Speculative chat requests for Pepper
+Starts the LLM request on a provisional transcript while the endpointer is still
+waiting for silence to run out, then keeps or cancels it once the final transcript
+is known. Python 2.7 compatible version.
+"""
+
+import os
+import re
+import time
+import tempfile
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Maximum number of word edits between the provisional and final transcript
+# for the speculative request to still be used.
+MAX_EDIT_DISTANCE = int(os.getenv("SPECULATIVE_MAX_EDIT_DISTANCE", "2"))
+SPECULATIVE_PREFIX = "speculative_audio_"  # each attempt gets its own file, so workers never share one
+
+
+def normalize_transcript(text):
+    """Lower-case a transcript and strip punctuation so only the words are compared."""
+    if not text:
+        return []
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def edit_distance(first, second):
+    """Word-level Levenshtein distance between two transcripts."""
+    a = normalize_transcript(first)
+    b = normalize_transcript(second)
+
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1,         # deletion
+                             current[j - 1] + 1,      # insertion
+                             previous[j - 1] + cost)  # substitution
+        previous = current
+    return previous[len(b)]
+
+
+class SpeculativeStats:
+    """
+    Hit/miss counters and latency saved by speculative requests.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_ready = 0
+        self.latency_saved = 0.0
+
+    def record_attempt(self):
+        with self.lock:
+            self.attempts += 1
+
+    def record_hit(self, seconds_saved):
+        with self.lock:
+            self.hits += 1
+            self.latency_saved += seconds_saved
+
+    def record_miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def record_not_ready(self):
+        with self.lock:
+            self.not_ready += 1
+
+    def summary(self):
+        """Return a snapshot of the counters."""
+        with self.lock:
+            resolved = self.hits + self.misses + self.not_ready
+            return {
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_ready": self.not_ready,
+                "hit_rate": float(self.hits) / resolved if resolved else 0.0,
+                "latency_saved_total": self.latency_saved,
+                "latency_saved_avg": self.latency_saved / self.hits if self.hits else 0.0,
+            }
+
+
+class SpeculativeTurn:
+    """
+    One speculative attempt per user turn.
+
+    Pass on_partial to manageAudio.record_audio. Each time the speaker goes quiet,
+    the audio so far is transcribed in the background and the chat request is opened
+    with that provisional transcript. Call resolve() with the final transcript to get
+    the open response back, or None if it was cancelled.
+    """
+
+    def __init__(self, chat_interact, manage_audio, stats, max_edit_distance=MAX_EDIT_DISTANCE):
+        self.chat_interact = chat_interact
+        self.manage_audio = manage_audio
+        self.stats = stats
+        self.max_edit_distance = max_edit_distance
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.pending = False
+        self.provisional_text = None
+        self.response = None
+        self.request_started_at = None
+        self.worker = None
+
+    def on_partial(self, audio_data):
+        """Called from the recording loop when silence begins; must not block."""
+        with self.lock:
+            self._discard_locked()
+            self.generation += 1
+            self.pending = True
+            generation = self.generation
+
+        self.stats.record_attempt()
+        self.worker = threading.Thread(target=self._speculate, args=(generation, audio_data))
+        self.worker.daemon = True
+        self.worker.start()
+
+    def _speculate(self, generation, audio_data):
+        try:
+            # get_root_Dir() ends in a Windows separator; fall back to the temp dir if the folder is missing
+            directory = self.manage_audio.get_root_Dir().rstrip("\\/")
+            handle, file_path = tempfile.mkstemp(suffix=".wav", prefix=SPECULATIVE_PREFIX,
+                                                 dir=directory if os.path.isdir(directory) else None)
+            os.close(handle)
+            try:
+                self.manage_audio.write_wav(audio_data, file_path)
+                transcription = self.chat_interact.transcribe_audio_file(file_path)
+            finally:
+                self.manage_audio.delete_file(file_path)
+
+            if transcription is None or not transcription.text:
+                return
+            with self.lock:
+                if generation != self.generation:
+                    return
+
+            started_at = time.time()
+            response = self.chat_interact.open_chat_stream(transcription.text)
+
+            with self.lock:
+                if generation != self.generation:
+                    response.close()
+                    return
+                self.provisional_text = transcription.text
+                self.response = response
+                self.request_started_at = started_at
+            logger.info("Speculative request started for: {}".format(transcription.text))
+
+        except Exception as e:
+            logger.error("Speculative request failed: {}".format(e))
+
+    def _discard_locked(self):
+        if self.response is not None:
+            try:
+                self.response.close()
+            except Exception:
+                pass
+        self.response = None
+        self.provisional_text = None
+        self.request_started_at = None
+
+    def resolve(self, final_text):
+        """
+        Compare the final transcript to the provisional one.
+        Returns the open streaming response on a hit, otherwise None.
+        """
+        with self.lock:
+            if not self.pending:
+                return None
+            self.pending = False
+
+            if self.response is None:
+                # Still transcribing the partial audio, the speculation is no use now.
+                self.generation += 1
+                self.stats.record_not_ready()
+                logger.info("Speculative request not ready in time")
+                return None
+
+            distance = edit_distance(self.provisional_text, final_text)
+            if distance <= self.max_edit_distance:
+                response = self.response
+                seconds_saved = time.time() - self.request_started_at
+                self.response = None
+                self.stats.record_hit(seconds_saved)
+                logger.info("Speculative HIT (distance {}), saved {:.2f}s".format(distance, seconds_saved))
+                return response
+
+            logger.info("Speculative MISS (distance {}): '{}' vs '{}'".format(
+                distance, self.provisional_text, final_text))
+            self._discard_locked()
+            self.stats.record_miss()
+            return None
+
+    def cancel(self):
+        """Drop any in-flight speculation, e.g. when the turn is abandoned."""
+        with self.lock:
+            self.generation += 1
+            self.pending = False
+            self._discard_locked()
@@ -0,0 +1,124 @@
+"""
+Pre-transcription speech gate for Pepper
+Scores a recorded segment (VAD speech-frame ratio, duration, spectral flatness) and
+rejects coughs, door slams and crowd noise before any transcription or chat call is made.
+"""
+
+import os
+import logging
+from lazyImport import lazy_import
+
+try:
+    import webrtcvad
+    VAD_AVAILABLE = True
+except ImportError:
+    VAD_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+np = lazy_import("numpy")  # imported on first use
+
+MIN_SPEECH_SECONDS = float(os.getenv("MIN_SPEECH_SECONDS", "0.4"))  # shorter than this is a click or cough
+MIN_SPEECH_RATIO = float(os.getenv("MIN_SPEECH_RATIO", "0.3"))  # fraction of frames the VAD calls speech
+MAX_SPECTRAL_FLATNESS = float(os.getenv("MAX_SPECTRAL_FLATNESS", "0.45"))  # 0 = tonal, 1 = white noise
+VAD_AGGRESSIVENESS = 2  # 0 (least) to 3 (most aggressive about filtering non-speech)
+VAD_RATE = 16000  # webrtcvad only accepts 8000, 16000, 32000 or 48000
+FRAME_MS = 30
+
+
+class SpeechGate:
+    """
+    Decides whether a recorded segment is worth sending to transcription.
+    Keeps counters of accepted and rejected segments by reason.
+    """
+
+    def __init__(self, min_seconds=MIN_SPEECH_SECONDS, min_speech_ratio=MIN_SPEECH_RATIO,
+                 max_flatness=MAX_SPECTRAL_FLATNESS):
+        self.min_seconds = min_seconds
+        self.min_speech_ratio = min_speech_ratio
+        self.max_flatness = max_flatness
+        self.vad = webrtcvad.Vad(VAD_AGGRESSIVENESS) if VAD_AVAILABLE else None
+
+        self.checked = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.rejected_by_reason = {"too_short": 0, "no_speech": 0, "noise": 0}
+
+    def speech_ratio(self, audio_segment):
+        """Fraction of 30 ms frames that the VAD classifies as speech, or None without a VAD."""
+        if self.vad is None:
+            return None
+
+        vad_segment = audio_segment.set_channels(1).set_sample_width(2).set_frame_rate(VAD_RATE)
+        raw = vad_segment.raw_data
+        frame_bytes = int(VAD_RATE * FRAME_MS / 1000) * 2
+        total = len(raw) // frame_bytes
+        if total == 0:
+            return 0.0
+
+        speech = 0
+        for i in range(total):
+            if self.vad.is_speech(raw[i * frame_bytes:(i + 1) * frame_bytes], VAD_RATE):
+                speech += 1
+        return float(speech) / total
+
+    def spectral_flatness(self, audio_segment):
+        """
+        Median spectral flatness of the louder half of the frames.
+        Voiced speech has a peaky spectrum (low flatness); broadband noise is flat.
+        """
+        samples = np.array(audio_segment.get_array_of_samples(), dtype=np.float64)
+        frame_len = int(audio_segment.frame_rate * FRAME_MS / 1000)
+        total = len(samples) // frame_len
+        if total == 0:
+            return 1.0
+
+        frames = samples[:total * frame_len].reshape(total, frame_len)
+        energy = np.mean(np.square(frames), axis=1)
+        loud = frames[energy >= np.median(energy)]
+
+        spectrum = np.square(np.abs(np.fft.rfft(loud * np.hanning(frame_len), axis=1))) + 1e-10
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+        return float(np.median(flatness))
+
+    def score(self, audio_segment):
+        """Return the measurements used for the decision."""
+        return {
+            "duration": len(audio_segment) / 1000.0,
+            "speech_ratio": self.speech_ratio(audio_segment),
+            "flatness": self.spectral_flatness(audio_segment),
+        }
+
+    def accept(self, audio_segment):
+        """True if the segment looks like speech and should be transcribed."""
+        self.checked += 1
+        scores = self.score(audio_segment)
+
+        reason = None
+        if scores["duration"] < self.min_seconds:
+            reason = "too_short"
+        elif scores["speech_ratio"] is not None and scores["speech_ratio"] < self.min_speech_ratio:
+            reason = "no_speech"
+        elif scores["flatness"] > self.max_flatness:
+            reason = "noise"
+
+        if reason:
+            self.rejected += 1
+            self.rejected_by_reason[reason] += 1
+            logger.info("Segment rejected ({}): {} - {}/{} rejected so far".format(
+                reason, scores, self.rejected, self.checked))
+            return False
+
+        self.accepted += 1
+        return True
+
+    def get_stats(self):
+        """Counters for checked, accepted and rejected segments."""
+        return {
+            "checked": self.checked,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "rejected_by_reason": self.rejected_by_reason.copy(),
+        }
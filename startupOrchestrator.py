@@ -0,0 +1,192 @@
+"""
+Parallel startup for Pepper
+main.py's start-up steps (broker, proxies, wake up, module registration, voice, ambient
+check, ...) are declared with the steps they need, and each one starts on its own thread
+as soon as those have finished, so robot RPCs, the chat/transcription setup and library
+imports overlap instead of queueing. Every step is timed and print_timeline() shows
+where the start-up time went, including the chain of steps that decided the total.
+Python 2.7 compatible version.
+"""
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+from metrics import get_metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TIMELINE_WIDTH = 50     # characters for the longest bar in print_timeline()
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"     # a step it requires failed
+
+
+class StartupError(RuntimeError):
+    pass
+
+
+class StartupStep:
+    """One step: what it runs, what it needs, and how it went."""
+
+    def __init__(self, name, func, requires, optional):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.optional = optional
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.start = None
+        self.end = None
+
+    def duration(self):
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+
+class StartupOrchestrator:
+    """
+    A dependency graph of start-up steps. Steps must be added after the steps they require,
+    which keeps the graph free of cycles. A failed optional step is logged and its
+    dependents still run; a failed required step skips its dependents and run() raises.
+    """
+
+    def __init__(self, name="startup"):
+        self.name = name
+        self.steps = OrderedDict()
+        self.condition = threading.Condition()
+        self.started_at = None
+        self.finished_at = None
+
+    def add_step(self, name, func, requires=(), optional=False):
+        """Run func() once every step in requires has finished; its return value goes in results()."""
+        if name in self.steps:
+            raise ValueError("Startup step {} is already defined".format(name))
+        for required in requires:
+            if required not in self.steps:
+                raise ValueError("Startup step {} requires unknown step {}".format(name, required))
+        self.steps[name] = StartupStep(name, func, requires, optional)
+
+    def _ready(self, step):
+        # Called with the condition held; None means "not yet", False means "never"
+        for required in step.requires:
+            status = self.steps[required].status
+            if status in (PENDING, RUNNING):
+                return None
+            if status == SKIPPED or (status == FAILED and not self.steps[required].optional):
+                return False
+        return True
+
+    def _run_step(self, step):
+        try:
+            result = step.func()
+            error = None
+        except Exception as e:
+            result = None
+            error = e
+            logger.exception("Startup step {} failed".format(step.name))
+        with self.condition:
+            step.end = time.time()
+            step.result = result
+            step.error = error
+            step.status = DONE if error is None else FAILED
+            self.condition.notify_all()
+        logger.debug("Startup step {} {} in {:.2f}s".format(step.name, step.status, step.duration()))
+
+    def run(self):
+        """Run every step, independent ones concurrently; returns when all have finished or been skipped."""
+        self.started_at = time.time()
+        with self.condition:
+            while True:
+                waiting = False
+                for step in self.steps.values():
+                    if step.status != PENDING:
+                        continue
+                    ready = self._ready(step)
+                    if ready is None:
+                        waiting = True
+                    elif ready:
+                        step.status = RUNNING
+                        step.start = time.time()
+                        thread = threading.Thread(target=self._run_step, args=(step,), name="startup-" + step.name)
+                        thread.daemon = True
+                        thread.start()
+                    else:
+                        step.status = SKIPPED
+                        logger.warning("Startup step {} skipped: a step it requires failed".format(step.name))
+                # Steps come after what they require, so one pass settles everything not waiting on a thread
+                running = any(step.status == RUNNING for step in self.steps.values())
+                if not waiting and not running:
+                    break
+                if running:
+                    self.condition.wait()
+        self.finished_at = time.time()
+        self._record_metrics()
+
+        failed = [step.name for step in self.steps.values()
+                  if (step.status == FAILED and not step.optional) or step.status == SKIPPED]
+        if failed:
+            raise StartupError("Start-up did not complete: {}".format(", ".join(failed)))
+        return self.results()
+
+    def results(self):
+        return dict((name, step.result) for name, step in self.steps.items())
+
+    def total_seconds(self):
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def critical_path(self):
+        """The chain of steps that decided the total: from the last to finish, back through what it waited on."""
+        finished = [step for step in self.steps.values() if step.end is not None]
+        if not finished:
+            return []
+        step = max(finished, key=lambda s: s.end)
+        path = [step.name]
+        while step.requires:
+            step = max((self.steps[name] for name in step.requires), key=lambda s: s.end or 0.0)
+            path.append(step.name)
+        path.reverse()
+        return path
+
+    def get_timeline(self):
+        """(name, start offset, duration, status) per step, in start order."""
+        rows = []
+        for step in self.steps.values():
+            offset = step.start - self.started_at if step.start is not None else None
+            rows.append((step.name, offset, step.duration(), step.status))
+        rows.sort(key=lambda row: float("inf") if row[1] is None else row[1])
+        return rows
+
+    def print_timeline(self):
+        total = self.total_seconds()
+        scale = TIMELINE_WIDTH / total if total > 0 else 0.0
+        name_width = max([len(name) for name in self.steps] + [4])
+        print("--- {} timeline ({:.2f}s) ---".format(self.name, total))
+        for name, offset, duration, status in self.get_timeline():
+            if offset is None:
+                print("{}  {:>6}  {:>6}  {}".format(name.ljust(name_width), "", "", status))
+                continue
+            bar = " " * int(offset * scale) + "#" * max(1, int(duration * scale))
+            suffix = "" if status == DONE else "  " + status
+            print("{}  {:6.2f}  {:6.2f}  |{}{}".format(name.ljust(name_width), offset, duration,
+                                                       bar.ljust(TIMELINE_WIDTH), suffix))
+        sequential = sum(step.duration() for step in self.steps.values())
+        print("Critical path: {}".format(" -> ".join(self.critical_path())))
+        print("Steps took {:.2f}s in total, {:.2f}s saved by running them in parallel".format(
+            sequential, max(0.0, sequential - total)))
+
+    def _record_metrics(self):
+        gauge = get_metrics().gauge("pepper_startup_step_seconds", "Duration of each start-up step", ("step",))
+        for step in self.steps.values():
+            if step.start is not None:
+                gauge.set(step.duration(), step.name)
+        get_metrics().gauge("pepper_startup_seconds", "Wall-clock start-up time").set(self.total_seconds())
@@ -0,0 +1,67 @@
+"""
+Persistent tablet page for Pepper
+The tablet loads website/tablet.html from the local web server once; after that the
+spoken text, the personality color and a status line are pushed to it over
+Server-Sent Events instead of reloading a data: URL for every sentence.
+Python 2.7 compatible version.
+"""
+
+import threading
+from eventStream import EventStream
+
+TABLET_PAGE = "/tablet.html"
+TABLET_EVENTS_PATH = "/events/tablet"
+
+
+class TabletPage:
+    """
+    Current tablet content and the event stream that keeps the page in sync.
+    """
+
+    def __init__(self):
+        self.events = EventStream()
+        self.lock = threading.Lock()
+        self.url = None
+        self.state = {"text": "", "color": None, "status": ""}
+
+    def enable(self, web_address):
+        """Use the page served at web_address for all tablet text from now on."""
+        self.url = web_address + TABLET_PAGE
+
+    def is_enabled(self):
+        return self.url is not None
+
+    def _update(self, key, value):
+        with self.lock:
+            if self.state[key] == value:
+                return False
+            self.state[key] = value
+        self.events.publish(key, value)
+        return True
+
+    def show_text(self, text):
+        self._update("text", text)
+
+    def show_word(self, word):
+        """Highlight the word currently being spoken (ALTextToSpeech/CurrentWord)."""
+        self.events.publish("word", word)
+
+    def set_color(self, color):
+        self._update("color", color)
+
+    def set_status(self, status):
+        self._update("status", status)
+
+    def serve_events(self, handler):
+        """Stream to one tablet connection; a fresh connection first gets the current state."""
+        with self.lock:
+            initial = [(key, value) for key, value in self.state.items() if value]
+        self.events.serve(handler, initial)
+
+
+_tablet_page = TabletPage()
+
+
+def get_tablet_page():
+    """The process-wide tablet page; every myPepper writes to the same tablet."""
+    return _tablet_page
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for actuatorCache.py
+Tests: skipping commands already in place, invalidation by key / service / proxy
+re-creation, robot-reported state, myPepper commands that fail are not cached
+
+Compatible with Python 2.7 and Python 3.
+Stubs out naoqi (Pepper hardware SDK) and dotenv; the tablet and autonomous life
+services are fakes that record what they were asked to do.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import types
+
+# ── Stub hardware-dependent modules BEFORE importing myPepper ────────────────
+# Works on Python 2.7 and 3 without any mock library.
+
+def _make_stub(name):
+    mod = types.ModuleType(name)
+    sys.modules[name] = mod
+    return mod
+
+class _FakeProxy(object):
+    def __init__(self, service, pip=None, pport=None):
+        self.service = service
+    def __getattr__(self, name):
+        return lambda *a, **kw: name
+
+naoqi_stub = _make_stub('naoqi')
+naoqi_stub.ALProxy = _FakeProxy
+naoqi_stub.ALModule = object
+
+dotenv_stub = _make_stub('dotenv')
+dotenv_stub.load_dotenv = lambda *a, **kw: None
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import actuatorCache as ac  # noqa: E402
+import proxyRegistry as pr  # noqa: E402
+import myPepper as mp  # noqa: E402
+
+TABLET = ("ALTabletService", "webview")
+LIFE = ("ALAutonomousLife", "state")
+VOICE = ("ALTextToSpeech", "voice")
+
+
+class _FakeService(object):
+    """Records every call; raises self.error while it is set."""
+    def __init__(self):
+        self.calls = []
+        self.error = None
+    def __getattr__(self, name):
+        def call(*a):
+            if self.error is not None:
+                raise self.error
+            self.calls.append((name,) + a)
+        return call
+
+
+class _BarePepper(mp.myPepper):
+    """myPepper with only what tabletImage and pepperAnnimation use; no robot connection."""
+    def __init__(self, actuator_cache):
+        self.actuator_cache = actuator_cache
+        self.tablet_manager = _FakeService()
+        self.autonomous_life = _FakeService()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: commands already in place are skipped ─────────────────────────
+    print("\n[TEST 1: skip known state]")
+    try:
+        cache = ac.ActuatorStateCache()
+        assert not cache.is_current(LIFE, "solitary"), "unknown state reported current"
+        cache.update(LIFE, "solitary")
+        assert cache.is_current(LIFE, "solitary")
+        assert not cache.is_current(LIFE, "interactive")
+        cache.observe(LIFE, "interactive")  # autonomous life changed it on its own
+        assert not cache.is_current(LIFE, "solitary"), "robot-reported state ignored"
+        assert cache.is_current(LIFE, "interactive")
+        stats = cache.get_stats()
+        assert stats["ALAutonomousLife.state"] == {"sent": 1, "saved": 2}, stats
+        assert stats["total_saved"] == 2, stats
+        print("  PASS: a state known to be in place is skipped and counted as saved")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: drop and invalidate ───────────────────────────────────────────
+    print("\n[TEST 2: invalidation]")
+    try:
+        cache = ac.ActuatorStateCache()
+        for key, value in ((TABLET, "http://a/"), (LIFE, "solitary"), (VOICE, "naoenu")):
+            cache.update(key, value)
+        cache.invalidate(TABLET)
+        assert not cache.is_current(TABLET, "http://a/"), "invalidated key still current"
+        assert cache.is_current(LIFE, "solitary") and cache.is_current(VOICE, "naoenu")
+        cache.invalidate_service("ALTextToSpeech")
+        assert not cache.is_current(VOICE, "naoenu"), "service entries kept"
+        assert cache.is_current(LIFE, "solitary"), "other services dropped"
+        cache.invalidate()
+        assert not cache.is_current(LIFE, "solitary"), "invalidate() kept entries"
+        cache.invalidate(("ALMotion", "posture"))  # unknown keys are ignored
+        print("  PASS: one key, one service or everything can be forgotten")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 3: proxy re-creation drops that service's entries ────────────────
+    print("\n[TEST 3: proxy re-creation]")
+    try:
+        ac._cache = None
+        registry = pr.ProxyRegistry("127.0.0.1", 9559)
+        cache = ac.get_actuator_cache(registry)
+        assert ac.get_actuator_cache() is cache, "cache not shared"
+        registry.get("ALTextToSpeech").setVoice("naoenu")
+        cache.update(VOICE, "naoenu")
+        registry.get("ALTabletService").showWebview("http://a/")
+        cache.update(TABLET, "http://a/")
+        registry.recreate("ALTextToSpeech")
+        assert not cache.is_current(VOICE, "naoenu"), "voice kept after the TTS proxy was re-created"
+        assert cache.is_current(TABLET, "http://a/"), "unrelated service dropped"
+        registry.invalidate()
+        assert not cache.is_current(TABLET, "http://a/"), "entry kept after the registry was invalidated"
+        print("  PASS: a restarted service's state is no longer trusted")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+    finally:
+        ac._cache = None
+
+    # ── Test 4: myPepper caches only commands that went through ───────────────
+    print("\n[TEST 4: myPepper write-through]")
+    try:
+        pepper = _BarePepper(ac.ActuatorStateCache())
+        pepper.tabletImage("http://a/")
+        pepper.tabletImage("http://a/")
+        assert [c[0] for c in pepper.tablet_manager.calls].count("showWebview") == 1, pepper.tablet_manager.calls
+
+        pepper.tablet_manager.error = RuntimeError("ALTabletService is unavailable (circuit open)")
+        pepper.tabletImage("http://b/")
+        pepper.tablet_manager.error = None
+        pepper.tabletImage("http://b/")
+        assert ("showWebview", "http://b/") in pepper.tablet_manager.calls, "failed command was cached"
+
+        pepper.pepperAnnimation(False)
+        pepper.pepperAnnimation(False)
+        assert pepper.autonomous_life.calls == [("setState", "solitary")], pepper.autonomous_life.calls
+        pepper.actuator_cache.observe(LIFE, "interactive")
+        pepper.pepperAnnimation(False)
+        assert len(pepper.autonomous_life.calls) == 2, "robot-reported change not corrected"
+        print("  PASS: repeats skipped, failed commands retried, robot changes corrected")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All actuatorCache checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for circuitBreaker.py
+Tests: breaker states, backoff_delay, RecoveryWorker scheduling
+
+Compatible with Python 2.7 and Python 3.
+Needs nothing from the robot.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import time
+import random
+import threading
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import circuitBreaker as cb  # noqa: E402
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: circuit breaker states ────────────────────────────────────────
+    print("\n[TEST 1: open / half-open / closed]")
+    try:
+        breaker = cb.CircuitBreaker("ALTextToSpeech", failure_threshold=2)
+        assert not breaker.record_failure(), "opened after one failure"
+        assert breaker.allow_request()
+        assert breaker.record_failure(), "did not open at the threshold"
+        assert breaker.state == cb.OPEN and not breaker.allow_request()
+        assert breaker.get_state()["rejected"] == 1
+        assert breaker.start_trial() and breaker.state == cb.HALF_OPEN
+        assert not breaker.start_trial(), "second concurrent trial allowed"
+        assert breaker.record_failure() and breaker.state == cb.OPEN, "failed trial did not reopen"
+        assert breaker.attempt == 2, breaker.attempt
+        assert breaker.start_trial()
+        breaker.record_success()
+        assert breaker.state == cb.CLOSED and breaker.attempt == 0 and breaker.failures == 0
+
+        breaker.trip()
+        assert breaker.state == cb.OPEN and breaker.retry_at <= time.time(), "trip should allow a trial at once"
+        print("  PASS: opens at threshold, one trial at a time, failed trial reopens, success closes")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: backoff delay ─────────────────────────────────────────────────
+    print("\n[TEST 2: backoff_delay]")
+    try:
+        rng = random.Random(7)
+        for attempt in range(12):
+            delay = min(30.0, 0.5 * (2 ** attempt))
+            value = cb.backoff_delay(attempt, base=0.5, maximum=30.0, rng=rng)
+            assert delay / 2 <= value <= delay, "attempt {}: {}".format(attempt, value)
+        assert cb.backoff_delay(50, rng=rng) <= cb.BACKOFF_MAX_SECONDS
+        print("  PASS: delays double, stay within [delay/2, delay] and are capped")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 3: recovery worker ───────────────────────────────────────────────
+    print("\n[TEST 3: RecoveryWorker scheduling]")
+    try:
+        done = threading.Event()
+        recovered = []
+
+        def recover(service):
+            recovered.append((service, time.time()))
+            if len(recovered) == 2:
+                done.set()
+
+        worker = cb.RecoveryWorker(recover)
+        start = time.time()
+        worker.schedule("ALMotion", start + 0.1)
+        worker.schedule("ALTextToSpeech", start)
+        assert worker.is_scheduled("ALMotion")
+        assert done.wait(2.0), "trials did not run"
+        assert [service for service, _ in recovered] == ["ALTextToSpeech", "ALMotion"], recovered
+        assert recovered[1][1] - start >= 0.1, "trial ran before its backoff elapsed"
+        assert not worker.is_scheduled("ALMotion")
+        print("  PASS: trials run in due order, not before their time")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All circuitBreaker checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
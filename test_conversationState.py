@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for conversationState.py
+Tests: transitions, listeners, session generations, wait_for_session
+
+Compatible with Python 2.7 and Python 3.
+Needs nothing from the robot.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import threading
+
+# ── Change to project directory so sharedVars.py is found ────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import sharedVars  # noqa: E402
+import conversationState as cs  # noqa: E402
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: transitions ───────────────────────────────────────────────────
+    print("\n[TEST 1: transitions]")
+    try:
+        changes = []
+        state = cs.ConversationState(active=True)
+        state.add_listener(lambda old, new, reason: changes.append((old, new)))
+        generation = state.begin_session("tap")
+        assert state.transition(cs.LISTENING, generation, "listen")
+        assert state.transition(cs.TRANSCRIBING, generation, "heard")
+        assert state.advance(cs.TRANSCRIBING, cs.THINKING, "transcribed")
+        assert not state.advance(cs.TRANSCRIBING, cs.SPEAKING, "late"), "advance from a stale state"
+        assert state.get_state()[0] == cs.THINKING
+        assert changes == [(cs.IDLE, cs.LISTENING), (cs.LISTENING, cs.TRANSCRIBING),
+                           (cs.TRANSCRIBING, cs.THINKING)], changes
+        try:
+            state.transition(cs.IDLE)
+            assert False, "THINKING -> IDLE should be refused"
+        except cs.InvalidTransition:
+            pass
+        print("  PASS: allowed moves applied, listeners called, invalid move refused")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: ending a session makes its turn stale ─────────────────────────
+    print("\n[TEST 2: session generations]")
+    try:
+        state = cs.ConversationState(active=True)
+        generation = state.get_stats()["generation"]
+        state.transition(cs.LISTENING, generation)
+        assert state.end_session("left")
+        assert sharedVars.ISNEAR is False, "ISNEAR not cleared"
+        assert state.get_state()[0] == cs.ENDING
+        assert not state.is_current(generation)
+        assert not state.transition(cs.TRANSCRIBING, generation), "stale turn moved the state"
+        assert not state.end_session("again"), "second end_session should be a no-op"
+        state.finish_ending()
+        assert state.get_state()[0] == cs.IDLE
+        assert state.wait_for_session(timeout=0.05) is None, "wait_for_session should time out"
+
+        threading.Timer(0.05, state.begin_session, args=("arrival",)).start()
+        new_generation = state.wait_for_session(timeout=2.0)
+        assert new_generation is not None and new_generation > generation, new_generation
+        assert sharedVars.ISNEAR is True, "ISNEAR not set"
+        assert state.is_current(new_generation)
+        print("  PASS: stale generation refused, ISNEAR kept in step, wait_for_session woken")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All conversationState checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for eventBus.py
+Tests: filtering, debounce, coalesce, slow and failing handlers
+
+Compatible with Python 2.7 and Python 3.
+Stubs out naoqi (Pepper hardware SDK) so the bus runs without the robot.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import time
+import types
+import threading
+
+# ── Stub hardware-dependent modules BEFORE importing eventBus ────────────────
+# Works on Python 2.7 and 3 without any mock library.
+
+def _make_stub(name):
+    mod = types.ModuleType(name)
+    sys.modules[name] = mod
+    return mod
+
+naoqi_stub = _make_stub('naoqi')
+naoqi_stub.ALModule = object
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import eventBus as eb  # noqa: E402
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def wait_until(predicate, timeout=2.0):
+    """Poll predicate() until it is true or timeout seconds pass."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: event bus debounce and coalesce ───────────────────────────────
+    print("\n[TEST 1: debounce / coalesce]")
+    bus = eb.EventBus(workers=2)
+    try:
+        taps = []
+        bus.on("FrontTactilTouched", lambda event, value, message: taps.append(value),
+               when=lambda value: value == 1, debounce=10.0)
+        for value in (1, 0, 1, 1):
+            bus.publish("FrontTactilTouched", value)
+        assert wait_until(lambda: len(taps) == 1), taps
+        time.sleep(0.05)
+        assert taps == [1], "tap storm not debounced: {}".format(taps)
+
+        release = threading.Event()
+        seen = []
+
+        def slow_handler(event, value, message):
+            seen.append(value)
+            release.wait(2.0)
+
+        bus.on("AutonomousLife/State", slow_handler, coalesce=True)
+        bus.publish("AutonomousLife/State", "solitary")
+        assert wait_until(lambda: seen == ["solitary"])
+        for value in ("interactive", "disabled", "safeguard"):
+            bus.publish("AutonomousLife/State", value)
+        release.set()
+        assert wait_until(lambda: len(seen) == 2), seen
+        time.sleep(0.05)
+        assert seen == ["solitary", "safeguard"], "values not coalesced: {}".format(seen)
+        print("  PASS: filtered and debounced taps, coalesced state values")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+    finally:
+        bus.shutdown()
+
+    # ── Test 2: a slow or failing handler never blocks the publisher ─────────
+    print("\n[TEST 2: slow and failing handlers]")
+    bus = eb.EventBus(workers=2)
+    try:
+        release = threading.Event()
+        faces = []
+
+        def broken_handler(event, value, message):
+            raise ValueError("bad value")
+
+        bus.on("WordRecognized", lambda event, value, message: release.wait(2.0))
+        bus.on("FaceDetected", lambda event, value, message: faces.append(value))
+        bus.on("FaceDetected", broken_handler)
+        start = time.time()
+        bus.publish("WordRecognized", "hello")
+        for index in range(3):
+            bus.publish("FaceDetected", index)
+        assert time.time() - start < 0.1, "publish waited on a handler"
+        assert wait_until(lambda: faces == [0, 1, 2]), "other handlers held up: {}".format(faces)
+        release.set()
+
+        def errors():
+            return sum(entry["errors"] for entry in bus.get_stats().values() if isinstance(entry, dict))
+
+        assert wait_until(lambda: errors() == 3), "errors not counted: {}".format(errors())
+        print("  PASS: publish returns at once, a slow handler holds up no other, errors are counted")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+    finally:
+        bus.shutdown()
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All eventBus checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for eventStream.py
+Tests: backlog, resume after Last-Event-ID, SSE framing
+
+Compatible with Python 2.7 and Python 3.
+Needs nothing from the robot.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import threading
+from io import BytesIO
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import eventStream as es  # noqa: E402
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+class _FakeHandler(object):
+    """A BaseHTTPRequestHandler stand-in; the browser 'disconnects' once stop_after appears."""
+    def __init__(self, headers, stop_after):
+        self.headers = headers
+        self.wfile = _FakeSocketFile(stop_after)
+        self.status = None
+    def send_response(self, status):
+        self.status = status
+    def send_header(self, name, value):
+        pass
+    def end_headers(self):
+        pass
+
+
+class _FakeSocketFile(BytesIO):
+    def __init__(self, stop_after):
+        BytesIO.__init__(self)
+        self.stop_after = stop_after
+    def flush(self):
+        if self.stop_after.encode("utf-8") in self.getvalue():
+            raise IOError("browser went away")
+
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: event stream resume ───────────────────────────────────────────
+    print("\n[TEST 1: backlog / resume]")
+    try:
+        stream = es.EventStream(backlog=3)
+        for index in range(5):
+            stream.publish("state", {"index": index})
+        entries = stream.events_after(0, timeout=0)
+        assert [entry[0] for entry in entries] == [3, 4, 5], entries
+        assert stream.events_after(5, timeout=0.05) == []
+        threading.Timer(0.05, stream.publish, args=("speech", {"text": "hi"})).start()
+        entries = stream.events_after(5, timeout=2.0)
+        assert [(entry[0], entry[1]) for entry in entries] == [(6, "speech")], entries
+        print("  PASS: backlog bounded, reader resumes after its last id and is woken")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: serving a fresh and a resuming connection ─────────────────────
+    print("\n[TEST 2: serve() with and without Last-Event-ID]")
+    try:
+        stream = es.EventStream(backlog=10)
+        for index in range(5):
+            stream.publish("state", {"index": index})
+
+        resumed = _FakeHandler({"Last-Event-ID": "3"}, "id: 5")
+        stream.serve(resumed, initial_events=[("snapshot", {})])
+        text = resumed.wfile.getvalue().decode("utf-8")
+        assert resumed.status == 200
+        assert "snapshot" not in text, "resuming connection got the initial state again"
+        assert "id: 3" not in text and "id: 4" in text and "id: 5" in text, text
+
+        fresh = _FakeHandler({}, "event: speech")
+        threading.Timer(0.05, stream.publish, args=("speech", {"text": "hi"})).start()
+        stream.serve(fresh, initial_events=[("snapshot", {"state": "idle"})])
+        text = fresh.wfile.getvalue().decode("utf-8")
+        assert text.index("event: snapshot") < text.index("id: 6"), text
+        assert "id: 5" not in text, "fresh connection replayed the backlog"
+        assert 'data: {"text": "hi"}' in text, text
+        assert stream.get_stats()["clients"] == 0, "client count not released"
+        print("  PASS: resume sends only missed events, a fresh page gets its snapshot then live events")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All eventStream checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
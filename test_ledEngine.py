@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for ledEngine.py
+Tests: duplicate commands dropped, invalidate() after something else drove the LEDs
+
+Compatible with Python 2.7 and Python 3.
+Uses a fake ALLeds that records the calls, so no robot is needed.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import time
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import ledEngine as le  # noqa: E402
+
+
+class _FakeLeds(object):
+    """Records fadeRGB/reset calls; post calls return a task id."""
+    def __init__(self):
+        self.calls = []
+        self.post = self
+    def fadeRGB(self, group, color, duration):
+        self.calls.append(("fadeRGB", color))
+        return len(self.calls)
+    def reset(self, group):
+        self.calls.append(("reset",))
+    def rotateEyes(self, color, period, duration):
+        self.calls.append(("rotateEyes", color))
+        return len(self.calls)
+    def stop(self, task_id):
+        pass
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def wait_until(predicate, timeout=2.0):
+    """Poll predicate() until it is true or timeout seconds pass."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: identical commands are dropped ────────────────────────────────
+    print("\n[TEST 1: duplicate commands]")
+    try:
+        leds = _FakeLeds()
+        engine = le.LedEngine(leds)
+        engine.start()
+        engine.fade("blue")
+        assert wait_until(lambda: leds.calls == [("fadeRGB", "blue")]), leds.calls
+        engine.fade("blue")
+        time.sleep(0.05)
+        assert leds.calls == [("fadeRGB", "blue")], "repeated fade sent: {}".format(leds.calls)
+        assert engine.get_stats()["dropped"] == 1
+        engine.shutdown()
+        print("  PASS: a command equal to what the eyes show is not sent again")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: invalidate after a direct LED call ────────────────────────────
+    print("\n[TEST 2: invalidate]")
+    try:
+        leds = _FakeLeds()
+        engine = le.LedEngine(leds)
+        engine.start()
+        engine.fade("blue")
+        assert wait_until(lambda: len(leds.calls) == 1), leds.calls
+        leds.fadeRGB("FaceLeds", "white", 0.1)  # e.g. a behavior or a health check
+        engine.invalidate()
+        engine.fade("blue")
+        assert wait_until(lambda: leds.calls[-1] == ("fadeRGB", "blue") and len(leds.calls) == 3), leds.calls
+        engine.on_proxy_recreated("ALLeds")
+        engine.fade("blue")
+        assert wait_until(lambda: len(leds.calls) == 4), "not re-sent after an ALLeds restart"
+        engine.shutdown()
+        print("  PASS: the same command is sent again once the engine's state is invalidated")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All ledEngine checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
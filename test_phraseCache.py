@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for phraseCache.py and myPepper.say_phrase
+Tests: rendering per voice, invalidation on voice change and proxy re-creation,
+say_phrase fallback and bounded wait
+
+Compatible with Python 2.7 and Python 3.
+Stubs out naoqi (Pepper hardware SDK) and dotenv; ALTextToSpeech and ALAudioPlayer
+are fakes that record what they were asked to do.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import time
+import types
+import threading
+
+# ── Stub hardware-dependent modules BEFORE importing myPepper ────────────────
+# Works on Python 2.7 and 3 without any mock library.
+
+def _make_stub(name):
+    mod = types.ModuleType(name)
+    sys.modules[name] = mod
+    return mod
+
+naoqi_stub = _make_stub('naoqi')
+naoqi_stub.ALProxy = object
+naoqi_stub.ALModule = object
+
+dotenv_stub = _make_stub('dotenv')
+dotenv_stub.load_dotenv = lambda *a, **kw: None
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import phraseCache as pc  # noqa: E402
+import myPepper as mp  # noqa: E402
+
+
+class _FakeTTS(object):
+    """sayToFile records the file; it blocks while gate is cleared."""
+    def __init__(self):
+        self.files = []
+        self.gate = threading.Event()
+        self.gate.set()
+    def sayToFile(self, text, path):
+        self.gate.wait(2.0)
+        self.files.append(path)
+
+
+class _FakeAudioPlayer(object):
+    """loadFile hands out file ids, post.play task ids; wait() can be made to hang."""
+    def __init__(self):
+        self.loads = []
+        self.played = []
+        self.stopped = []
+        self.hangs = False
+        self.error = None
+        self.post = self
+    def loadFile(self, path):
+        self.loads.append(path)
+        return len(self.loads)
+    def play(self, file_id):
+        if self.error is not None:
+            raise self.error
+        self.played.append(file_id)
+        return 100 + len(self.played)
+    def wait(self, task_id, timeout_ms):
+        if self.hangs:
+            time.sleep(timeout_ms / 1000.0)
+            return False
+        return True
+    def stop(self, task_id):
+        self.stopped.append(task_id)
+    def stopAll(self):
+        self.stopped.append("all")
+
+
+class _BarePepper(mp.myPepper):
+    """myPepper with only what say_phrase uses; no robot connection."""
+    def __init__(self, phrase_cache, audio_player):
+        self.phrase_cache = phrase_cache
+        self.audio_player = audio_player
+        self.spoken = []
+    def tabletShowSpeech(self, text):
+        pass
+    def have_pepper_say(self, speaktext):
+        self.spoken.append(speaktext)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def wait_until(predicate, timeout=2.0):
+    """Poll predicate() until it is true or timeout seconds pass."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: rendering for a voice ─────────────────────────────────────────
+    print("\n[TEST 1: rendering for a voice]")
+    try:
+        tts, player = _FakeTTS(), _FakeAudioPlayer()
+        cache = pc.PhraseAudioCache(tts, player, cache_dir="/tmp/phrases")
+        cache.add_phrases(["ahem", "thinking"])
+        assert tts.files == [], "rendered before a voice was set"
+        assert cache.play("ahem") is None, "played before it was rendered"
+        cache.set_voice("naoenu")
+        assert wait_until(lambda: cache.is_ready("ahem") and cache.is_ready("thinking"))
+        assert cache.play("ahem") is not None
+        assert cache.play("hello") is None, "unregistered phrase played"
+        assert all("/tmp/phrases/naoenu_" in path for path in tts.files), tts.files
+        stats = cache.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 2 and stats["rendered"] == 2, stats
+        print("  PASS: phrases rendered and loaded once a voice is set; misses fall through")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: changing the voice invalidates every phrase ───────────────────
+    print("\n[TEST 2: voice change]")
+    try:
+        tts, player = _FakeTTS(), _FakeAudioPlayer()
+        cache = pc.PhraseAudioCache(tts, player, cache_dir="/tmp/phrases")
+        cache.add_phrases(["ahem", "thinking"])
+        cache.set_voice("naoenu")
+        assert wait_until(lambda: cache.is_ready("thinking"))
+        tts.gate.clear()
+        cache.set_voice("Kenny22Enhanced")
+        assert cache.play("ahem") is None, "old voice's file played after the voice changed"
+        tts.gate.set()
+        assert wait_until(lambda: cache.is_ready("ahem") and cache.is_ready("thinking"))
+        assert len([path for path in tts.files if "/Kenny22Enhanced_" in path]) == 2, tts.files
+        cache.set_voice("Kenny22Enhanced")
+        assert cache.get_stats()["invalidations"] == 1, "setting the same voice invalidated"
+        print("  PASS: nothing plays in the old voice; all phrases re-rendered for the new one")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 3: proxy re-creation ─────────────────────────────────────────────
+    print("\n[TEST 3: proxy re-creation]")
+    try:
+        tts, player = _FakeTTS(), _FakeAudioPlayer()
+        cache = pc.PhraseAudioCache(tts, player, cache_dir="/tmp/phrases")
+        cache.add_phrases(["ahem"])
+        cache.set_voice("naoenu")
+        assert wait_until(lambda: cache.is_ready("ahem"))
+
+        cache.on_proxy_recreated("ALAudioPlayer")
+        assert wait_until(lambda: len(player.loads) == 2 and cache.is_ready("ahem")), player.loads
+        assert len(tts.files) == 1, "audio player restart re-rendered the file"
+
+        cache.on_proxy_recreated("ALTextToSpeech")
+        assert wait_until(lambda: len(tts.files) == 2 and cache.is_ready("ahem")), tts.files
+        cache.on_proxy_recreated("ALMotion")
+        assert len(player.loads) == 3, "unrelated service invalidated the cache"
+        print("  PASS: player restart reloads files, TTS restart re-renders them")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 4: say_phrase never fails the caller and never waits forever ─────
+    print("\n[TEST 4: say_phrase fallback and bounded wait]")
+    try:
+        player = _FakeAudioPlayer()
+        cache = pc.PhraseAudioCache(_FakeTTS(), player, cache_dir="/tmp/phrases")
+        cache.add_phrases(["ahem"])
+        cache.set_voice("naoenu")
+        assert wait_until(lambda: cache.is_ready("ahem"))
+        pepper = _BarePepper(cache, player)
+
+        pepper.say_phrase("ahem")
+        assert pepper.spoken == [] and len(player.played) == 1, "cached phrase not played"
+
+        player.error = RuntimeError("ALAudioPlayer is unavailable (circuit open)")
+        pepper.say_phrase("ahem")
+        assert pepper.spoken == ["ahem"], "no TTS fallback when the player failed"
+
+        player.error = None
+        player.hangs = True
+        mp.PHRASE_PLAY_TIMEOUT = 0.1
+        start = time.time()
+        pepper.say_phrase("ahem")
+        assert time.time() - start < 1.0, "waited {:.2f}s on a hung player".format(time.time() - start)
+        assert player.stopped == [102], "hung phrase not stopped: {}".format(player.stopped)
+        print("  PASS: player errors fall back to TTS, a hung phrase is stopped after the timeout")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All phraseCache checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
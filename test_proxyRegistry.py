@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for proxyRegistry.py
+Tests: shared proxies, retry policy for stale proxies, breaker on failed reconnects
+
+Compatible with Python 2.7 and Python 3.
+Stubs out naoqi (Pepper hardware SDK) with a fake ALProxy whose calls can be
+made to fail, so the registry runs without the robot.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import time
+import types
+
+# ── Stub hardware-dependent modules BEFORE importing proxyRegistry ───────────
+# Works on Python 2.7 and 3 without any mock library.
+
+def _make_stub(name):
+    mod = types.ModuleType(name)
+    sys.modules[name] = mod
+    return mod
+
+_fake_robot = {"fail": 0, "calls": [], "created": 0, "down": False, "connects": 0}
+
+class _FakeProxy(object):
+    """
+    An ALProxy whose calls fail with a connection error while _fake_robot["fail"] > 0,
+    and which cannot be created (after a short connect delay) while _fake_robot["down"].
+    """
+    def __init__(self, service, pip=None, pport=None):
+        _fake_robot["connects"] += 1
+        if _fake_robot["down"]:
+            time.sleep(0.05)
+            raise RuntimeError("Connection refused")
+        self.service = service
+        self.post = self  # post calls return the method name instead of a task id
+        _fake_robot["created"] += 1
+    def __getattr__(self, name):
+        def call(*a, **kw):
+            _fake_robot["calls"].append(name)
+            if _fake_robot["fail"] > 0:
+                _fake_robot["fail"] -= 1
+                raise RuntimeError("Connection lost")
+            return name
+        return call
+
+naoqi_stub = _make_stub('naoqi')
+naoqi_stub.ALProxy = _FakeProxy
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import proxyRegistry as pr  # noqa: E402
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def wait_until(predicate, timeout=2.0):
+    """Poll predicate() until it is true or timeout seconds pass."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: one proxy per service ─────────────────────────────────────────
+    print("\n[TEST 1: shared proxies]")
+    try:
+        registry = pr.ProxyRegistry("127.0.0.1", 9559)
+        created = _fake_robot["created"]
+        assert registry.get("ALMotion") is registry.get("ALMotion")
+        registry.get("ALMotion").wakeUp()
+        registry.get("ALMotion").rest()
+        assert _fake_robot["created"] == created + 1, "proxy created more than once"
+        assert registry.is_healthy("ALMotion")
+        print("  PASS: one wrapper and one ALProxy per service, created on first call")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: registry retries getters only ─────────────────────────────────
+    print("\n[TEST 2: retry policy]")
+    try:
+        registry = pr.ProxyRegistry("127.0.0.1", 9559)
+        tts = registry.get("ALTextToSpeech")
+        _fake_robot["calls"][:] = []
+        _fake_robot["fail"] = 1
+        assert tts.getVolume() == "getVolume"
+        assert _fake_robot["calls"] == ["getVolume", "getVolume"], _fake_robot["calls"]
+        created = _fake_robot["created"]
+
+        _fake_robot["calls"][:] = []
+        _fake_robot["fail"] = 1
+        try:
+            tts.say("hello")
+            assert False, "say should raise"
+        except RuntimeError:
+            pass
+        assert _fake_robot["calls"] == ["say"], "say was repeated: {}".format(_fake_robot["calls"])
+        assert "ALTextToSpeech" not in registry.proxies, "stale proxy kept after a failed say"
+        assert tts.post.say("hello") == "say"
+        assert _fake_robot["created"] == created + 1, "proxy not re-created on the next call"
+        assert pr.is_retryable_method("ping") and not pr.is_retryable_method("runBehavior")
+        print("  PASS: getter retried on a fresh proxy, say raised once and dropped the proxy")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 3: a service that cannot be reconnected opens its breaker ────────
+    print("\n[TEST 3: breaker opens when proxy creation keeps failing]")
+    try:
+        registry = pr.ProxyRegistry("127.0.0.1", 9559)
+        tablet = registry.get("ALTabletService")
+        tablet.showWebview("http://robot/")
+        _fake_robot["fail"] = 1
+        _fake_robot["down"] = True
+        try:
+            tablet.showWebview("http://robot/")  # the robot goes away mid-call
+            assert False, "showWebview should raise"
+        except RuntimeError:
+            pass
+        try:
+            tablet.showWebview("http://robot/")  # reconnecting fails as well
+            assert False, "reconnect should raise"
+        except RuntimeError as e:
+            assert "Connection refused" in str(e), str(e)
+        assert not registry.is_available("ALTabletService"), \
+            "breaker still closed: {}".format(registry.get_breaker("ALTabletService").get_state())
+
+        connects = _fake_robot["connects"]
+        start = time.time()
+        for _ in range(5):
+            try:
+                tablet.showWebview("http://robot/")
+                assert False, "open breaker let a call through"
+            except pr.CircuitOpenError:
+                pass
+        assert time.time() - start < 0.05, "callers did not fail fast"
+        assert _fake_robot["connects"] == connects, "open breaker still tried to reconnect"
+
+        _fake_robot["down"] = False
+        assert wait_until(lambda: registry.is_available("ALTabletService"), 5.0), "service never recovered"
+        assert tablet.showWebview("http://robot/") == "showWebview"
+        print("  PASS: failed reconnects open the breaker, callers fail fast, recovery closes it")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+    finally:
+        _fake_robot["down"] = False
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All proxyRegistry checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
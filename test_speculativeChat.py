@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for speculativeChat.py
+Tests: edit_distance, SpeculativeTurn.resolve hit / miss / not ready, superseded speculation
+
+Compatible with Python 2.7 and Python 3.
+Uses fake chat and audio objects, so no API key, microphone or robot is needed.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import time
+import tempfile
+import threading
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import speculativeChat as sc  # noqa: E402
+
+
+class _FakeResponse(object):
+    def __init__(self, text):
+        self.text = text
+        self.closed = False
+    def close(self):
+        self.closed = True
+
+
+class _FakeTranscription(object):
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeChat(object):
+    """Transcribes every partial as self.text; transcription blocks while gate is cleared."""
+    def __init__(self, text):
+        self.text = text
+        self.gate = threading.Event()
+        self.gate.set()
+        self.responses = []
+    def transcribe_audio_file(self, file_path):
+        self.gate.wait(2.0)
+        return _FakeTranscription(self.text)
+    def open_chat_stream(self, text):
+        response = _FakeResponse(text)
+        self.responses.append(response)
+        return response
+
+
+class _FakeAudio(object):
+    def __init__(self):
+        self.deleted = []
+    def get_root_Dir(self):
+        return tempfile.gettempdir() + "\\"
+    def write_wav(self, audio_data, file_path):
+        with open(file_path, "wb") as f:
+            f.write(audio_data)
+    def delete_file(self, file_path):
+        self.deleted.append(file_path)
+        os.remove(file_path)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def wait_until(predicate, timeout=2.0):
+    """Poll predicate() until it is true or timeout seconds pass."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def speculate(text):
+    """A turn whose partial audio has been transcribed as text and its request opened."""
+    chat, audio, stats = _FakeChat(text), _FakeAudio(), sc.SpeculativeStats()
+    turn = sc.SpeculativeTurn(chat, audio, stats, max_edit_distance=2)
+    turn.on_partial(b"partial audio")
+    assert wait_until(lambda: turn.response is not None), "speculative request never opened"
+    return turn, chat, audio, stats
+
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: edit_distance ─────────────────────────────────────────────────
+    print("\n[TEST 1: edit_distance]")
+    try:
+        assert sc.edit_distance("What's the weather?", "what's the WEATHER") == 0, "case or punctuation counted"
+        assert sc.edit_distance("tell me a joke", "tell me a funny joke") == 1
+        assert sc.edit_distance("tell me a joke", "tell us the joke") == 2
+        assert sc.edit_distance("", "hello there") == 2
+        assert sc.edit_distance(None, "") == 0
+        assert sc.edit_distance("one two three", "three two one") == 2
+        print("  PASS: word-level distance, ignoring case and punctuation")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: resolve hit ───────────────────────────────────────────────────
+    print("\n[TEST 2: resolve hit]")
+    try:
+        turn, chat, audio, stats = speculate("tell me a joke")
+        response = turn.resolve("Tell me a funny joke.")
+        assert response is chat.responses[0] and not response.closed, "open request not handed back"
+        assert turn.resolve("tell me a joke") is None, "resolved twice"
+        assert len(audio.deleted) == 1 and not os.path.exists(audio.deleted[0]), "partial audio file left behind"
+        summary = stats.summary()
+        assert summary["attempts"] == 1 and summary["hits"] == 1 and summary["hit_rate"] == 1.0, summary
+        print("  PASS: a close final transcript gets the open response")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 3: resolve miss and not ready ────────────────────────────────────
+    print("\n[TEST 3: resolve miss and not ready]")
+    try:
+        turn, chat, audio, stats = speculate("tell me a joke")
+        assert turn.resolve("what time is it in Tokyo") is None, "distant transcript used the speculation"
+        assert chat.responses[0].closed, "missed request left open"
+        assert stats.summary()["misses"] == 1
+
+        chat, stats = _FakeChat("tell me a joke"), sc.SpeculativeStats()
+        chat.gate.clear()
+        turn = sc.SpeculativeTurn(chat, _FakeAudio(), stats)
+        turn.on_partial(b"partial audio")
+        assert turn.resolve("tell me a joke") is None, "used a speculation still being transcribed"
+        chat.gate.set()
+        turn.worker.join(2.0)
+        assert chat.responses == [], "request opened after the turn resolved"
+        assert stats.summary()["not_ready"] == 1, stats.summary()
+        print("  PASS: misses close the request, a late speculation is never opened")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 4: a new partial supersedes the old one ──────────────────────────
+    print("\n[TEST 4: superseded speculation]")
+    try:
+        turn, chat, audio, stats = speculate("tell me")
+        chat.text = "tell me a joke"
+        turn.on_partial(b"more audio")
+        assert chat.responses[0].closed, "superseded request left open"
+        assert wait_until(lambda: len(chat.responses) == 2 and turn.response is chat.responses[1])
+        assert turn.resolve("tell me a joke") is chat.responses[1]
+        turn.on_partial(b"next turn")
+        turn.cancel()
+        turn.worker.join(2.0)
+        left_open = [r.text for r in chat.responses if not r.closed and r is not chat.responses[1]]
+        assert left_open == [], "cancelled turn left a request open: {}".format(left_open)
+        assert stats.summary()["attempts"] == 3
+        print("  PASS: only the latest partial's request is kept; cancel drops it")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All speculativeChat checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for speechGate.py
+Tests: VAD speech ratio, noise gate decisions (too short / no speech / noise) and counters
+
+Compatible with Python 2.7 and Python 3.
+Segments are fakes with the pydub AudioSegment methods the gate uses, and the VAD is
+a fake that calls any frame with signal in it speech, so neither pydub nor webrtcvad
+is needed. The gate decisions need numpy and are skipped without it.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import math
+import random
+import struct
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import speechGate as sg  # noqa: E402
+
+try:
+    import numpy  # noqa: F401
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+RATE = 16000
+
+
+class _FakeSegment(object):
+    """Mono 16-bit audio at RATE, with the parts of pydub.AudioSegment the gate uses."""
+    def __init__(self, samples):
+        self.samples = [int(s) for s in samples]
+        self.frame_rate = RATE
+    def __len__(self):
+        return int(len(self.samples) * 1000 / RATE)
+    def set_channels(self, channels):
+        return self
+    def set_sample_width(self, width):
+        return self
+    def set_frame_rate(self, rate):
+        return self
+    @property
+    def raw_data(self):
+        return struct.pack("<" + "h" * len(self.samples), *self.samples)
+    def get_array_of_samples(self):
+        return list(self.samples)
+
+
+class _FakeVad(object):
+    """Calls a frame speech if any sample in it is not silent."""
+    def is_speech(self, frame, rate):
+        return any(struct.unpack("<" + "h" * (len(frame) // 2), frame))
+
+
+def tone(seconds, frequency=440.0, amplitude=8000):
+    return [amplitude * math.sin(2 * math.pi * frequency * i / RATE) for i in range(int(seconds * RATE))]
+
+
+def noise(seconds, amplitude=3000):
+    generator = random.Random(1)
+    return [max(-32768, min(32767, generator.gauss(0, amplitude))) for _ in range(int(seconds * RATE))]
+
+
+def silence(seconds):
+    return [0] * int(seconds * RATE)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: VAD speech ratio ──────────────────────────────────────────────
+    print("\n[TEST 1: speech ratio]")
+    try:
+        gate = sg.SpeechGate()
+        gate.vad = None
+        assert gate.speech_ratio(_FakeSegment(tone(1.0))) is None, "ratio without a VAD"
+        gate.vad = _FakeVad()
+        ratio = gate.speech_ratio(_FakeSegment(tone(0.6) + silence(0.6)))
+        assert abs(ratio - 0.5) < 0.05, ratio
+        assert gate.speech_ratio(_FakeSegment(silence(0.01))) == 0.0, "shorter than one frame"
+        print("  PASS: fraction of 30 ms frames with speech, None without a VAD")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: noise gate decisions ──────────────────────────────────────────
+    print("\n[TEST 2: noise gate]")
+    if not NUMPY_AVAILABLE:
+        print("  SKIP: numpy not installed")
+    else:
+        try:
+            gate = sg.SpeechGate(min_seconds=0.4, min_speech_ratio=0.3, max_flatness=0.45)
+            gate.vad = _FakeVad()
+            assert gate.spectral_flatness(_FakeSegment(tone(1.0))) < 0.1, "tone scored as flat"
+            assert gate.spectral_flatness(_FakeSegment(noise(1.0))) > 0.45, "white noise scored as tonal"
+
+            assert gate.accept(_FakeSegment(tone(1.0))), "voiced segment rejected"
+            assert not gate.accept(_FakeSegment(tone(0.2))), "click or cough accepted"
+            assert not gate.accept(_FakeSegment(tone(0.2) + silence(1.0))), "mostly silent segment accepted"
+            assert not gate.accept(_FakeSegment(noise(1.0))), "crowd noise accepted"
+
+            gate.vad = None  # without webrtcvad only duration and flatness are used
+            assert gate.accept(_FakeSegment(tone(0.8) + silence(0.4))), "speech with a pause rejected without a VAD"
+
+            stats = gate.get_stats()
+            assert stats["checked"] == 5 and stats["accepted"] == 2 and stats["rejected"] == 3, stats
+            assert stats["rejected_by_reason"] == {"too_short": 1, "no_speech": 1, "noise": 1}, stats
+            print("  PASS: short, silent and flat segments rejected by reason; speech accepted")
+            passed += 1
+        except Exception as e:
+            print("  FAIL: exception -- " + str(e))
+            failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All speechGate checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
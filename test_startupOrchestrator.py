@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for startupOrchestrator.py
+Tests: optional and required failures, parallel steps, timeline
+
+Compatible with Python 2.7 and Python 3.
+Needs nothing from the robot.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import time
+import threading
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import startupOrchestrator as so  # noqa: E402
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: startup orchestrator failures ─────────────────────────────────
+    print("\n[TEST 1: skip / optional failure]")
+    try:
+        def fail():
+            raise RuntimeError("no robot")
+
+        order = []
+        startup = so.StartupOrchestrator("test")
+        startup.add_step("broker", lambda: order.append("broker") or "broker")
+        startup.add_step("packages", fail, requires=("broker",), optional=True)
+        startup.add_step("modules", lambda: order.append("modules"), requires=("packages",))
+        results = startup.run()
+        assert order == ["broker", "modules"], order
+        assert results["broker"] == "broker"
+        assert startup.critical_path()[0] == "broker"
+
+        startup = so.StartupOrchestrator("test")
+        startup.add_step("broker", fail)
+        startup.add_step("proxies", lambda: None)
+        startup.add_step("modules", lambda: None, requires=("broker", "proxies"))
+        try:
+            startup.run()
+            assert False, "required failure should raise StartupError"
+        except so.StartupError as e:
+            assert "broker" in str(e) and "modules" in str(e), str(e)
+        statuses = dict((row[0], row[3]) for row in startup.get_timeline())
+        assert statuses == {"broker": so.FAILED, "proxies": so.DONE, "modules": so.SKIPPED}, statuses
+        try:
+            startup.add_step("vision", lambda: None, requires=("camera",))
+            assert False, "unknown requirement accepted"
+        except ValueError:
+            pass
+        print("  PASS: optional failure tolerated, required failure skips dependents and raises")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: independent steps overlap ─────────────────────────────────────
+    print("\n[TEST 2: parallel steps and critical path]")
+    try:
+        running = []
+        overlap = threading.Event()
+
+        def slow(name, seconds):
+            def step():
+                running.append(name)
+                if len(running) > 1:
+                    overlap.set()
+                time.sleep(seconds)
+                running.remove(name)
+                return name
+            return step
+
+        startup = so.StartupOrchestrator("test")
+        startup.add_step("broker", slow("broker", 0.05))
+        startup.add_step("imports", slow("imports", 0.3))
+        startup.add_step("pepper", slow("pepper", 0.1), requires=("broker",))
+        startup.add_step("modules", slow("modules", 0.05), requires=("pepper", "imports"))
+        results = startup.run()
+        assert overlap.is_set(), "independent steps ran one after the other"
+        assert results["modules"] == "modules"
+        assert startup.total_seconds() < 0.45, "took {:.2f}s".format(startup.total_seconds())
+        assert startup.critical_path() == ["imports", "modules"], startup.critical_path()
+        names = [row[0] for row in startup.get_timeline()]
+        assert names.index("pepper") > names.index("broker") and names[-1] == "modules", names
+        print("  PASS: independent steps overlap, the critical path names the slow chain")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All startupOrchestrator checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for thinkingFiller.py
+Tests: LatencyPredictor, filler budget policy, slow and failing filler RPCs
+
+Compatible with Python 2.7 and Python 3.
+Uses a fake myPepper that records the filler calls, so no robot is needed.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import time
+import threading
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import thinkingFiller as tf  # noqa: E402
+
+# Short timings so a turn takes a fraction of a second
+tf.FILLER_EARLY_SECONDS = 0.05
+tf.FILLER_REPEAT_SECONDS = 0.1
+
+
+class _FakePepper(object):
+    """Records start/stop of thinking phrases; start can be made slow or failing."""
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.tasks = 0
+        self.started = threading.Event()
+    def start_thinking_phrase(self):
+        self.started.set()
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.calls.append("start")
+        self.tasks += 1
+        return self.tasks
+    def stop_thinking_phrase(self, task_id=None):
+        self.calls.append(("stop", task_id))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def wait_until(predicate, timeout=2.0):
+    """Poll predicate() until it is true or timeout seconds pass."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def run_tests():
+    passed = 0
+    failed = 0
+
+    # ── Test 1: predictor ─────────────────────────────────────────────────────
+    print("\n[TEST 1: LatencyPredictor]")
+    try:
+        predictor = tf.LatencyPredictor(history=4)
+        expected = tf.DEFAULT_TRANSCRIBE_SECONDS_PER_AUDIO_SECOND * 2.0 + tf.DEFAULT_FIRST_SENTENCE_SECONDS
+        assert abs(predictor.predict(2.0) - expected) < 1e-9, "defaults not used without history"
+        for first_sentence in (1.0, 2.0, 3.0, 4.0, 5.0):
+            predictor.record(2.0, 1.0, first_sentence)
+        assert list(predictor.first_sentence_times) == [2.0, 3.0, 4.0, 5.0], "history not bounded"
+        assert predictor.predict_first_sentence() == 5.0, "75th percentile of [2, 3, 4, 5] is 5"
+        assert abs(predictor.predict(4.0) - (0.5 * 4.0 + 5.0)) < 1e-9, predictor.predict(4.0)
+        predictor.record(0.0, 1.0, None)
+        assert len(predictor.transcribe_rates) == 4, "empty recording recorded a rate"
+        print("  PASS: defaults without history, 75th percentile of a bounded history")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: budget policy ─────────────────────────────────────────────────
+    print("\n[TEST 2: filler budget policy]")
+    try:
+        pepper = _FakePepper()
+        scheduler = tf.FillerScheduler(pepper, budget=5.0)
+        scheduler.start_turn(1.0)   # predicted ~1.75s, under budget: first filler only at 5s
+        time.sleep(0.15)
+        scheduler.answer_started()
+        assert pepper.calls == [], "filler played for a short wait: {}".format(pepper.calls)
+
+        pepper = _FakePepper()
+        scheduler = tf.FillerScheduler(pepper, budget=1.0)
+        scheduler.start_turn(1.0)   # predicted over budget: filler after FILLER_EARLY_SECONDS
+        assert wait_until(lambda: pepper.calls.count("start") == 2), pepper.calls
+        time.sleep(tf.FILLER_REPEAT_SECONDS * 2)
+        assert pepper.calls.count("start") == tf.MAX_FILLERS, "more than MAX_FILLERS: {}".format(pepper.calls)
+        scheduler.answer_started()
+        assert pepper.calls[-1] == ("stop", None), "filler not stopped by the answer"
+        stats = scheduler.get_stats()
+        assert stats["predicted_long"] == 1 and stats["fillers"] == 2 and stats["interrupted"] == 1, stats
+        print("  PASS: no filler under budget, early fillers (at most MAX_FILLERS) over it")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 3: a slow filler RPC never delays the answer ─────────────────────
+    print("\n[TEST 3: slow filler RPC]")
+    try:
+        pepper = _FakePepper(delay=0.5)
+        scheduler = tf.FillerScheduler(pepper, budget=1.0)
+        scheduler.start_turn(1.0)
+        assert pepper.started.wait(2.0), "filler never started"
+        start = time.time()
+        scheduler.answer_started()
+        assert time.time() - start < 0.1, "answer waited {:.2f}s on the filler".format(time.time() - start)
+        assert wait_until(lambda: ("stop", 1) in pepper.calls), pepper.calls
+        assert pepper.calls.count("start") == 1, "filler repeated after the answer: {}".format(pepper.calls)
+        print("  PASS: answer_started returns at once; the late filler is stopped by its task id")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 4: a failing filler RPC is logged, not fatal ─────────────────────
+    print("\n[TEST 4: failing filler RPC]")
+    try:
+        pepper = _FakePepper(error=RuntimeError("ALAudioPlayer is unavailable (circuit open)"))
+        scheduler = tf.FillerScheduler(pepper, budget=1.0)
+        scheduler.start_turn(1.0)
+        assert wait_until(lambda: scheduler.get_stats()["errors"] == 1), scheduler.get_stats()
+        scheduler.answer_started()
+        scheduler.start_turn(1.0)   # the next turn still gets its filler
+        pepper.error = None
+        assert wait_until(lambda: "start" in pepper.calls), pepper.calls
+        scheduler.end_turn()
+        time.sleep(0.05)  # let the worker see the end of the turn
+        print("  PASS: error counted and logged, next turn unaffected")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All thinkingFiller checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
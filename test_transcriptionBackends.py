@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Test Suite for transcriptionBackends.py
+Tests: TranscriptionRouter backend choice and fallback, WhisperWorkerTranscriber
+talking to a worker process, whisperWorker.py without faster_whisper
+
+Compatible with Python 2.7 and Python 3.
+Stubs out requests and dotenv; the worker tests run a small stand-in worker under
+this interpreter, so no model is needed.
+"""
+
+from __future__ import print_function
+import sys
+import os
+import wave
+import struct
+import types
+import shutil
+import tempfile
+
+# ── Stub network modules BEFORE importing transcriptionBackends ──────────────
+# Works on Python 2.7 and 3 without any mock library.
+
+def _make_stub(name):
+    mod = types.ModuleType(name)
+    sys.modules[name] = mod
+    return mod
+
+if 'requests' not in sys.modules:
+    try:
+        import requests  # noqa: F401
+    except ImportError:
+        requests_stub = _make_stub('requests')
+        requests_stub.exceptions = types.ModuleType('requests.exceptions')
+        requests_stub.exceptions.RequestException = IOError
+
+dotenv_stub = _make_stub('dotenv')
+dotenv_stub.load_dotenv = lambda *a, **kw: None
+
+# ── Change to project directory so the modules are found ─────────────────────
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+import transcriptionBackends as tb  # noqa: E402
+
+# Replies like whisperWorker.py: the "transcript" is the file name, paths with "bad" fail
+FAKE_WORKER = '''
+import sys, json, os
+sys.stdout.write(json.dumps({"ready": True}) + "\\n")
+sys.stdout.flush()
+for line in iter(sys.stdin.readline, ""):
+    request = json.loads(line)
+    if "bad" in request["path"]:
+        reply = {"id": request["id"], "error": "cannot decode"}
+    else:
+        reply = {"id": request["id"], "text": os.path.basename(request["path"])}
+    sys.stdout.write(json.dumps(reply) + "\\n")
+    sys.stdout.flush()
+'''
+
+
+class _FakeBackend(object):
+    def __init__(self, name, text="hello", available=True):
+        self.name = name
+        self.text = text
+        self.available = available
+        self.url = "http://127.0.0.1:1/transcribe"
+        self.calls = 0
+    def is_available(self):
+        return self.available
+    def transcribe(self, file_path):
+        self.calls += 1
+        if self.text is None:
+            return None
+        return tb.TranscriptionResult(self.text, self.name, 0.01)
+
+
+def create_silence_wav(path, duration_seconds, sample_rate=16000):
+    """Write a minimal mono 16-bit silence WAV file (Python 2/3 compatible)."""
+    n_frames = int(duration_seconds * sample_rate)
+    f = wave.open(path, 'w')
+    try:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(struct.pack('<' + 'h' * n_frames, *([0] * n_frames)))
+    finally:
+        f.close()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+
+def run_tests():
+    passed = 0
+    failed = 0
+    temp_dir = tempfile.mkdtemp()
+    short_wav = os.path.join(temp_dir, "short.wav")
+    long_wav = os.path.join(temp_dir, "long.wav")
+    create_silence_wav(short_wav, 1)
+    create_silence_wav(long_wav, 8)
+
+    # ── Test 1: router choice ─────────────────────────────────────────────────
+    print("\n[TEST 1: router backend choice]")
+    try:
+        http, local = _FakeBackend("http"), _FakeBackend("local")
+        router = tb.TranscriptionRouter(http, local, local_max_seconds=4, max_http_rtt=0.3)
+        assert router.choose_backend(short_wav) is local, "short utterance uploaded"
+        assert router.choose_backend(long_wav) is http, "long utterance kept local on a fast network"
+        router.rtt = float('inf')
+        assert router.choose_backend(long_wav) is local, "uploaded with the network down"
+        router.rtt = 0.05
+        local.available = False
+        assert router.choose_backend(short_wav) is http, "unavailable local backend chosen"
+        print("  PASS: short or offline -> local, long on a fast network -> http")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 2: router fallback ───────────────────────────────────────────────
+    print("\n[TEST 2: router fallback]")
+    try:
+        http, local = _FakeBackend("http", text=None), _FakeBackend("local", text="local text")
+        router = tb.TranscriptionRouter(http, local, local_max_seconds=4)
+        result = router.transcribe(long_wav)
+        assert result is not None and result.text == "local text", "no fallback after a failed upload"
+        assert http.calls == 1 and local.calls == 1
+        print("  PASS: a failed upload falls back to the local backend")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 3: worker process ────────────────────────────────────────────────
+    print("\n[TEST 3: WhisperWorkerTranscriber]")
+    try:
+        script = os.path.join(temp_dir, "fake_worker.py")
+        with open(script, "w") as f:
+            f.write(FAKE_WORKER)
+        worker = tb.WhisperWorkerTranscriber(python=sys.executable, script=script)
+        assert worker.is_available(), "worker did not start"
+        result = worker.transcribe(short_wav)
+        assert result is not None and result.text == "short.wav" and result.backend == "local", result
+        assert worker.transcribe(os.path.join(temp_dir, "bad.wav")) is None, "worker error not reported"
+        assert worker.transcribe(long_wav).text == "long.wav", "worker unusable after an error"
+        worker.close()
+        assert not worker.is_available()
+        assert worker.transcribe(short_wav) is None
+        print("  PASS: files transcribed by path over the pipe, errors give None")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    # ── Test 4: worker that cannot start ──────────────────────────────────────
+    print("\n[TEST 4: worker unavailable]")
+    try:
+        missing = tb.WhisperWorkerTranscriber(python=os.path.join(temp_dir, "no-such-python"))
+        assert not missing.is_available(), "missing interpreter reported available"
+        if not tb.LOCAL_WHISPER_AVAILABLE:
+            # The real worker, under an interpreter without faster_whisper
+            no_model = tb.WhisperWorkerTranscriber(python=sys.executable)
+            assert not no_model.is_available(), "worker without faster_whisper reported available"
+        print("  PASS: missing interpreter or model leaves the local backend unavailable")
+        passed += 1
+    except Exception as e:
+        print("  FAIL: exception -- " + str(e))
+        failed += 1
+
+    shutil.rmtree(temp_dir)
+
+    # ── Summary ───────────────────────────────────────────────────────────────
+    print("\n" + "=" * 55)
+    print("  Results: {}/{} tests passed".format(passed, passed + failed))
+    if failed == 0:
+        print("  All transcriptionBackends checks PASSED.")
+    else:
+        print("  {} test(s) FAILED. See output above.".format(failed))
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    run_tests()
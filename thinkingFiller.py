@@ -0,0 +1,175 @@
+"""
+Thinking filler policy for Pepper
+Decides whether Pepper should say a filler word ("thinking", "pondering", ...) while the
+user waits for an answer. The wait is predicted from recent turns (transcription time
+per second of audio and time to the first sentence of the reply); a filler is played
+early only if the prediction exceeds the budget, or as soon as the real wait does.
+Fillers are started without blocking and are stopped the moment the answer starts.
+Python 2.7 compatible version.
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import deque
+from metrics import percentile
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FILLER_BUDGET_SECONDS = float(os.getenv("FILLER_BUDGET_SECONDS", "3.0"))  # waits shorter than this get no filler
+FILLER_EARLY_SECONDS = 1.0     # when a long wait is predicted, fill the gap this soon
+FILLER_REPEAT_SECONDS = 4.0    # gap between fillers in a very long wait
+MAX_FILLERS = 2                # per turn
+HISTORY_TURNS = 10
+
+# Used until there is history
+DEFAULT_TRANSCRIBE_SECONDS_PER_AUDIO_SECOND = 0.25
+DEFAULT_FIRST_SENTENCE_SECONDS = 1.5
+
+
+class LatencyPredictor:
+    """
+    Predicts how long the user will wait for the first sentence of the reply.
+    Uses the 75th percentile of recent turns so it errs towards playing a filler.
+    """
+
+    def __init__(self, history=HISTORY_TURNS):
+        self.transcribe_rates = deque(maxlen=history)
+        self.first_sentence_times = deque(maxlen=history)
+
+    def record(self, audio_seconds, transcribe_seconds, first_sentence_seconds):
+        if audio_seconds > 0 and transcribe_seconds is not None:
+            self.transcribe_rates.append(transcribe_seconds / audio_seconds)
+        if first_sentence_seconds is not None:
+            self.first_sentence_times.append(first_sentence_seconds)
+
+    def predict_transcription(self, audio_seconds):
+        rate = percentile(self.transcribe_rates, 0.75) if self.transcribe_rates else DEFAULT_TRANSCRIBE_SECONDS_PER_AUDIO_SECOND
+        return rate * audio_seconds
+
+    def predict_first_sentence(self):
+        if self.first_sentence_times:
+            return percentile(self.first_sentence_times, 0.75)
+        return DEFAULT_FIRST_SENTENCE_SECONDS
+
+    def predict(self, audio_seconds):
+        return self.predict_transcription(audio_seconds) + self.predict_first_sentence()
+
+
+class FillerScheduler:
+    """
+    One turn at a time: start_turn() when the recording ends, mark_transcribed() when
+    the transcript is back, answer_started() right before the first real sentence is
+    spoken, end_turn() when the turn is over (with or without an answer).
+    """
+
+    def __init__(self, my_pepper, budget=FILLER_BUDGET_SECONDS, predictor=None):
+        self.my_pepper = my_pepper
+        self.budget = budget
+        self.predictor = predictor if predictor is not None else LatencyPredictor()
+        self.condition = threading.Condition()
+        self.turn = 0
+        self.waiting = False
+        self.started_at = None
+        self.transcribed_at = None
+        self.audio_seconds = 0.0
+        self.fillers_this_turn = 0
+        self.stats = {"turns": 0, "predicted_long": 0, "fillers": 0, "interrupted": 0, "errors": 0}
+
+    def start_turn(self, audio_seconds):
+        predicted = self.predictor.predict(audio_seconds)
+        with self.condition:
+            self.turn += 1
+            turn = self.turn
+            self.waiting = True
+            self.started_at = time.time()
+            self.transcribed_at = None
+            self.audio_seconds = audio_seconds
+            self.fillers_this_turn = 0
+            self.stats["turns"] += 1
+            if predicted > self.budget:
+                self.stats["predicted_long"] += 1
+            self.condition.notify_all()
+
+        first_at = FILLER_EARLY_SECONDS if predicted > self.budget else self.budget
+        logger.info("Predicted wait {:.2f}s for {:.1f}s of audio; first filler at {:.1f}s if still waiting".format(
+            predicted, audio_seconds, first_at))
+
+        worker = threading.Thread(target=self._run, args=(turn, first_at))
+        worker.daemon = True
+        worker.start()
+
+    def mark_transcribed(self):
+        with self.condition:
+            self.transcribed_at = time.time()
+
+    def answer_started(self):
+        """Call right before the first real sentence; stops a filler that is still playing."""
+        with self.condition:
+            if not self.waiting:
+                return
+            self.waiting = False
+            self.condition.notify_all()
+            now = time.time()
+            played = self.fillers_this_turn > 0
+            if self.transcribed_at is not None:
+                self.predictor.record(self.audio_seconds, self.transcribed_at - self.started_at, now - self.transcribed_at)
+        if played:
+            # A one-word filler is usually over by now; stopping is cheap either way
+            self.stats["interrupted"] += 1
+            self._stop_filler()
+
+    def end_turn(self):
+        """Turn over without (or after) an answer; no more fillers."""
+        with self.condition:
+            self.waiting = False
+            self.condition.notify_all()
+
+    cancel = end_turn
+
+    def get_stats(self):
+        with self.condition:
+            return dict(self.stats)
+
+    def _stop_filler(self, task_id=None):
+        try:
+            self.my_pepper.stop_thinking_phrase(task_id)
+        except Exception as e:
+            logger.error("Could not stop thinking filler: {}".format(e))
+
+    def _run(self, turn, first_at):
+        next_at = first_at
+        while True:
+            with self.condition:
+                while self.turn == turn and self.waiting:
+                    remaining = self.started_at + next_at - time.time()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.turn != turn or not self.waiting:
+                    return
+                # Reserve the filler under the lock so answer_started() knows to stop it
+                self.fillers_this_turn += 1
+                last = self.fillers_this_turn >= MAX_FILLERS
+
+            # The RPCs run without the lock: a slow or reconnecting call must never hold up the answer
+            try:
+                task_id = self.my_pepper.start_thinking_phrase()
+            except Exception as e:
+                with self.condition:
+                    self.stats["errors"] += 1
+                logger.error("Could not start thinking filler: {}".format(e))
+                return
+            with self.condition:
+                self.stats["fillers"] += 1
+                answered = self.turn != turn or not self.waiting
+            if answered:
+                # The answer started while the filler was starting; stop just this filler
+                self._stop_filler(task_id)
+                return
+            if last:
+                return
+            next_at += FILLER_REPEAT_SECONDS
@@ -0,0 +1,345 @@
+"""
+Speech-to-text backends for Pepper
+An HTTP backend that uploads to TRANSCRIPTIONURL, a local CPU backend built on a
+quantized Whisper model, and a router that picks one per utterance based on its
+length and the measured network round trip.
+faster_whisper (and ctranslate2 under it) only exist for Python 3. When it cannot be
+imported here (the app on the Python 2.7 NAOqi SDK), the model runs in a whisperWorker.py
+process started under LOCAL_WHISPER_PYTHON instead.
+Python 2.7 compatible version.
+"""
+
+import os
+import json
+import time
+import socket
+import wave
+import threading
+import subprocess
+import logging
+import requests
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+from metrics import http_request
+from lazyImport import lazy_import, is_available
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# The model library is imported when the local backend is created, not when this module is
+faster_whisper = lazy_import("faster_whisper")
+LOCAL_WHISPER_AVAILABLE = is_available("faster_whisper")
+
+# Load environment variables from the .env file
+load_dotenv()
+
+TRANSCRIPTIONURL = os.getenv("TRANSCRIPTIONURL")
+TRANSCRIPTIONMODEL = os.getenv("TRANSCRIPTIONMODEL")
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "auto")  # auto, http or local
+LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "base.en")
+LOCAL_WHISPER_COMPUTE_TYPE = os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+LOCAL_MAX_SECONDS = float(os.getenv("LOCAL_MAX_SECONDS", "4"))  # utterances this short stay local
+MAX_HTTP_RTT = float(os.getenv("MAX_HTTP_RTT", "0.3"))  # above this RTT everything stays local
+RTT_PROBE_INTERVAL = 15  # seconds between network round trip probes
+TRANSCRIPTION_TIMEOUT = float(os.getenv("TRANSCRIPTION_TIMEOUT", "30"))  # seconds before an upload is given up
+LOCAL_WHISPER_PYTHON = os.getenv("LOCAL_WHISPER_PYTHON", "python3")  # interpreter with faster_whisper, for the worker
+LOCAL_WORKER_START_TIMEOUT = float(os.getenv("LOCAL_WORKER_START_TIMEOUT", "120"))  # model download + load
+WHISPER_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "whisperWorker.py")
+
+
+class TranscriptionResult(object):
+    """Transcript holder with the same .text attribute the HTTP API returns."""
+
+    def __init__(self, text, backend=None, elapsed=None):
+        self.text = text
+        self.backend = backend
+        self.elapsed = elapsed
+
+
+def get_wav_duration(file_path):
+    """Length of a wav file in seconds, or None if it cannot be read."""
+    try:
+        wav = wave.open(file_path, 'rb')
+        try:
+            return float(wav.getnframes()) / wav.getframerate()
+        finally:
+            wav.close()
+    except Exception:
+        return None
+
+
+class HttpTranscriber:
+    """
+    Uploads the audio file to the transcription API (e.g., Whisper).
+    """
+
+    name = "http"
+
+    def __init__(self, api_key, url=TRANSCRIPTIONURL, model=TRANSCRIPTIONMODEL):
+        self.api_key = api_key
+        self.url = url
+        self.model = model
+
+    def is_available(self):
+        return bool(self.url)
+
+    def transcribe(self, file_path):
+        """Returns a TranscriptionResult, or None if the request failed."""
+        start = time.time()
+        try:
+            headers = {"Authorization": "Bearer " + self.api_key}
+            with open(file_path, "rb") as audio_file:
+                files = {"file": (os.path.basename(file_path), audio_file, "audio/wav")}
+                data = {"model": self.model}
+                response = http_request("transcription", "POST", self.url, headers=headers, files=files, data=data,
+                                        timeout=TRANSCRIPTION_TIMEOUT)
+            return TranscriptionResult(response.json()["text"], self.name, time.time() - start)
+        except requests.exceptions.RequestException as e:
+            print("Transcription request error: " + str(e))
+            return None
+        except (ValueError, KeyError) as e:
+            # An error response (not JSON, or JSON without "text"); let the router fall back
+            print("Transcription response error: " + str(e))
+            return None
+
+
+class LocalWhisperTranscriber:
+    """
+    Transcribes on the local CPU with a quantized Whisper model.
+    The model is loaded once when the backend is created. Python 3 only (faster_whisper).
+    """
+
+    name = "local"
+
+    def __init__(self, model_name=LOCAL_WHISPER_MODEL, compute_type=LOCAL_WHISPER_COMPUTE_TYPE):
+        self.model = None
+        self.lock = threading.Lock()  # one utterance at a time on the CPU
+        if not LOCAL_WHISPER_AVAILABLE:
+            logger.warning("faster_whisper not installed in this interpreter, use WhisperWorkerTranscriber")
+            return
+        try:
+            start = time.time()
+            self.model = faster_whisper.WhisperModel(model_name, device="cpu", compute_type=compute_type)
+            logger.info("Loaded local whisper model {} in {:.2f}s".format(model_name, time.time() - start))
+        except Exception as e:
+            logger.error("Failed to load local whisper model {}: {}".format(model_name, e))
+
+    def is_available(self):
+        return self.model is not None
+
+    def transcribe(self, file_path):
+        """Returns a TranscriptionResult, or None if transcription failed."""
+        start = time.time()
+        try:
+            with self.lock:
+                segments, _ = self.model.transcribe(file_path, beam_size=1, language="en")
+                text = "".join(segment.text for segment in segments).strip()
+            return TranscriptionResult(text, self.name, time.time() - start)
+        except Exception as e:
+            logger.error("Local transcription error: {}".format(e))
+            return None
+
+
+class WhisperWorkerTranscriber:
+    """
+    The local backend for an interpreter without faster_whisper: the model runs in a
+    whisperWorker.py process under a Python 3 interpreter, and audio files are passed
+    to it by path. If the worker cannot start or dies, the backend reports unavailable.
+    """
+
+    name = "local"
+
+    def __init__(self, python=LOCAL_WHISPER_PYTHON, model_name=LOCAL_WHISPER_MODEL,
+                 compute_type=LOCAL_WHISPER_COMPUTE_TYPE, script=WHISPER_WORKER_SCRIPT):
+        self.lock = threading.Lock()  # one utterance at a time on the CPU
+        self.replies = queue.Queue()
+        self.next_id = 0
+        self.process = None
+        start = time.time()
+        try:
+            self.process = subprocess.Popen([python, script, model_name, compute_type], stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, universal_newlines=True)
+        except OSError as e:
+            logger.warning("Could not start whisper worker with {}: {}".format(python, e))
+            return
+        reader = threading.Thread(target=self._read_replies)
+        reader.daemon = True
+        reader.start()
+
+        ready = self._next_reply(LOCAL_WORKER_START_TIMEOUT)
+        if ready is None or not ready.get("ready"):
+            logger.warning("Whisper worker did not start, local transcription disabled: {}".format(
+                ready.get("error") if ready else "no answer"))
+            self.close()
+            return
+        logger.info("Whisper worker ready in {:.2f}s".format(time.time() - start))
+
+    def _read_replies(self):
+        for line in iter(self.process.stdout.readline, ""):
+            try:
+                self.replies.put(json.loads(line))
+            except ValueError:
+                logger.warning("Whisper worker wrote a line that is not JSON: {}".format(line.strip()))
+        self.replies.put(None)  # the worker exited
+
+    def _next_reply(self, timeout):
+        try:
+            return self.replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def is_available(self):
+        return self.process is not None and self.process.poll() is None
+
+    def transcribe(self, file_path):
+        """Returns a TranscriptionResult, or None if the worker failed or timed out."""
+        start = time.time()
+        with self.lock:
+            if not self.is_available():
+                return None
+            self.next_id += 1
+            request_id = self.next_id
+            try:
+                self.process.stdin.write(json.dumps({"id": request_id, "path": os.path.abspath(file_path)}) + "\n")
+                self.process.stdin.flush()
+            except (IOError, OSError) as e:
+                logger.error("Whisper worker is gone: {}".format(e))
+                return None
+            while True:
+                remaining = start + TRANSCRIPTION_TIMEOUT - time.time()
+                message = self._next_reply(remaining) if remaining > 0 else None
+                if message is None:
+                    logger.error("No transcript from the whisper worker")
+                    return None
+                if message.get("id") == request_id:
+                    break
+                # A reply to an earlier request that timed out
+        if "error" in message:
+            logger.error("Local transcription error: {}".format(message["error"]))
+            return None
+        return TranscriptionResult(message["text"], self.name, time.time() - start)
+
+    def close(self):
+        """Stop the worker; it also exits by itself when this process ends and closes its stdin."""
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
+
+
+class TranscriptionRouter:
+    """
+    Chooses a backend per utterance.
+
+    Short utterances, a slow network, or a network that is down go to the local
+    backend; everything else is uploaded. If the chosen backend fails, the other
+    one is tried.
+    """
+
+    def __init__(self, http_backend, local_backend=None,
+                 local_max_seconds=LOCAL_MAX_SECONDS, max_http_rtt=MAX_HTTP_RTT):
+        self.http_backend = http_backend
+        self.local_backend = local_backend
+        self.local_max_seconds = local_max_seconds
+        self.max_http_rtt = max_http_rtt
+        self.rtt = None  # None until measured, float('inf') when unreachable
+        self.is_probing = False
+        self.probe_thread = None
+
+    def measure_rtt(self):
+        """Time a TCP connect to the transcription host."""
+        try:
+            parsed = urlparse(self.http_backend.url)
+            port = parsed.port or (443 if parsed.scheme == "https" else 80)
+            start = time.time()
+            sock = socket.create_connection((parsed.hostname, port), timeout=2)
+            sock.close()
+            self.rtt = time.time() - start
+        except Exception as e:
+            logger.warning("Network RTT probe failed: {}".format(e))
+            self.rtt = float('inf')
+        return self.rtt
+
+    def _probe_loop(self):
+        while self.is_probing:
+            self.measure_rtt()
+            time.sleep(RTT_PROBE_INTERVAL)
+
+    def start_rtt_probe(self):
+        """Keep the RTT estimate fresh from a background thread."""
+        if not self.is_probing and self.http_backend.is_available():
+            self.is_probing = True
+            self.probe_thread = threading.Thread(target=self._probe_loop)
+            self.probe_thread.daemon = True
+            self.probe_thread.start()
+
+    def stop_rtt_probe(self):
+        self.is_probing = False
+
+    def choose_backend(self, file_path):
+        """Pick the backend for this file."""
+        local_ok = self.local_backend is not None and self.local_backend.is_available()
+        if not local_ok:
+            return self.http_backend
+        if not self.http_backend.is_available():
+            return self.local_backend
+
+        if self.rtt is not None and self.rtt > self.max_http_rtt:
+            return self.local_backend
+
+        duration = get_wav_duration(file_path)
+        if duration is not None and duration <= self.local_max_seconds:
+            return self.local_backend
+
+        return self.http_backend
+
+    def transcribe(self, file_path):
+        backend = self.choose_backend(file_path)
+        result = backend.transcribe(file_path)
+
+        if result is None:
+            fallback = self.local_backend if backend is self.http_backend else self.http_backend
+            if fallback is not None and fallback.is_available():
+                logger.warning("{} transcription failed, falling back to {}".format(backend.name, fallback.name))
+                result = fallback.transcribe(file_path)
+
+        if result is not None:
+            logger.info("Transcribed with {} in {:.2f}s".format(result.backend, result.elapsed))
+        return result
+
+
+def create_local_transcriber():
+    """The model in this process if faster_whisper imports here, otherwise in a worker process."""
+    if LOCAL_WHISPER_AVAILABLE:
+        return LocalWhisperTranscriber()
+    return WhisperWorkerTranscriber()
+
+
+def create_transcriber(api_key, backend=TRANSCRIPTION_BACKEND):
+    """
+    Factory function to create the configured transcriber.
+    backend is "http", "local" or "auto" (route per utterance).
+    """
+    http_backend = HttpTranscriber(api_key)
+    if backend == "http":
+        return http_backend
+
+    local_backend = create_local_transcriber()
+    if not local_backend.is_available():
+        return http_backend
+    if backend == "local":
+        return local_backend
+
+    router = TranscriptionRouter(http_backend, local_backend)
+    router.start_rtt_probe()
+    return router
@@ -0,0 +1,297 @@
+"""
+Shared web server for Pepper's tablet and operator pages
+A thread per connection with HTTP/1.1 keep-alive, so a slow client or an open event
+stream never holds up anyone else. Static files under website/ are served from memory
+with ETag/Last-Modified revalidation and a gzip variant prepared when the file is
+loaded; a watcher thread reloads files that change on disk. Dynamic pages (event
+streams, /metrics) are added with add_route().
+Python 2.7 compatible version.
+"""
+
+import os
+import ssl
+import time
+import zlib
+import socket
+import hashlib
+import mimetypes
+import threading
+import logging
+from email.utils import formatdate, parsedate_tz, mktime_tz
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse
+    from urllib import unquote
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, unquote
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WEBPORT = 8000
+WEBDIRECTORY = "website"
+CACHE_CHECK_SECONDS = 1.0    # how often website/ is checked for changed files
+KEEPALIVE_TIMEOUT = 30       # idle seconds before a keep-alive connection is closed
+GZIP_MIN_BYTES = 256         # smaller files are not worth compressing
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+def find_ip():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # doesn't even have to be reachable
+        s.connect(('10.255.255.255', 1))
+        IP = s.getsockname()[0]
+    except Exception:
+        IP = '127.0.0.1'
+    finally:
+        s.close()
+    return IP
+
+
+def gzip_bytes(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    return compressor.compress(data) + compressor.flush()
+
+
+class StaticFile:
+    """One file held in memory with its validators and optional gzip variant."""
+
+    def __init__(self, path, data, mtime):
+        self.path = path
+        self.data = data
+        self.mtime = mtime
+        self.size = len(data)
+        self.etag = "\"{}\"".format(hashlib.md5(data).hexdigest()[:16])
+        self.last_modified = formatdate(mtime, usegmt=True)
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/"):
+            self.content_type += "; charset=utf-8"
+        self.gzip_data = None
+        if self.size >= GZIP_MIN_BYTES and self.content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip_bytes(data)
+            if len(compressed) < self.size:
+                self.gzip_data = compressed
+
+
+class StaticCache:
+    """
+    Every file under a directory, keyed by URL path ("/tablet.html").
+    refresh() reloads files whose mtime or size changed and drops deleted ones.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.lock = threading.Lock()
+        self.files = {}
+        self.watcher = None
+        self.is_watching = False
+        self.stats = {"loads": 0, "reloads": 0}
+        self.refresh()
+
+    def refresh(self):
+        seen = set()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                full_path = os.path.join(root, name)
+                url_path = "/" + os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                seen.add(url_path)
+                try:
+                    stat = os.stat(full_path)
+                    cached = self.files.get(url_path)
+                    if cached is not None and cached.mtime == stat.st_mtime and cached.size == stat.st_size:
+                        continue
+                    with open(full_path, "rb") as static_file:
+                        entry = StaticFile(full_path, static_file.read(), stat.st_mtime)
+                except (IOError, OSError) as e:
+                    logger.warning("Could not load {}: {}".format(full_path, e))
+                    continue
+                with self.lock:
+                    self.files[url_path] = entry
+                    self.stats["reloads" if cached is not None else "loads"] += 1
+                if cached is not None:
+                    logger.info("Reloaded {}".format(url_path))
+        with self.lock:
+            for url_path in set(self.files) - seen:
+                del self.files[url_path]
+
+    def invalidate(self, url_path=None):
+        """Forget one file (or all) so the next refresh() reads it from disk."""
+        with self.lock:
+            if url_path is None:
+                self.files.clear()
+            else:
+                self.files.pop(url_path, None)
+        self.refresh()
+
+    def get(self, url_path):
+        with self.lock:
+            return self.files.get(url_path)
+
+    def _watch(self):
+        while self.is_watching:
+            time.sleep(CACHE_CHECK_SECONDS)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Error refreshing static cache: {}".format(e))
+
+    def start_watching(self):
+        if not self.is_watching:
+            self.is_watching = True
+            self.watcher = threading.Thread(target=self._watch)
+            self.watcher.daemon = True
+            self.watcher.start()
+
+    def stop_watching(self):
+        self.is_watching = False
+
+
+class WebHandler(BaseHTTPRequestHandler):
+    """Routes first, then the static cache; keeps the connection open between requests."""
+
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def handle_request(self, send_body):
+        web_server = self.server.web_server
+        path = unquote(urlparse(self.path).path)
+        route = web_server.routes.get(path)
+        if route is not None:
+            callback, streaming = route
+            if streaming:
+                # An event stream has no length; it ends when the connection does
+                self.close_connection = True
+            web_server.count("routed")
+            callback(self)
+            return
+
+        if path.endswith("/"):
+            path += "index.html"
+        entry = web_server.cache.get(path)
+        if entry is None:
+            web_server.count("not_found")
+            self.send_error(404, "File not found")
+            return
+
+        if self.is_not_modified(entry):
+            web_server.count("not_modified")
+            self.send_response(304)
+            self.send_validators(entry)
+            self.end_headers()
+            return
+
+        body = entry.data
+        use_gzip = entry.gzip_data is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        if use_gzip:
+            body = entry.gzip_data
+            web_server.count("gzipped")
+        web_server.count("hits")
+        self.send_response(200)
+        self.send_header("Content-Type", entry.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        if entry.gzip_data is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_validators(entry)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_validators(self, entry):
+        self.send_header("ETag", entry.etag)
+        self.send_header("Last-Modified", entry.last_modified)
+        # Always revalidate: a changed file shows up at once, an unchanged one costs a 304
+        self.send_header("Cache-Control", "no-cache")
+
+    def is_not_modified(self, entry):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return entry.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            parsed = parsedate_tz(if_modified_since)
+            if parsed is not None:
+                return int(entry.mtime) <= mktime_tz(parsed)
+        return False
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    # A thread per connection, so an open event stream doesn't block other requests
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 32
+
+
+class WebServer:
+    """
+    The static site plus dynamic routes on one threaded server.
+    ssl_files is (keyfile, certfile) to serve HTTPS.
+    """
+
+    def __init__(self, directory=WEBDIRECTORY, host=None, port=WEBPORT, ssl_files=None):
+        self.host = host if host is not None else find_ip()
+        self.port = port
+        self.cache = StaticCache(directory)
+        self.routes = {}   # URL path -> (callback(handler), streaming)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "not_modified": 0, "gzipped": 0, "not_found": 0, "routed": 0}
+        self.httpd = ThreadedHTTPServer((self.host, self.port), WebHandler)
+        self.httpd.web_server = self
+        self.scheme = "http"
+        if ssl_files is not None:
+            keyfile, certfile = ssl_files
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(certfile, keyfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+            self.scheme = "https"
+        self.address = "{}://{}:{}".format(self.scheme, self.host, self.port)
+        self.thread = None
+
+    def add_route(self, path, callback, streaming=False):
+        """Serve path with callback(handler); streaming routes close the connection afterwards."""
+        self.routes[path] = (callback, streaming)
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def start(self):
+        """Serve from a background thread; returns the server's address."""
+        self.cache.start_watching()
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True  # This ensures that the thread will close when the main program exits
+        self.thread.start()
+        return self.address
+
+    def serve_forever(self):
+        """Serve on the calling thread, for the standalone website scripts."""
+        self.cache.start_watching()
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.cache.stop_watching()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats.update(self.cache.stats)
+        stats["files"] = len(self.cache.files)
+        return stats
@@ -0,0 +1,59 @@
+"""
+Local Whisper worker process for Pepper
+faster_whisper only exists for Python 3, while the app runs on the Python 2.7 NAOqi SDK.
+transcriptionBackends starts this script under LOCAL_WHISPER_PYTHON and talks to it over
+stdin/stdout, one JSON object per line: requests are {"id": n, "path": "..."} and replies
+are {"id": n, "text": "..."} or {"id": n, "error": "..."}. The first line written is
+{"ready": true} once the model is loaded, or {"error": "..."} if it could not be.
+Logging goes to stderr; stdout carries only replies.
+
+Usage: python3 whisperWorker.py [model] [compute_type]
+"""
+
+import sys
+import json
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "base.en"
+DEFAULT_COMPUTE_TYPE = "int8"
+
+
+def reply(message):
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def main(argv):
+    model_name = argv[1] if len(argv) > 1 else DEFAULT_MODEL
+    compute_type = argv[2] if len(argv) > 2 else DEFAULT_COMPUTE_TYPE
+    try:
+        start = time.time()
+        from faster_whisper import WhisperModel
+        model = WhisperModel(model_name, device="cpu", compute_type=compute_type)
+        logger.info("Loaded local whisper model {} in {:.2f}s".format(model_name, time.time() - start))
+    except Exception as e:
+        reply({"error": "could not load {}: {}".format(model_name, e)})
+        return 1
+    reply({"ready": True})
+
+    # Until the app closes our stdin
+    for line in iter(sys.stdin.readline, ""):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request["id"]
+            segments, _ = model.transcribe(request["path"], beam_size=1, language="en")
+            reply({"id": request_id, "text": "".join(segment.text for segment in segments).strip()})
+        except Exception as e:
+            logger.error("Local transcription error: {}".format(e))
+            reply({"id": request_id, "error": str(e)})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))